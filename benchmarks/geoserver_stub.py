@@ -0,0 +1,311 @@
+import io
+import json
+import re
+import threading
+import zipfile
+from urllib.parse import parse_qsl, urlparse
+from stub_http import StubHandler, StubServer
+
+# Collection segment -> (JSON list key, JSON item key), as in GeoServer's REST listings
+COLLECTIONS = {
+    "workspaces": ("workspaces", "workspace"),
+    "datastores": ("dataStores", "dataStore"),
+    "wmsstores": ("wmsStores", "wmsStore"),
+    "featuretypes": ("featureTypes", "featureType"),
+    "wmslayers": ("wmsLayers", "wmsLayer"),
+    "styles": ("styles", "style"),
+}
+# Kinds GeoServer also lists per workspace across all stores
+WORKSPACE_WIDE = {"featuretypes", "wmslayers"}
+_NAME = re.compile(rb"<name>\s*([^<]+?)\s*</name>")
+
+
+class Catalog:
+    """
+    In-memory GeoServer catalog. Objects are keyed by their REST path, e.g.
+    "workspaces/WA_v2/datastores/x_datastore/featuretypes/x".
+
+    GWC seed requests are kept per layer in seeds; a layer's tasks report as
+    running for seed_polls status reads (0: they finish straight away).
+    """
+
+    def __init__(self, seed_polls=0):
+        self.objects = {}
+        self.imports = {}
+        self.seeds = {}
+        self.seed_polls = seed_polls
+        self.lock = threading.Lock()
+
+    def children(self, collection_path):
+        prefix = collection_path + "/"
+        return sorted(path[len(prefix):] for path in self.objects
+                      if path.startswith(prefix) and "/" not in path[len(prefix):])
+
+    def workspace_wide(self, workspace, kind):
+        pattern = re.compile(rf"^workspaces/{re.escape(workspace)}/[^/]+/[^/]+/{kind}/([^/]+)$")
+        return sorted(match.group(1) for match in map(pattern.match, self.objects) if match)
+
+    def layer_exists(self, workspace, name):
+        return any(name in self.workspace_wide(workspace, kind) for kind in WORKSPACE_WIDE)
+
+    def remove(self, path):
+        removed = [key for key in self.objects if key == path or key.startswith(path + "/")]
+        for key in removed:
+            del self.objects[key]
+        return bool(removed)
+
+    def resolve_layer(self, layer):
+        """(workspace, name) for "ws:name", or for a bare name the workspace that has it, as GeoServer does."""
+        workspace, _, name = layer.rpartition(":")
+        if not workspace:
+            workspace = next((path.split("/")[1] for path in self.objects if path.count("/") == 1
+                              and self.layer_exists(path.split("/")[1], name)), "")
+        return workspace, name
+
+    def featuretype_path(self, workspace, name):
+        pattern = re.compile(rf"^workspaces/{re.escape(workspace)}/datastores/[^/]+/featuretypes/{re.escape(name)}$")
+        return next((path for path in self.objects if pattern.match(path)), None)
+
+    def rename(self, path, new_name):
+        new_path = path.rsplit("/", 1)[0] + "/" + new_name
+        for key in [key for key in self.objects if key == path or key.startswith(path + "/")]:
+            self.objects[new_path + key[len(path):]] = self.objects.pop(key)
+
+
+def _listing(kind, names):
+    outer, inner = COLLECTIONS[kind]
+    # GeoServer answers an empty list with "" instead of an object
+    return {outer: {inner: [{"name": name} for name in names]} if names else ""}
+
+
+def _shapefile_name(body):
+    try:
+        with zipfile.ZipFile(io.BytesIO(body)) as zf:
+            return next(name[:-4] for name in zf.namelist() if name.lower().endswith(".shp"))
+    except (zipfile.BadZipFile, StopIteration):
+        return None
+
+
+class GeoServerStubHandler(StubHandler):
+    """
+    The subset of the GeoServer REST API the ingest and style helpers use:
+    workspaces, datastores (including file uploads with configure=first),
+    WMS stores, featuretypes and WMS layers (with renames), styles and
+    layer style assignment, the resource API, GeoWebCache seeding (seed,
+    status and kill_all) and the Importer (one zip per task; running an
+    import publishes every task as a store named after its shapefile, with
+    the task's style as the layer's default style).
+    """
+
+    def _parse(self):
+        parsed = urlparse(self.path)
+        path = parsed.path
+        gwc = "/gwc/rest/" in path
+        path = path.split("/rest/", 1)[1] if "/rest/" in path else path.lstrip("/")
+        path = re.sub(r"\.(json|xml|sld)$", "", path.rstrip("/"))
+        return path, dict(parse_qsl(parsed.query)), gwc
+
+    def handle_get(self, body):
+        path, params, gwc = self._parse()
+        catalog = self.server.catalog
+        if gwc:
+            return self._gwc_seed("GET", path, body)
+        if path.startswith("imports/"):
+            return self._get_import(path.split("/"))
+        segments = path.split("/")
+        with catalog.lock:
+            if segments[-1] in COLLECTIONS:
+                if len(segments) == 3 and segments[0] == "workspaces" and segments[2] in WORKSPACE_WIDE:
+                    names = catalog.workspace_wide(segments[1], segments[2])
+                elif len(segments) > 1 and "/".join(segments[:-1]) not in catalog.objects:
+                    return self.respond(404, b"No such parent", "text/plain")
+                else:
+                    names = catalog.children(path)
+                return self.respond(200, json.dumps(_listing(segments[-1], names)).encode("utf-8"))
+            if segments[0] == "layers" and len(segments) == 2:
+                workspace, name = catalog.resolve_layer(segments[1])
+                if not catalog.layer_exists(workspace, name):
+                    return self.respond(404, b"No such layer", "text/plain")
+                style = catalog.objects.get(path, {}).get("default_style")
+                layer = {"name": name, **({"defaultStyle": {"name": style}} if style else {})}
+                resource = catalog.featuretype_path(workspace, name)
+                if resource:
+                    layer["resource"] = {"href": f"http://{self.headers['Host']}/geoserver/rest/{resource}.json"}
+                return self.respond(200, json.dumps({"layer": layer}).encode("utf-8"))
+            obj = catalog.objects.get(path)
+        if obj is None:
+            return self.respond(404, b"No such object", "text/plain")
+        if segments[-2] == "styles" and self.path.split("?")[0].endswith(".sld"):
+            return self.respond(200, obj.get("body", b""), "application/vnd.ogc.sld+xml")
+        return self.respond(200, json.dumps({segments[-2].rstrip("s"): {"name": segments[-1]}}).encode("utf-8"))
+
+    def handle_post(self, body):
+        path, params, gwc = self._parse()
+        if gwc:
+            return self._gwc_seed("POST", path, body)
+        if path == "imports" or path.startswith("imports/"):
+            return self._post_import(path.split("/"), body)
+        match = _NAME.search(body)
+        if match is None:
+            try:
+                payload = json.loads(body or b"{}")
+                name = next(iter(payload.values())).get("name")
+            except (ValueError, AttributeError, StopIteration):
+                name = None
+        else:
+            name = match.group(1).decode("utf-8")
+        if path.split("/")[-1] not in COLLECTIONS or not name:
+            return self.respond(400, b"Unsupported POST", "text/plain")
+        catalog = self.server.catalog
+        with catalog.lock:
+            parent = path.rsplit("/", 1)[0] if "/" in path else None
+            if parent and parent not in catalog.objects:
+                return self.respond(404, b"No such parent", "text/plain")
+            if f"{path}/{name}" in catalog.objects:
+                return self.respond(409, b"Already exists", "text/plain")
+            catalog.objects[f"{path}/{name}"] = {}
+        return self.respond(201, name.encode("utf-8"), "text/plain")
+
+    def handle_put(self, body):
+        path, params, gwc = self._parse()
+        catalog = self.server.catalog
+        segments = path.split("/")
+        if segments[0] == "imports":
+            return self._put_import(segments, body)
+        with catalog.lock:
+            if segments[0] == "resource":
+                catalog.objects[path] = {"size": len(body)}
+                return self.respond(201)
+            if len(segments) == 5 and segments[2] == "datastores" and segments[4].startswith("file."):
+                store = "/".join(segments[:4])
+                created = store not in catalog.objects
+                catalog.objects.setdefault(store, {})
+                if params.get("configure", "first") != "none":
+                    native = _shapefile_name(body) if segments[4] == "file.shp" else None
+                    native = native or segments[3].removesuffix("_datastore")
+                    catalog.objects.setdefault(f"{store}/featuretypes/{native}", {})
+                return self.respond(201 if created else 200)
+            if segments[-1] == "reset":
+                return self.respond(200 if "/".join(segments[:-1]) in catalog.objects else 404)
+            if segments[0] == "layers" and len(segments) == 2:
+                workspace, name = catalog.resolve_layer(segments[1])
+                if not catalog.layer_exists(workspace, name):
+                    return self.respond(404, b"No such layer", "text/plain")
+                match = _NAME.search(body)
+                catalog.objects.setdefault(path, {})["default_style"] = match.group(1).decode() if match else None
+                return self.respond(200)
+            if path not in catalog.objects:
+                return self.respond(404, b"No such object", "text/plain")
+            if len(segments) >= 2 and segments[-2] == "styles":
+                catalog.objects[path]["body"] = body
+                return self.respond(200)
+            match = _NAME.search(body)
+            if match and match.group(1).decode("utf-8") != segments[-1]:
+                catalog.rename(path, match.group(1).decode("utf-8"))
+        return self.respond(200)
+
+    def handle_delete(self, body):
+        path, params, gwc = self._parse()
+        catalog = self.server.catalog
+        segments = path.split("/")
+        if segments[0] == "imports" and len(segments) == 4:
+            with catalog.lock:
+                removed = catalog.imports.get(segments[1], {}).get("tasks", {}).pop(segments[3], None)
+            return self.respond(204 if removed else 404)
+        with catalog.lock:
+            removed = catalog.remove(path)
+        return self.respond(200 if removed else 404)
+
+
+    # -------- GeoWebCache --------
+    def _gwc_seed(self, method, path, body):
+        catalog = self.server.catalog
+        layer = path.split("/", 1)[1] if path.startswith("seed/") else None
+        with catalog.lock:
+            seed = catalog.seeds.setdefault(layer, {"requests": [], "polls_left": 0, "killed": False}) \
+                if layer else None
+            if method == "GET":
+                tasks = []
+                if seed and seed["polls_left"] > 0 and not seed["killed"]:
+                    seed["polls_left"] -= 1
+                    # [tiles done, tiles total, seconds remaining, task id, state=running]
+                    tasks = [[10, 100, 5, task_id, 1] for task_id in range(len(seed["requests"]))]
+                return self.respond(200, json.dumps({"long-array-array": tasks}).encode("utf-8"))
+            if seed is not None:
+                if dict(parse_qsl(body.decode("utf-8"))).get("kill_all"):
+                    seed["killed"] = True
+                else:
+                    seed["requests"].append(json.loads(body)["seedRequest"])
+                    seed["polls_left"] = catalog.seed_polls
+        return self.respond(200)
+
+    # -------- Importer --------
+    def _import(self, import_id):
+        return self.server.catalog.imports.get(import_id)
+
+    def _get_import(self, segments):
+        with self.server.catalog.lock:
+            context = self._import(segments[1])
+            if context is None:
+                return self.respond(404, b"No such import", "text/plain")
+            if len(segments) == 3 and segments[2] == "tasks":
+                tasks = [{"id": int(task_id), "state": task["state"]} for task_id, task in context["tasks"].items()]
+                return self.respond(200, json.dumps({"tasks": tasks}).encode("utf-8"))
+            payload = {"import": {"id": int(segments[1]), "state": context["state"]}}
+        return self.respond(200, json.dumps(payload).encode("utf-8"))
+
+    def _post_import(self, segments, body):
+        catalog = self.server.catalog
+        with catalog.lock:
+            if len(segments) == 1:
+                payload = json.loads(body or b"{}")
+                workspace = payload.get("import", {}).get("targetWorkspace", {}).get("workspace", {}).get("name")
+                import_id = str(len(catalog.imports))
+                catalog.imports[import_id] = {"workspace": workspace, "state": "PENDING", "tasks": {}}
+                return self.respond(201, json.dumps({"import": {"id": int(import_id)}}).encode("utf-8"))
+            context = self._import(segments[1])
+            if context is None:
+                return self.respond(404, b"No such import", "text/plain")
+            # Runs synchronously; the client polls the import and finds it complete
+            workspace = context["workspace"]
+            for task in context["tasks"].values():
+                if task["state"] != "READY":
+                    continue
+                store = f"workspaces/{workspace}/datastores/{task['native']}"
+                layer_name = task["layer"] or task["native"]
+                catalog.objects.setdefault(store, {})
+                catalog.objects.setdefault(f"{store}/featuretypes/{layer_name}", {})
+                if task["style"]:
+                    catalog.objects[f"layers/{workspace}:{layer_name}"] = {"default_style": task["style"]}
+                task["state"] = "COMPLETE"
+            context["state"] = "COMPLETE"
+        return self.respond(204)
+
+    def _put_import(self, segments, body):
+        catalog = self.server.catalog
+        with catalog.lock:
+            context = self._import(segments[1])
+            if context is None:
+                return self.respond(404, b"No such import", "text/plain")
+            if len(segments) == 4 and segments[2] == "tasks":
+                native = _shapefile_name(body)
+                task_id = str(len(context["tasks"]))
+                context["tasks"][task_id] = {"native": native, "layer": None, "style": None,
+                                             "state": "READY" if native else "NO_FORMAT"}
+                payload = {"task": {"id": int(task_id), "state": context["tasks"][task_id]["state"]}}
+                return self.respond(201, json.dumps(payload).encode("utf-8"))
+            if len(segments) == 5 and segments[4] == "layer" and segments[3] in context["tasks"]:
+                layer = json.loads(body)["layer"]
+                style = layer.get("style", {}).get("name")
+                # GeoServer rejects a style it doesn't know
+                if style and not any(path in catalog.objects for path in
+                                     (f"workspaces/{context['workspace']}/styles/{style}", f"styles/{style}")):
+                    return self.respond(400, b"No such style", "text/plain")
+                context["tasks"][segments[3]].update(layer=layer["name"], style=style)
+                return self.respond(200)
+        return self.respond(404, b"No such task", "text/plain")
+
+
+def geoserver_stub_server(faults=None, catalog=None):
+    """StubServer for GeoServerStubHandler; the REST root is <url>geoserver/rest/."""
+    return StubServer(GeoServerStubHandler, faults=faults, catalog=catalog or Catalog())
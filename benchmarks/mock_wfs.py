@@ -0,0 +1,187 @@
+import hashlib
+import io
+import json
+import math
+import os
+import random
+import tempfile
+import threading
+import zipfile
+from urllib.parse import parse_qsl, urlparse
+from xml.sax.saxutils import escape
+from stub_http import StubHandler, StubServer
+
+# Synthetic data covers a box over Western Australia
+EXTENT = (113.0, -35.0, 129.0, -14.0)
+
+
+class SyntheticLayer:
+    """
+    A deterministic synthetic polygon layer.
+
+    Args:
+        name (str): Full typename, e.g. "bench:layer_0".
+        features (int): Number of features.
+        vertices (int): Vertices per polygon ring.
+        attributes (int): Extra numeric attribute columns.
+        seed (int): Random seed; the same seed always gives the same data.
+    """
+
+    def __init__(self, name, features=1000, vertices=32, attributes=4, seed=0):
+        self.name = name
+        self.features = features
+        self.vertices = vertices
+        self.attributes = attributes
+        self.seed = seed
+        self._rows = None
+        self._cache = {}
+        self._lock = threading.RLock()
+
+    def rows(self):
+        """[(properties, ring)] with ring as a closed list of (x, y)."""
+        with self._lock:
+            if self._rows is None:
+                rng = random.Random(self.seed)
+                minx, miny, maxx, maxy = EXTENT
+                rows = []
+                for fid in range(self.features):
+                    cx, cy = rng.uniform(minx, maxx), rng.uniform(miny, maxy)
+                    radius = rng.uniform(0.01, 0.2)
+                    ring = []
+                    for step in range(self.vertices):
+                        angle = 2 * math.pi * step / self.vertices
+                        r = radius * rng.uniform(0.7, 1.0)
+                        ring.append((round(cx + r * math.cos(angle), 6), round(cy + r * math.sin(angle), 6)))
+                    ring.append(ring[0])
+                    properties = {"fid": fid, "name": f"feature {fid}", "category": rng.choice("ABCDE")}
+                    properties.update({f"value_{i}": round(rng.uniform(0, 1000), 3) for i in range(self.attributes)})
+                    rows.append((properties, ring))
+                self._rows = rows
+            return self._rows
+
+    def geojson(self, start=0, count=None):
+        rows = self.rows()[start:None if count is None else start + count]
+        features = [{"type": "Feature", "id": f"{self.name}.{props['fid']}", "properties": props,
+                     "geometry": {"type": "Polygon", "coordinates": [ring]}} for props, ring in rows]
+        return json.dumps({"type": "FeatureCollection", "features": features}).encode("utf-8")
+
+    def csv(self, start=0, count=None):
+        rows = self.rows()[start:None if count is None else start + count]
+        columns = ["fid", "name", "category"] + [f"value_{i}" for i in range(self.attributes)]
+        lines = ["FID," + ",".join(columns) + ",geometry"]
+        for props, ring in rows:
+            wkt = "POLYGON ((" + ", ".join(f"{x} {y}" for x, y in ring) + "))"
+            lines.append(f"{self.name}.{props['fid']}," + ",".join(str(props[c]) for c in columns) + f',"{wkt}"')
+        return ("\n".join(lines) + "\n").encode("utf-8")
+
+    def shape_zip(self):
+        # Written once with the same geo stack the ingest uses
+        with self._lock:
+            if "zip" not in self._cache:
+                import geopandas as gpd
+                from shapely.geometry import Polygon
+                rows = self.rows()
+                gdf = gpd.GeoDataFrame([props for props, _ in rows],
+                                       geometry=[Polygon(ring) for _, ring in rows], crs="EPSG:4326")
+                local_name = self.name.split(":")[-1]
+                with tempfile.TemporaryDirectory() as tmpdir:
+                    gdf.to_file(os.path.join(tmpdir, f"{local_name}.shp"))
+                    buffer = io.BytesIO()
+                    with zipfile.ZipFile(buffer, "w", zipfile.ZIP_DEFLATED) as zf:
+                        for filename in sorted(os.listdir(tmpdir)):
+                            zf.write(os.path.join(tmpdir, filename), filename)
+                self._cache["zip"] = buffer.getvalue()
+            return self._cache["zip"]
+
+    def payload(self, output_format, start=0, count=None):
+        """Response body for one GetFeature request; each body is built once and reused."""
+        if output_format == "SHAPE-ZIP":
+            return self.shape_zip()
+        key = (output_format, start, count)
+        with self._lock:
+            cached = self._cache.get(key)
+        if cached is None:
+            cached = self.csv(start, count) if output_format == "csv" else self.geojson(start, count)
+            with self._lock:
+                self._cache[key] = cached
+        return cached
+
+
+def capabilities_xml(url, version, layers):
+    url = escape(url)
+    minx, miny, maxx, maxy = EXTENT
+    if version.startswith("2"):
+        feature_types = "".join(
+            f"<wfs:FeatureType><wfs:Name>{escape(layer.name)}</wfs:Name><wfs:Title>{escape(layer.name)}</wfs:Title>"
+            f"<wfs:DefaultCRS>urn:ogc:def:crs:EPSG::4326</wfs:DefaultCRS>"
+            f"<ows:WGS84BoundingBox><ows:LowerCorner>{minx} {miny}</ows:LowerCorner>"
+            f"<ows:UpperCorner>{maxx} {maxy}</ows:UpperCorner></ows:WGS84BoundingBox></wfs:FeatureType>"
+            for layer in layers)
+        return (
+            '<?xml version="1.0" encoding="UTF-8"?>'
+            '<wfs:WFS_Capabilities version="2.0.0" xmlns:wfs="http://www.opengis.net/wfs/2.0" '
+            'xmlns:ows="http://www.opengis.net/ows/1.1" xmlns:xlink="http://www.w3.org/1999/xlink" '
+            'xmlns:bench="http://bench">'
+            "<ows:ServiceIdentification><ows:Title>Mock WFS</ows:Title><ows:ServiceType>WFS</ows:ServiceType>"
+            "<ows:ServiceTypeVersion>2.0.0</ows:ServiceTypeVersion></ows:ServiceIdentification>"
+            "<ows:OperationsMetadata>"
+            f'<ows:Operation name="GetFeature"><ows:DCP><ows:HTTP><ows:Get xlink:href="{url}"/>'
+            "</ows:HTTP></ows:DCP></ows:Operation></ows:OperationsMetadata>"
+            f"<wfs:FeatureTypeList>{feature_types}</wfs:FeatureTypeList></wfs:WFS_Capabilities>"
+        ).encode("utf-8")
+    feature_types = "".join(
+        f"<FeatureType><Name>{escape(layer.name)}</Name><Title>{escape(layer.name)}</Title><SRS>EPSG:4326</SRS>"
+        f'<LatLongBoundingBox minx="{minx}" miny="{miny}" maxx="{maxx}" maxy="{maxy}"/></FeatureType>'
+        for layer in layers)
+    return (
+        '<?xml version="1.0" encoding="UTF-8"?>'
+        '<WFS_Capabilities version="1.0.0" xmlns="http://www.opengis.net/wfs" xmlns:bench="http://bench">'
+        f"<Service><Name>WFS</Name><Title>Mock WFS</Title><OnlineResource>{url}</OnlineResource></Service>"
+        f'<Capability><Request><GetFeature><DCPType><HTTP><Get onlineResource="{url}"/></HTTP></DCPType>'
+        "</GetFeature></Request></Capability>"
+        f"<FeatureTypeList>{feature_types}</FeatureTypeList></WFS_Capabilities>"
+    ).encode("utf-8")
+
+
+class MockWfsHandler(StubHandler):
+    """
+    GetCapabilities (1.0.0 and 2.0.0), GetFeature as GeoJSON, CSV (WKT) or
+    SHAPE-ZIP, resultType=hits and count/startIndex paging. Responses carry
+    an ETag and honour If-None-Match.
+    """
+
+    def handle_get(self, body):
+        query = {key.lower(): value for key, value in parse_qsl(urlparse(self.path).query)}
+        request = query.get("request", "").lower()
+        layers = self.server.layers
+        if request == "getcapabilities":
+            url = f"http://{self.headers['Host']}{urlparse(self.path).path}"
+            return self.respond(200, capabilities_xml(url, query.get("version", "2.0.0"), layers.values()),
+                                "text/xml")
+        if request != "getfeature":
+            return self.respond(400, b"Unsupported request", "text/plain")
+
+        layer = layers.get(query.get("typenames") or query.get("typename"))
+        if layer is None:
+            return self.respond(404, b"Unknown typename", "text/plain")
+        if query.get("resulttype") == "hits":
+            return self.respond(200, (
+                '<?xml version="1.0"?><wfs:FeatureCollection xmlns:wfs="http://www.opengis.net/wfs/2.0" '
+                f'numberMatched="{layer.features}" numberReturned="0"/>').encode("utf-8"), "text/xml")
+
+        output_format = query.get("outputformat", "GeoJSON")
+        start = int(query.get("startindex", 0))
+        count = int(query["count"]) if "count" in query else None
+        payload = layer.payload(output_format, start, count)
+        etag = '"' + hashlib.sha1(payload).hexdigest() + '"'
+        if self.headers.get("If-None-Match") == etag:
+            return self.respond(304, headers={"ETag": etag})
+        content_type = {"csv": "text/csv", "SHAPE-ZIP": "application/zip"}.get(output_format, "application/json")
+        with self.server.stats_lock:
+            self.server.stats["bytes_sent"] = self.server.stats.get("bytes_sent", 0) + len(payload)
+        return self.respond(200, payload, content_type, headers={"ETag": etag})
+
+
+def mock_wfs_server(layers, faults=None):
+    """StubServer for MockWfsHandler serving the given SyntheticLayers; the WFS endpoint is <url>wfs."""
+    return StubServer(MockWfsHandler, faults=faults, layers={layer.name: layer for layer in layers})
@@ -0,0 +1,248 @@
+import argparse
+import json
+import os
+import resource
+import shutil
+import sys
+import tempfile
+import time
+import yaml
+from mock_wfs import SyntheticLayer, mock_wfs_server
+from geoserver_stub import geoserver_stub_server
+from stub_http import Faults
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+BENCH_REGION = "BENCH"
+SLD_TEMPLATE = """<?xml version="1.0" encoding="UTF-8"?>
+<StyledLayerDescriptor version="1.0.0" xmlns="http://www.opengis.net/sld" xmlns:ogc="http://www.opengis.net/ogc">
+  <NamedLayer><Name>{name}</Name><UserStyle><FeatureTypeStyle><Rule><PolygonSymbolizer>
+    <Fill><CssParameter name="fill">#{color:06x}</CssParameter></Fill>
+  </PolygonSymbolizer></Rule></FeatureTypeStyle></UserStyle></NamedLayer>
+</StyledLayerDescriptor>
+"""
+# Metrics compared against a baseline; True when higher is better
+REGRESSION_METRICS = {"layers_per_min": True, "bytes_per_second": True, "rest_calls_per_layer": False,
+                      "peak_rss_mb": False}
+
+
+def _peak_rss_mb():
+    # ru_maxrss is in KiB on Linux; convert workers show up under RUSAGE_CHILDREN
+    return (resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+            + resource.getrusage(resource.RUSAGE_CHILDREN).ru_maxrss) / 1024
+
+
+def _latency(value):
+    low, _, high = value.partition(",")
+    return (float(low), float(high)) if high else float(low)
+
+
+def write_job_files(layers, formats, wfs_url, version, work_dir, regions=1):
+    """Writes a final_output.jsonl-style job file and a styles_path_details.jsonl-style style file."""
+    region_entries = [{"region": f"{BENCH_REGION}{index}" if regions > 1 else BENCH_REGION, "layers": []}
+                      for index in range(regions)]
+    style_records = []
+    for index, layer in enumerate(layers):
+        local_name = layer.name.split(":")[-1]
+        region_entry = region_entries[index % regions]
+        region_entry["layers"].append({
+            "wfs_layer_name": layer.name,
+            "wfs_layer_search_name": local_name,
+            "link": f"{wfs_url}wfs",
+            "rx_layer_name": f"Benchmark layer {index}",
+            "link_type": "WFS",
+            "output_format": formats[index % len(formats)],
+            "version": version,
+            "standard_layer_name": f"bench_{local_name}",
+        })
+        sld_path = os.path.join(work_dir, "styles", f"{local_name}.sld")
+        os.makedirs(os.path.dirname(sld_path), exist_ok=True)
+        with open(sld_path, "w", encoding="utf-8") as f:
+            f.write(SLD_TEMPLATE.format(name=local_name, color=(index * 2654435761) & 0xFFFFFF))
+        style_records.append({"workspace": f"{region_entry['region']}_v2", "layer": f"bench_{local_name}",
+                              "style_name": f"bench_{local_name}_style", "style_path": sld_path})
+
+    jobs_path = os.path.join(work_dir, "bench_jobs.jsonl")
+    styles_path = os.path.join(work_dir, "bench_styles.jsonl")
+    with open(jobs_path, "w", encoding="utf-8") as f:
+        f.writelines(json.dumps(entry) + "\n" for entry in region_entries)
+    with open(styles_path, "w", encoding="utf-8") as f:
+        f.writelines(json.dumps(record) + "\n" for record in style_records)
+    return jobs_path, styles_path
+
+
+def run_benchmark(args):
+    formats = args.formats.split(",")
+    layers = [SyntheticLayer(f"bench:layer_{index}", args.features, args.vertices, args.attributes, seed=index)
+              for index in range(args.layers)]
+    # Build the payloads up front so generating them isn't timed as download
+    for index, layer in enumerate(layers):
+        output_format = formats[index % len(formats)]
+        if args.page_size and output_format != "SHAPE-ZIP" and args.wfs_version.startswith("2"):
+            for start in range(0, layer.features, args.page_size):
+                layer.payload(output_format, start, args.page_size)
+        else:
+            layer.payload(output_format)
+
+    work_dir = args.work_dir or tempfile.mkdtemp(prefix="geoserver-bench-")
+    os.makedirs(work_dir, exist_ok=True)
+    cwd = os.getcwd()
+    wfs = mock_wfs_server(layers, Faults(_latency(args.wfs_latency), args.wfs_error_rate)).start()
+    geoserver = geoserver_stub_server(Faults(_latency(args.rest_latency), args.rest_error_rate)).start()
+    try:
+        config_path = os.path.join(work_dir, "geoserver_config.yaml")
+        with open(config_path, "w", encoding="utf-8") as f:
+            yaml.safe_dump({"benchmark": {"url": f"{geoserver.url}geoserver/rest/", "username": "admin",
+                                          "password": "geoserver"}}, f)
+        os.environ["GEOSERVER_CONFIG"] = config_path
+        os.environ["GEOSERVER_PROFILE"] = "benchmark"
+        jobs_path, styles_path = write_job_files(layers, formats, wfs.url, args.wfs_version, work_dir, args.regions)
+        # Logs and outputs land in the work dir, not the checkout
+        os.chdir(work_dir)
+
+        # Imported after the environment points the REST helpers at the stub
+        from ingest_wfs_wms_layers_geoserver import process_regions
+        from create_geoserver_instances import get_client, upload_and_assign_style
+        from fetch_data_layers import upstream_session
+        from catalog_snapshot import CatalogSnapshot
+        from ingest_metrics import IngestMetrics
+        from style_sync import sync_styles
+
+        with open(jobs_path, encoding="utf-8") as f:
+            region_entries = [json.loads(line) for line in f if line.strip()]
+        with open(styles_path, encoding="utf-8") as f:
+            style_records = [json.loads(line) for line in f if line.strip()]
+
+        client = get_client()
+        metrics = IngestMetrics()
+        metrics.observe_client(client)
+        metrics.observe_session(upstream_session)
+        rss_before = _peak_rss_mb()
+        fetch_options = {"page_size": args.page_size} if args.page_size else None
+
+        started = time.perf_counter()
+        process_regions(region_entries, output_dir="bench_output", region_workers=args.region_workers,
+                        layer_workers=args.layer_workers, fetch_options=fetch_options,
+                        convert_workers=args.convert_workers,
+                        snapshot=CatalogSnapshot(client) if args.catalog_snapshot else None, metrics=metrics,
+                        publish_mode=args.publish)
+        ingest_seconds = time.perf_counter() - started
+        ingest_requests = geoserver.stats["requests"]
+
+        started = time.perf_counter()
+        if args.style_sync:
+            sync_styles(style_records, max_workers=args.style_workers)
+        else:
+            for record in style_records:
+                upload_and_assign_style(record["workspace"], record["layer"], record["style_name"],
+                                        record["style_path"])
+        style_seconds = time.perf_counter() - started
+
+        with open("geoserver_logs.jsonl", encoding="utf-8") as f:
+            entries = [json.loads(line) for line in f if line.strip()]
+        succeeded = sum(entry["status"] == "success" for entry in entries)
+        layer_stats = metrics.layers.values()
+        bytes_downloaded = sum(layer["bytes_downloaded"] for layer in layer_stats)
+        stage_totals = {}
+        for layer in layer_stats:
+            for stage, seconds in layer["stages"].items():
+                stage_totals[stage] = stage_totals.get(stage, 0.0) + seconds
+
+        return {
+            "timestamp": time.time(),
+            "config": {key: value for key, value in vars(args).items() if key not in ("baseline", "json")},
+            "layers": len(entries),
+            "layers_succeeded": succeeded,
+            "ingest_seconds": round(ingest_seconds, 3),
+            "layers_per_min": round(succeeded / ingest_seconds * 60, 2) if ingest_seconds else 0.0,
+            "bytes_downloaded": bytes_downloaded,
+            "bytes_per_second": round(bytes_downloaded / ingest_seconds) if ingest_seconds else 0,
+            "rest_calls_per_layer": round(ingest_requests / max(len(entries), 1), 2),
+            "rest_calls_by_layer": {key: layer["rest_calls"] for key, layer in metrics.layers.items()},
+            "stage_seconds": {stage: round(seconds, 3) for stage, seconds in stage_totals.items()},
+            "style_seconds": round(style_seconds, 3),
+            "style_rest_calls": geoserver.stats["requests"] - ingest_requests,
+            "peak_rss_mb": round(_peak_rss_mb(), 1),
+            "rss_before_ingest_mb": round(rss_before, 1),
+            "wfs_requests": wfs.stats["requests"],
+            "injected_errors": wfs.stats["injected_errors"] + geoserver.stats["injected_errors"],
+        }
+    finally:
+        os.chdir(cwd)
+        wfs.stop()
+        geoserver.stop()
+        if not args.keep and not args.work_dir:
+            shutil.rmtree(work_dir, ignore_errors=True)
+
+
+def compare(result, baseline, tolerance):
+    """Names of the metrics that are more than tolerance (a fraction) worse than in baseline."""
+    regressions = []
+    for metric, higher_is_better in REGRESSION_METRICS.items():
+        old, new = baseline.get(metric), result.get(metric)
+        if not old or new is None:
+            continue
+        change = (new - old) / old
+        if (-change if higher_is_better else change) > tolerance:
+            regressions.append(f"{metric}: {old} -> {new} ({change:+.0%})")
+    return regressions
+
+
+def print_report(result):
+    print(f"\n[i] {result['layers_succeeded']}/{result['layers']} layers in {result['ingest_seconds']}s")
+    print(f"    layers/min:        {result['layers_per_min']}")
+    print(f"    bytes/s:           {result['bytes_per_second']:,} ({result['bytes_downloaded']:,} bytes)")
+    print(f"    REST calls/layer:  {result['rest_calls_per_layer']}")
+    print(f"    peak RSS:          {result['peak_rss_mb']} MB ({result['rss_before_ingest_mb']} MB before ingest)")
+    print(f"    stage seconds:     {result['stage_seconds']}")
+    print(f"    styles:            {result['style_seconds']}s, {result['style_rest_calls']} REST calls")
+    if result["injected_errors"]:
+        print(f"    injected errors:   {result['injected_errors']}")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(
+        description="End-to-end ingest benchmark against a local mock WFS and GeoServer REST stub.")
+    parser.add_argument("--layers", type=int, default=8)
+    parser.add_argument("--features", type=int, default=2000, help="Features per layer.")
+    parser.add_argument("--vertices", type=int, default=32, help="Vertices per polygon.")
+    parser.add_argument("--attributes", type=int, default=4, help="Extra numeric columns per layer.")
+    parser.add_argument("--formats", default="GeoJSON,csv,SHAPE-ZIP",
+                        help="Comma-separated output formats, assigned to layers round-robin.")
+    parser.add_argument("--wfs-version", default="2.0.0", choices=["1.0.0", "2.0.0"])
+    parser.add_argument("--page-size", type=int, default=0, help="WFS 2.0 page size; 0 fetches each layer whole.")
+    parser.add_argument("--regions", type=int, default=1, help="Spread the layers over this many regions.")
+    parser.add_argument("--region-workers", type=int, default=1)
+    parser.add_argument("--layer-workers", type=int, default=1)
+    parser.add_argument("--convert-workers", type=int, default=0)
+    parser.add_argument("--no-catalog-snapshot", dest="catalog_snapshot", action="store_false")
+    parser.add_argument("--publish", default="per-layer", choices=["per-layer", "importer"])
+    parser.add_argument("--style-sync", action="store_true", help="Use sync_styles instead of upload_and_assign_style.")
+    parser.add_argument("--style-workers", type=int, default=8)
+    parser.add_argument("--wfs-latency", default="0", help="Seconds, or 'min,max', added to each WFS response.")
+    parser.add_argument("--wfs-error-rate", type=float, default=0.0)
+    parser.add_argument("--rest-latency", default="0", help="Seconds, or 'min,max', added to each REST response.")
+    parser.add_argument("--rest-error-rate", type=float, default=0.0)
+    parser.add_argument("--work-dir", help="Keep outputs here instead of a temporary directory.")
+    parser.add_argument("--keep", action="store_true", help="Don't delete the temporary work directory.")
+    parser.add_argument("--json", help="Append the result as one JSON line to this file.")
+    parser.add_argument("--baseline", help="A --json results file to compare against (its last line).")
+    parser.add_argument("--tolerance", type=float, default=0.2, help="Allowed fractional regression vs baseline.")
+    args = parser.parse_args()
+
+    result = run_benchmark(args)
+    print_report(result)
+    if args.json:
+        with open(args.json, "a", encoding="utf-8") as f:
+            f.write(json.dumps(result) + "\n")
+    if args.baseline:
+        with open(args.baseline, encoding="utf-8") as f:
+            baseline = json.loads([line for line in f if line.strip()][-1])
+        if baseline.get("config") != result["config"]:
+            print("[!] The baseline was run with a different configuration")
+        regressions = compare(result, baseline, args.tolerance)
+        for regression in regressions:
+            print(f"[✗] Regression: {regression}")
+        if regressions:
+            sys.exit(1)
+        print(f"[✓] Within {args.tolerance:.0%} of the baseline")
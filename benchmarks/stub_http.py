@@ -0,0 +1,121 @@
+import random
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+
+class Faults:
+    """
+    Latency and error injection shared by the stub servers.
+
+    Args:
+        latency (float | tuple): Seconds added to every response, or a
+                                 (min, max) range drawn uniformly.
+        error_rate (float): Fraction of requests answered with error_status.
+        error_status (int): Status returned for injected errors.
+        seed (int): Random seed, so runs inject the same faults.
+    """
+
+    def __init__(self, latency=0.0, error_rate=0.0, error_status=503, seed=0):
+        self.latency = latency
+        self.error_rate = error_rate
+        self.error_status = error_status
+        self._random = random.Random(seed)
+        self._lock = threading.Lock()
+
+    def apply(self):
+        """Sleeps for the injected latency. Returns an error status to send instead of the response, or None."""
+        with self._lock:
+            delay = self._random.uniform(*self.latency) if isinstance(self.latency, tuple) else self.latency
+            failed = self._random.random() < self.error_rate
+        if delay:
+            time.sleep(delay)
+        return self.error_status if failed else None
+
+
+class StubHandler(BaseHTTPRequestHandler):
+    """Base handler: counts requests on the server and applies its Faults before dispatching."""
+
+    protocol_version = "HTTP/1.1"
+    # Headers and body go out as separate writes; with Nagle on, keep-alive clients stall ~40 ms per call
+    disable_nagle_algorithm = True
+
+    def log_message(self, *args):
+        pass
+
+    def _dispatch(self, method):
+        server = self.server
+        with server.stats_lock:
+            server.stats["requests"] += 1
+            key = f"{method} {self.path.split('?', 1)[0]}"
+            server.stats["by_path"][key] = server.stats["by_path"].get(key, 0) + 1
+        body = self.rfile.read(int(self.headers.get("Content-Length") or 0))
+        error_status = server.faults.apply()
+        if error_status:
+            with server.stats_lock:
+                server.stats["injected_errors"] += 1
+            return self.respond(error_status, b"Injected error", "text/plain")
+        return getattr(self, f"handle_{method.lower()}")(body)
+
+    def do_GET(self):
+        self._dispatch("GET")
+
+    def do_POST(self):
+        self._dispatch("POST")
+
+    def do_PUT(self):
+        self._dispatch("PUT")
+
+    def do_DELETE(self):
+        self._dispatch("DELETE")
+
+    def respond(self, status, body=b"", content_type="application/json", headers=None):
+        self.send_response(status)
+        self.send_header("Content-Type", content_type)
+        self.send_header("Content-Length", str(len(body)))
+        for name, value in (headers or {}).items():
+            self.send_header(name, value)
+        self.end_headers()
+        if body and self.command != "HEAD":
+            self.wfile.write(body)
+
+
+class StubServer:
+    """
+    Runs a StubHandler subclass on a background thread at 127.0.0.1 on a free
+    port. Attributes given as state are set on the HTTP server, where the
+    handler reads them as self.server.<name>.
+    """
+
+    def __init__(self, handler_class, faults=None, **state):
+        self.httpd = ThreadingHTTPServer(("127.0.0.1", 0), handler_class)
+        self.httpd.daemon_threads = True
+        self.httpd.faults = faults or Faults()
+        self.httpd.stats = {"requests": 0, "injected_errors": 0, "by_path": {}}
+        self.httpd.stats_lock = threading.Lock()
+        for name, value in state.items():
+            setattr(self.httpd, name, value)
+        self._thread = threading.Thread(target=self.httpd.serve_forever, daemon=True)
+
+    @property
+    def url(self):
+        return f"http://127.0.0.1:{self.httpd.server_address[1]}/"
+
+    @property
+    def stats(self):
+        with self.httpd.stats_lock:
+            return {**self.httpd.stats, "by_path": dict(self.httpd.stats["by_path"])}
+
+    def start(self):
+        self._thread.start()
+        return self
+
+    def stop(self):
+        self.httpd.shutdown()
+        self.httpd.server_close()
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, *exc):
+        self.stop()
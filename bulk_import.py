@@ -0,0 +1,153 @@
+import os
+import threading
+import time
+from collections import namedtuple
+from create_geoserver_instances import get_client, rest_url
+
+# Importer task states that can be executed / that mean the layer was published
+READY_STATES = {"READY"}
+DONE_STATES = {"COMPLETE"}
+FINAL_IMPORT_STATES = {"COMPLETE", "COMPLETE_ERRORS", "INIT_ERROR"}
+
+ImportItem = namedtuple("ImportItem", ["zip_path", "layer_name", "style", "on_done"])
+
+
+def _task_id(payload):
+    # One file gives {"task": {...}}; an archive with several datasets gives {"tasks": [...]}
+    tasks = payload.get("tasks") or [payload.get("task")]
+    return tasks[0]["id"] if tasks and tasks[0] else None
+
+
+class BulkImporter:
+    """
+    Publishes a region's new shapefile zips through the GeoServer Importer
+    extension in one import context: every zip becomes a task, each task
+    gets its target layer name (and style), and the context runs once. That
+    replaces the per-layer datastore PUT, featuretype check and rename, and
+    lets GeoServer do one round of catalog work for the whole region.
+
+    Layers are added from the layer threads with add(); run() executes the
+    context and calls each item's on_done("created") or on_done(None).
+    The last run's duration (up to the callbacks) is kept in seconds.
+    Only brand-new layers should go through here; replacing an existing
+    layer's data stays a single in-place overwrite of its store.
+
+    Args:
+        workspace (str): Target workspace.
+        snapshot (CatalogSnapshot): Updated with the imported layers.
+        poll_interval (float): Seconds between import state checks.
+        timeout (float): Give up waiting for the import after this long.
+    """
+
+    def __init__(self, workspace, snapshot=None, poll_interval=2, timeout=1800):
+        self.workspace = workspace
+        self.snapshot = snapshot
+        self.poll_interval = poll_interval
+        self.timeout = timeout
+        self.items = []
+        self.seconds = 0.0
+        self._lock = threading.Lock()
+
+    def add(self, zip_path, layer_name, style=None, on_done=None):
+        with self._lock:
+            self.items.append(ImportItem(zip_path, layer_name, style, on_done))
+
+    def run(self):
+        """Runs the import. Returns {layer_name: "created" or None}."""
+        with self._lock:
+            items, self.items = self.items, []
+        if not items:
+            return {}
+        client = get_client()
+        results = {item.layer_name: None for item in items}
+        started = time.perf_counter()
+        try:
+            import_url = self._create_context(client)
+            if import_url:
+                tasks = self._add_tasks(client, import_url, items)
+                if tasks and self._execute(client, import_url):
+                    states = self._task_states(client, import_url)
+                    for task_id, item in tasks.items():
+                        if states.get(task_id) in DONE_STATES:
+                            results[item.layer_name] = "created"
+                        else:
+                            print(f"[✗] Import task for '{item.layer_name}' ended as {states.get(task_id)}")
+        except Exception as e:
+            print(f"[✗] Bulk import into '{self.workspace}' failed: {e}")
+        self.seconds = time.perf_counter() - started
+
+        created = [name for name, outcome in results.items() if outcome]
+        print(f"[{'✓' if len(created) == len(items) else '✗'}] Imported {len(created)}/{len(items)} layers "
+              f"into '{self.workspace}'")
+        for item in items:
+            if results[item.layer_name] and self.snapshot is not None:
+                self.snapshot.add("featuretypes", self.workspace, item.layer_name)
+            if item.on_done:
+                item.on_done(results[item.layer_name])
+        return results
+
+    def _create_context(self, client):
+        payload = {"import": {"targetWorkspace": {"workspace": {"name": self.workspace}}}}
+        response = client.post(f"{rest_url()}imports", json=payload)
+        if response.status_code not in [200, 201]:
+            print(f"[✗] Could not create import context: {response.status_code} {response.text}")
+            return None
+        import_id = response.json()["import"]["id"]
+        print(f"[+] Import context {import_id} created for '{self.workspace}'")
+        return f"{rest_url()}imports/{import_id}"
+
+    def _add_tasks(self, client, import_url, items):
+        """Uploads each zip as a task and sets its target layer. Returns {task_id: item} for the ready tasks."""
+        tasks = {}
+        for item in items:
+            with open(item.zip_path, "rb") as f:
+                response = client.put(f"{import_url}/tasks/{os.path.basename(item.zip_path)}", data=f,
+                                      headers={"Content-type": "application/zip"})
+            task_id = _task_id(response.json()) if response.status_code in [200, 201] else None
+            if task_id is None:
+                print(f"[✗] Could not add '{item.layer_name}' to the import: {response.status_code} {response.text}")
+                continue
+
+            layer = {"name": item.layer_name, **({"style": {"name": item.style}} if item.style else {})}
+            response = client.put(f"{import_url}/tasks/{task_id}/layer", json={"layer": layer})
+            if response.status_code not in [200, 201, 204] and item.style:
+                # An unknown style shouldn't cost the layer; publish it with the default style instead
+                print(f"[!] Style '{item.style}' not accepted for '{item.layer_name}'; using the default style")
+                response = client.put(f"{import_url}/tasks/{task_id}/layer", json={"layer": {"name": item.layer_name}})
+            if response.status_code not in [200, 201, 204]:
+                print(f"[✗] Could not name import task for '{item.layer_name}': {response.status_code}")
+                client.delete(f"{import_url}/tasks/{task_id}")
+                continue
+            tasks[task_id] = item
+
+        # Tasks that need input (NO_CRS, NO_BOUNDS, ...) would block the run, so they are dropped
+        states = self._task_states(client, import_url)
+        for task_id, item in list(tasks.items()):
+            if states.get(task_id) not in READY_STATES:
+                print(f"[✗] Import task for '{item.layer_name}' is {states.get(task_id)}; skipping it")
+                client.delete(f"{import_url}/tasks/{task_id}")
+                del tasks[task_id]
+        return tasks
+
+    def _task_states(self, client, import_url):
+        response = client.get(f"{import_url}/tasks")
+        if response.status_code != 200:
+            return {}
+        tasks = response.json().get("tasks") or []
+        return {task["id"]: task.get("state") for task in tasks}
+
+    def _execute(self, client, import_url):
+        response = client.post(import_url, params={"async": "true"})
+        if response.status_code not in [200, 201, 202, 204]:
+            print(f"[✗] Import run failed to start: {response.status_code} {response.text}")
+            return False
+        deadline = time.monotonic() + self.timeout
+        while True:
+            response = client.get(import_url)
+            state = response.json()["import"].get("state") if response.status_code == 200 else None
+            if state in FINAL_IMPORT_STATES:
+                return True
+            if time.monotonic() >= deadline:
+                print(f"[✗] Import {import_url} still {state} after {self.timeout}s")
+                return False
+            time.sleep(self.poll_interval)
@@ -0,0 +1,342 @@
+import argparse
+import json
+import multiprocessing
+from collections import namedtuple
+from concurrent.futures import ThreadPoolExecutor, ProcessPoolExecutor, wait, FIRST_COMPLETED
+from create_geoserver_instances import (
+    rest_url,
+    get_client,
+    create_workspace,
+    create_or_update_wms_datastore,
+    create_or_update_wms_layer,
+    update_shapefile_layername,
+    output_datastore,
+    layer_datastore,
+)
+from catalog_snapshot import CatalogSnapshot
+from concurrency import HostLimiter
+from ingest_state import LayerStateStore
+from style_sync import read_sld, sld_digest, remote_sld_digest, sync_style, current_default_style, assign_style
+
+# op: create | update | delete | rename | assign
+# kind: workspace | wmsstore | wmslayer | wfslayer | featuretype | style | layer | datastore
+PlanAction = namedtuple("PlanAction", ["action_id", "op", "kind", "workspace", "name", "depends_on", "details"])
+
+
+def _normalise(name):
+    return name.replace(":", "_").replace(" ", "_").replace(".", "_")
+
+
+def load_jsonl(path):
+    with open(path, encoding="utf-8") as f:
+        return [json.loads(line) for line in f if line.strip()]
+
+
+class _PlanBuilder:
+    def __init__(self):
+        self.actions = []
+        self._ids = {}
+
+    def add(self, op, kind, workspace, name, depends_on=(), **details):
+        action_id = len(self.actions)
+        deps = tuple(dep for dep in depends_on if dep is not None)
+        self.actions.append(PlanAction(action_id, op, kind, workspace, name, deps, details))
+        self._ids[(kind, workspace, name)] = action_id
+        return action_id
+
+    def id_of(self, kind, workspace, name):
+        return self._ids.get((kind, workspace, name))
+
+
+def build_plan(region_entries, style_records, snapshot, refresh_data=False, prune=False, max_workers=16,
+               output_backend="shapefile", backend_options=None, optimize=None):
+    """
+    Diffs the layers in final_output.jsonl and the styles in
+    styles_path_details.jsonl against the live catalog and returns the
+    minimal list of PlanActions needed to reconcile them, each naming the
+    actions it depends on.
+
+    refresh_data adds an "update" for every already published WFS layer
+    (re-fetch and re-upload, still subject to incremental skipping when
+    apply_plan gets a state_store in layer_options). prune deletes layers
+    and stores in the managed "<region>_v2" workspaces that the job file no
+    longer mentions, but never a store that still backs a wanted layer.
+
+    output_backend and backend_options must match the ones apply_plan
+    publishes with, since they decide which store each WFS layer lives in
+    (e.g. the workspace's one PostGIS store); so must optimize, whose
+    simplify_tolerances add the simplified variant layers and stores that
+    prune has to keep.
+    """
+    plan = _PlanBuilder()
+
+    def ensure_workspace(workspace):
+        action_id = plan.id_of("workspace", workspace, workspace)
+        if action_id is None and not snapshot.workspace_exists(workspace):
+            action_id = plan.add("create", "workspace", workspace, workspace)
+        return action_id
+
+    for region_entry in region_entries:
+        region = region_entry["region"]
+        workspace = f"{region}_v2"
+        workspace_action = ensure_workspace(workspace)
+        wanted = {"wmsstores": set(), "datastores": set(), "layers": set()}
+        wms_stores = {}
+
+        for layer in region_entry.get("layers", []):
+            link_type = layer.get("link_type", "WFS").upper()
+            search_name = layer["wfs_layer_search_name"]
+            standard_layer_name = layer["standard_layer_name"]
+            wanted["layers"].add(standard_layer_name)
+
+            if link_type == "WMS":
+                if layer["link"] not in wms_stores:
+                    store = f"{region.lower()}_wms_{_normalise(search_name)}"
+                    wms_stores[layer["link"]] = store
+                    if not snapshot.exists("wmsstores", workspace, store):
+                        plan.add("create", "wmsstore", workspace, store, [workspace_action], link=layer["link"])
+                store = wms_stores[layer["link"]]
+                wanted["wmsstores"].add(store)
+                if not snapshot.exists("wmslayers", workspace, standard_layer_name):
+                    plan.add("create", "wmslayer", workspace, standard_layer_name,
+                             [workspace_action, plan.id_of("wmsstore", workspace, store)],
+                             store=store, native_name=search_name)
+
+            elif link_type == "WFS":
+                native_name = _normalise(search_name)
+                # Ontario's OMI extracts are always shapefiles, as in process_region_layers
+                backend = "shapefile" if region == "Ontario" else layer.get("output_backend", output_backend)
+                datastore = output_datastore(backend, backend_options, workspace, native_name)
+                wanted["datastores"].add(datastore)
+                tolerances = {**(optimize or {}), **layer.get("optimize", {})}.get("simplify_tolerances", [])
+                if tolerances:
+                    # Imported lazily like process_region_layers, so plans without variants skip the geo stack
+                    from cleanup_layers_and_extract_shp_details import variant_name
+                    for tolerance in tolerances:
+                        wanted["layers"].add(variant_name(standard_layer_name, tolerance))
+                        wanted["datastores"].add(output_datastore(backend, backend_options, workspace,
+                                                                  variant_name(native_name, tolerance)))
+                if snapshot.exists("featuretypes", workspace, standard_layer_name):
+                    if refresh_data:
+                        plan.add("update", "wfslayer", workspace, standard_layer_name, [workspace_action],
+                                 region=region, layer=layer)
+                elif snapshot.exists("featuretypes", workspace, native_name):
+                    # Still published under its native name until the rename runs
+                    wanted["layers"].add(native_name)
+                    plan.add("rename", "featuretype", workspace, standard_layer_name, [workspace_action],
+                             datastore=datastore, native_name=native_name)
+                else:
+                    plan.add("create", "wfslayer", workspace, standard_layer_name, [workspace_action],
+                             region=region, layer=layer)
+
+        if prune and snapshot.workspace_exists(workspace):
+            for name in sorted(snapshot.names("featuretypes", workspace) | snapshot.names("wmslayers", workspace)):
+                if name not in wanted["layers"]:
+                    plan.add("delete", "layer", workspace, name)
+            # The store that actually backs a wanted layer is kept, whatever it is called (the importer names
+            # stores after the shapefile); one GET per published layer, fetched concurrently
+            published = sorted(snapshot.names("featuretypes", workspace) & wanted["layers"])
+            with ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="plan") as executor:
+                stores = list(executor.map(lambda name: layer_datastore(workspace, name), published))
+            wanted["datastores"].update(store for store in stores if store)
+            prune_kinds = [("wmsstores", wanted["wmsstores"])]
+            if None in stores:
+                unknown = [name for name, store in zip(published, stores) if store is None]
+                print(f"[!] Not pruning datastores in '{workspace}': no store found for {', '.join(unknown)}")
+            else:
+                prune_kinds.insert(0, ("datastores", wanted["datastores"]))
+            for kind, wanted_names in prune_kinds:
+                for name in sorted(snapshot.names(kind, workspace) - wanted_names):
+                    layer_deletes = [a.action_id for a in plan.actions
+                                     if a.op == "delete" and a.kind == "layer" and a.workspace == workspace]
+                    plan.add("delete", kind[:-1], workspace, name, layer_deletes)
+
+    # Style content and layer assignments need one GET each; fetch them concurrently
+    styles = {}
+    for record in style_records:
+        styles.setdefault((record["workspace"], record["style_name"]), record["style_path"])
+
+    def style_state(item):
+        (workspace, style_name), sld_path = item
+        try:
+            sld_content = read_sld(sld_path)
+        except Exception as e:
+            print(f"[!] Skipping style '{style_name}', unreadable SLD '{sld_path}': {e}")
+            return item, None
+        if not snapshot.exists("styles", workspace, style_name):
+            return item, "create"
+        if remote_sld_digest(workspace, style_name) != sld_digest(sld_content):
+            return item, "update"
+        return item, None
+
+    def assignment_state(record):
+        layer_known = (snapshot.exists("featuretypes", record["workspace"], record["layer"])
+                       or snapshot.exists("wmslayers", record["workspace"], record["layer"]))
+        if not layer_known:
+            return record, True
+        current = current_default_style(record["workspace"], record["layer"])
+        return record, current not in (record["style_name"], f"{record['workspace']}:{record['style_name']}")
+
+    with ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="plan") as executor:
+        style_states = list(executor.map(style_state, styles.items()))
+        assignment_states = list(executor.map(assignment_state, style_records))
+
+    for ((workspace, style_name), sld_path), op in style_states:
+        if op:
+            plan.add(op, "style", workspace, style_name, [ensure_workspace(workspace)], path=sld_path)
+
+    for record, needed in assignment_states:
+        if needed:
+            workspace, layer_name = record["workspace"], record["layer"]
+            layer_action = next((plan.id_of(kind, workspace, layer_name)
+                                 for kind in ("wfslayer", "wmslayer", "featuretype")
+                                 if plan.id_of(kind, workspace, layer_name) is not None), None)
+            plan.add("assign", "style", workspace, f"{layer_name}:{record['style_name']}",
+                     [plan.id_of("style", workspace, record["style_name"]), layer_action, ensure_workspace(workspace)],
+                     layer=layer_name, style=record["style_name"])
+
+    return plan.actions
+
+
+def print_plan(actions):
+    if not actions:
+        print("[✓] Catalog is up to date. Nothing to do.")
+        return
+    for action in actions:
+        deps = f" (after {', '.join(f'#{dep}' for dep in action.depends_on)})" if action.depends_on else ""
+        print(f"#{action.action_id:<4} {action.op:<7} {action.kind:<11} {action.workspace}:{action.name}{deps}")
+    print(f"\n{len(actions)} change(s) planned.")
+
+
+def _delete(url):
+    response = get_client().delete(url, params={"recurse": "true"})
+    # Already gone (e.g. removed with its store) counts as done
+    if response.status_code not in [200, 202, 204, 404]:
+        raise Exception(f"Failed to delete {url}: {response.status_code} {response.text}")
+
+
+def _run_action(action, snapshot, layer_options):
+    workspace, details = action.workspace, action.details
+    if action.kind == "workspace":
+        create_workspace(workspace, snapshot=snapshot)
+    elif action.kind == "wmsstore":
+        create_or_update_wms_datastore(workspace, action.name, details["link"], snapshot=snapshot)
+    elif action.kind == "wmslayer":
+        create_or_update_wms_layer(workspace, details["store"], details["native_name"], action.name, snapshot=snapshot)
+    elif action.kind == "wfslayer":
+        # Imported lazily so plan-only runs don't load the geo stack
+        from ingest_wfs_wms_layers_geoserver import process_region_layers
+        process_region_layers(details["region"], [details["layer"]], snapshot=snapshot, **layer_options)
+    elif action.kind == "featuretype":
+        update_shapefile_layername(workspace, details["datastore"], details["native_name"], action.name,
+                                   snapshot=snapshot)
+    elif action.kind == "style" and action.op == "assign":
+        assign_style(workspace, details["layer"], details["style"], check_current=False)
+    elif action.kind == "style":
+        if sync_style(workspace, action.name, read_sld(details["path"]), snapshot, check_remote=False) is None:
+            raise Exception(f"Failed to sync style '{action.name}'")
+    elif action.kind == "layer":
+        _delete(f"{rest_url()}layers/{workspace}:{action.name}")
+        snapshot.discard("featuretypes", workspace, action.name)
+        snapshot.discard("wmslayers", workspace, action.name)
+    elif action.kind in ("datastore", "wmsstore"):
+        _delete(f"{rest_url()}workspaces/{workspace}/{action.kind}s/{action.name}")
+        snapshot.discard(f"{action.kind}s", workspace, action.name)
+    else:
+        raise ValueError(f"Unsupported plan action: {action.op} {action.kind}")
+
+
+def apply_plan(actions, snapshot, max_workers=8, layer_options=None):
+    """
+    Executes a plan with as much parallelism as its dependencies allow: an
+    action starts as soon as everything it depends on has succeeded. Actions
+    whose dependencies failed are skipped.
+
+    layer_options are passed to process_region_layers for each "wfslayer"
+    action. Share one state_store and host_limiter (and convert_pool) across
+    all of them: the actions run on max_workers threads at once, and each
+    only sees its own layer.
+
+    Returns:
+        dict: {action_id: "done" | "failed" | "skipped"}
+    """
+    layer_options = layer_options or {}
+    status = {}
+    pending = {action.action_id: action for action in actions}
+
+    def run(action):
+        print(f"[→] #{action.action_id} {action.op} {action.kind} {action.workspace}:{action.name}")
+        _run_action(action, snapshot, layer_options)
+
+    with ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="apply") as executor:
+        running = {}
+        while pending or running:
+            for action_id, action in list(pending.items()):
+                if any(status.get(dep) in ("failed", "skipped") for dep in action.depends_on):
+                    status[action_id] = "skipped"
+                    del pending[action_id]
+                elif all(status.get(dep) == "done" for dep in action.depends_on):
+                    running[executor.submit(run, action)] = action_id
+                    del pending[action_id]
+            if not running:
+                continue
+            done, _ = wait(running, return_when=FIRST_COMPLETED)
+            for future in done:
+                action_id = running.pop(future)
+                if future.exception():
+                    print(f"[✗] #{action_id} failed: {future.exception()}")
+                    status[action_id] = "failed"
+                else:
+                    status[action_id] = "done"
+
+    counts = {state: list(status.values()).count(state) for state in ("done", "failed", "skipped")}
+    print(f"[✓] Apply finished: {counts}")
+    return status
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Plan or apply GeoServer catalog changes from the job files.")
+    parser.add_argument("command", choices=["plan", "apply"])
+    parser.add_argument("--jobs", default="final_output.jsonl")
+    parser.add_argument("--styles", default="styles_path_details.jsonl")
+    parser.add_argument("--region", action="append", help="Limit to these regions (repeatable).")
+    parser.add_argument("--refresh-data", action="store_true", help="Also re-ingest already published WFS layers.")
+    parser.add_argument("--prune", action="store_true", help="Delete layers/stores no longer in the job file.")
+    parser.add_argument("--workers", type=int, default=8)
+    parser.add_argument("--full", action="store_true",
+                        help="Re-ingest every WFS layer instead of skipping unchanged upstream data.")
+    parser.add_argument("--per-host-limit", type=int, default=2, help="Concurrent downloads per upstream host.")
+    parser.add_argument("--convert-workers", type=int, default=0)
+    parser.add_argument("--backend", default="shapefile",
+                        choices=["shapefile", "geopackage", "flatgeobuf", "postgis"])
+    parser.add_argument("--backend-options", type=json.loads, default={},
+                        help='JSON, e.g. \'{"connection": {"host": ..., "database": ...}}\' for postgis.')
+    parser.add_argument("--spatial-index", action="store_true", help="Add a .qix spatial index to shapefile outputs.")
+    parser.add_argument("--simplify", type=float, action="append", default=[],
+                        help="Also publish a simplified variant at this tolerance (repeatable).")
+    args = parser.parse_args()
+
+    region_entries = [entry for entry in load_jsonl(args.jobs) if not args.region or entry["region"] in args.region]
+    optimize_options = {"spatial_index": args.spatial_index}
+    if args.simplify:
+        optimize_options["simplify_tolerances"] = args.simplify
+    style_records = load_jsonl(args.styles)
+    snapshot = CatalogSnapshot(get_client())
+
+    actions = build_plan(region_entries, style_records, snapshot, refresh_data=args.refresh_data, prune=args.prune,
+                         output_backend=args.backend, backend_options=args.backend_options, optimize=optimize_options)
+    print_plan(actions)
+    if args.command == "apply" and actions:
+        # "spawn" avoids forking a process that already has apply threads running
+        convert_pool = ProcessPoolExecutor(max_workers=args.convert_workers,
+                                           mp_context=multiprocessing.get_context("spawn")) \
+            if args.convert_workers > 0 else None
+        layer_options = {"state_store": None if args.full else LayerStateStore(),
+                         "host_limiter": HostLimiter(per_host=args.per_host_limit), "convert_pool": convert_pool,
+                         "output_backend": args.backend, "backend_options": args.backend_options,
+                         "optimize": optimize_options}
+        try:
+            apply_plan(actions, snapshot, max_workers=args.workers, layer_options=layer_options)
+        finally:
+            if convert_pool:
+                convert_pool.shutdown()
@@ -0,0 +1,94 @@
+import threading
+
+# REST list endpoint (relative to the workspace) and JSON keys for each object kind
+CATALOG_KINDS = {
+    "datastores": ("datastores.json", "dataStores", "dataStore"),
+    "wmsstores": ("wmsstores.json", "wmsStores", "wmsStore"),
+    "featuretypes": ("featuretypes.json", "featureTypes", "featureType"),
+    "wmslayers": ("wmslayers.json", "wmsLayers", "wmsLayer"),
+    "styles": ("styles.json", "styles", "style"),
+}
+
+
+def _list_names(payload, outer_key, inner_key):
+    # GeoServer returns "" for an empty list and a bare object for a single item
+    container = payload.get(outer_key) or {}
+    items = container.get(inner_key, []) if isinstance(container, dict) else []
+    if isinstance(items, dict):
+        items = [items]
+    return {item["name"] for item in items}
+
+
+class CatalogSnapshot:
+    """
+    Local index of the GeoServer catalog used to answer existence checks
+    without a REST round-trip per object. Each workspace's datastores,
+    wmsstores, featuretypes, wmslayers and styles are listed in bulk the first
+    time the workspace is queried; the REST helpers keep the index current by
+    calling add()/discard() after they create or delete objects.
+
+    Featuretypes and WMS layers are indexed per workspace, not per store,
+    since GeoServer requires layer names to be unique within a workspace.
+    """
+
+    def __init__(self, client):
+        self.client = client
+        self._workspaces = None
+        self._objects = {}
+        self._lock = threading.RLock()
+
+    def _get_json(self, path):
+        response = self.client.get(f"{self.client.base_url}{path}", headers={"Accept": "application/json"})
+        if response.status_code == 404:
+            return {}
+        response.raise_for_status()
+        return response.json()
+
+    def _load_workspaces(self):
+        if self._workspaces is None:
+            self._workspaces = _list_names(self._get_json("workspaces.json"), "workspaces", "workspace")
+        return self._workspaces
+
+    def _load_workspace(self, workspace):
+        if workspace not in self._objects:
+            objects = {}
+            for kind, (path, outer_key, inner_key) in CATALOG_KINDS.items():
+                if workspace in self._load_workspaces():
+                    objects[kind] = _list_names(self._get_json(f"workspaces/{workspace}/{path}"), outer_key, inner_key)
+                else:
+                    objects[kind] = set()
+            self._objects[workspace] = objects
+        return self._objects[workspace]
+
+    def workspace_exists(self, workspace):
+        with self._lock:
+            return workspace in self._load_workspaces()
+
+    def exists(self, kind, workspace, name):
+        with self._lock:
+            return name in self._load_workspace(workspace)[kind]
+
+    def names(self, kind, workspace):
+        with self._lock:
+            return set(self._load_workspace(workspace)[kind])
+
+    def add_workspace(self, workspace):
+        with self._lock:
+            self._load_workspaces().add(workspace)
+            self._objects.setdefault(workspace, {kind: set() for kind in CATALOG_KINDS})
+
+    def add(self, kind, workspace, name):
+        with self._lock:
+            self._load_workspace(workspace)[kind].add(name)
+
+    def discard(self, kind, workspace, name):
+        with self._lock:
+            self._load_workspace(workspace)[kind].discard(name)
+
+    def refresh(self, workspace=None):
+        with self._lock:
+            if workspace is None:
+                self._workspaces = None
+                self._objects.clear()
+            else:
+                self._objects.pop(workspace, None)
@@ -1,142 +1,401 @@
 import geopandas as gpd
 import pandas as pd
 import os
+import struct
 import tempfile
 import zipfile
 from io import StringIO, BytesIO
-import shutil, requests
+import requests
+from resilience import ResilientSession
+from run_workspace import atomic_path
+from postgis_loader import copy_geodataframe
+from zip_utils import DEFAULT_CHUNK_SIZE, probe_ranges, download_range, copy_members, copy_members_ranged
 
-def format_and_save_geodataframe(data_stream, output_dir, filename_base, output_format):
-    try:
-        if output_format == "csv":
-            df = pd.read_csv(data_stream)
-            gdf_types = ["mt:shape", "erl:shape", "shape", "geom", "geometry"]
-            geo_col = next((col for col in gdf_types if col in df.columns), None)
+try:
+    import pyogrio
+except ImportError:
+    pyogrio = None
+
+try:
+    import pyarrow
+except ImportError:
+    pyarrow = None
+
+GEOMETRY_COLUMNS = ["mt:shape", "erl:shape", "shape", "geom", "geometry"]
+SHAPEFILE_EXTENSIONS = [".shp", ".shx", ".dbf", ".prj", ".cpg", ".qix"]
+# Sidecars a SHAPE-ZIP must carry to be passed through without conversion (.prj holds the CRS)
+SHAPEFILE_REQUIRED = [".shp", ".shx", ".dbf", ".prj"]
+# File suffix of each output backend; "postgis" loads a table instead of writing a file
+OUTPUT_SUFFIXES = {"shapefile": ".zip", "geopackage": ".gpkg", "flatgeobuf": ".fgb"}
+
+
+def _read_kwargs():
+    if pyogrio is None:
+        return {}
+    # Arrow-backed reads avoid building per-feature Python objects
+    return {"engine": "pyogrio", "use_arrow": pyarrow is not None}
 
+
+def _can_write_zip_directly():
+    # GDAL >= 3.1 writes a zipped shapefile itself when the target ends in .shp.zip
+    return pyogrio is not None and pyogrio.__gdal_version__ >= (3, 1, 0)
+
+
+def read_csv_geodataframe(data_source, chunksize=100_000):
+    """Parses a WKT CSV in chunks so only one chunk of raw WKT strings is held at a time."""
+    chunks = []
+    geo_col = None
+    for df in pd.read_csv(data_source, chunksize=chunksize):
+        if geo_col is None:
+            geo_col = next((col for col in GEOMETRY_COLUMNS if col in df.columns), None)
             if not geo_col:
-                print(f"[!] No geometry column found. Skipping: {filename_base}")
-                return
+                return None
+        df[geo_col] = gpd.GeoSeries.from_wkt(df[geo_col])
+        chunks.append(gpd.GeoDataFrame(df, geometry=geo_col, crs="EPSG:4326"))
+    if not chunks:
+        return None
+    return pd.concat(chunks, ignore_index=True) if len(chunks) > 1 else chunks[0]
 
-            df[geo_col] = gpd.GeoSeries.from_wkt(df[geo_col])
-            gdf = gpd.GeoDataFrame(df, geometry=geo_col, crs="EPSG:4326")
 
-        elif output_format in ["GeoJSON", "json"]:
-            gdf = gpd.read_file(data_stream)
+def read_layer_data(data_source, output_format, filename_base=""):
+    """Loads a downloaded layer (file path or stream) into a GeoDataFrame, or None."""
+    if output_format == "csv":
+        gdf = read_csv_geodataframe(data_source)
+        if gdf is None:
+            print(f"[!] No geometry column found. Skipping: {filename_base}")
+        return gdf
 
-        elif output_format == "SHAPE-ZIP":
-            with tempfile.TemporaryDirectory() as tmpdir:
-                with zipfile.ZipFile(data_stream) as z:
-                    z.extractall(tmpdir)
-                shp_files = [f for f in os.listdir(tmpdir) if f.endswith(".shp")]
-                if not shp_files:
-                    print(f"[!] No .shp found in ZIP for {filename_base}")
-                    return
-                gdf = gpd.read_file(os.path.join(tmpdir, shp_files[0]))
+    elif output_format in ["GeoJSON", "json"]:
+        return gpd.read_file(data_source, **_read_kwargs())
 
-        else:
-            print(f"[!] Unsupported format for saving: {output_format}")
-            return
+    elif output_format == "GeoParquet":
+        # A layer cache file: Arrow reads the columns straight from the memory-mapped file
+        return gpd.read_parquet(data_source, memory_map=True)
+
+    elif output_format == "SHAPE-ZIP":
+        with tempfile.TemporaryDirectory() as tmpdir:
+            with zipfile.ZipFile(data_source) as z:
+                z.extractall(tmpdir)
+            shp_files = [f for f in os.listdir(tmpdir) if f.endswith(".shp")]
+            if not shp_files:
+                print(f"[!] No .shp found in ZIP for {filename_base}")
+                return None
+            return gpd.read_file(os.path.join(tmpdir, shp_files[0]), **_read_kwargs())
+
+    else:
+        print(f"[!] Unsupported format for saving: {output_format}")
+        return None
+
+
+def shapefile_zip_members(zf):
+    """
+    Validates a SHAPE-ZIP without decoding geometry: exactly one .shp with a
+    valid header, the required sidecars next to it, a non-empty .prj and only
+    stored/deflated members.
+
+    Returns:
+        dict | None: {extension: ZipInfo} for the shapefile's members, or None
+                     if the zip needs the full conversion.
+    """
+    infos = [info for info in zf.infolist() if not info.is_dir()]
+    shp_infos = [info for info in infos if info.filename.lower().endswith(".shp")]
+    if len(shp_infos) != 1:
+        return None
+    stem = shp_infos[0].filename[:-4]
+    members = {}
+    for info in infos:
+        base, ext = os.path.splitext(info.filename)
+        if base == stem and ext.lower() in SHAPEFILE_EXTENSIONS:
+            members[ext.lower()] = info
+    if any(ext not in members for ext in SHAPEFILE_REQUIRED):
+        return None
+    if any(info.compress_type not in (zipfile.ZIP_STORED, zipfile.ZIP_DEFLATED) for info in members.values()):
+        return None
+    if not zf.read(members[".prj"]).strip():
+        return None
+    with zf.open(members[".shp"]) as shp:
+        header = shp.read(100)
+    # Main file header: big-endian file code 9994, little-endian version 1000
+    if len(header) < 100 or struct.unpack(">i", header[:4])[0] != 9994 or struct.unpack("<i", header[28:32])[0] != 1000:
+        return None
+    return members
+
+
+def copy_shapefile_zip(data_source, output_dir, filename_base):
+    """
+    SHAPE-ZIP fast path: copies the shapefile's members still compressed
+    into "<output_dir>/<filename_base>.zip", renamed to "<filename_base>.<ext>".
+
+    Returns:
+        str | None: Path of the written zip, or None if the input failed
+                    validation and must go through the full conversion.
+    """
+    with zipfile.ZipFile(data_source) as zf:
+        members = shapefile_zip_members(zf)
+    if members is None:
+        return None
+    arcnames = {info.filename: f"{filename_base}{ext}" for ext, info in members.items()}
+    zip_output_path = os.path.join(output_dir, f"{filename_base}.zip")
+    copy_members(data_source, zip_output_path, arcnames.get)
+    return zip_output_path
+
+
+def write_layer_cache(gdf, cache_path):
+    """Writes the parsed layer to cache_path as GeoParquet; a failure only costs the cache entry."""
+    if pyarrow is None:
+        print("[!] pyarrow is not installed; layer not cached")
+        return
+    try:
+        gdf.to_parquet(cache_path)
+    except Exception as e:
+        print(f"[!] Could not cache layer as GeoParquet: {e}")
+        if os.path.exists(cache_path):
+            os.remove(cache_path)
+
+
+def variant_name(name, tolerance):
+    """Name of a simplified variant, e.g. variant_name("tenements", 0.001) -> "tenements_s0_001"."""
+    return f"{name}_s{tolerance:g}".replace(".", "_").replace("-", "m")
+
+
+def optimize_geodataframe(gdf, keep_columns=None):
+    """Drops every attribute column not listed in keep_columns (matched case-insensitively)."""
+    if not keep_columns:
+        return gdf
+    wanted = {column.lower() for column in keep_columns}
+    kept = [column for column in gdf.columns if column.lower() in wanted or column == gdf.geometry.name]
+    missing = wanted - {column.lower() for column in kept}
+    if missing:
+        print(f"[!] keep_columns not found in layer: {sorted(missing)}")
+    return gdf[kept]
+
+
+def write_simplified_variants(gdf, output_dir, filename_base, tolerances, spatial_index=False, writer=None):
+    """
+    Writes one output per tolerance (in the layer CRS's units) with
+    topology-preserving simplified geometries, for publishing as coarse
+    layers for small scales. writer(gdf, output_dir, name) defaults to a
+    zipped shapefile. Returns [(tolerance, output), ...].
+    """
+    writer = writer or (lambda frame, directory, name: write_shapefile_zip(frame, directory, name,
+                                                                            spatial_index=spatial_index))
+    variants = []
+    for tolerance in tolerances:
+        simplified = gdf.copy()
+        simplified[gdf.geometry.name] = gdf.geometry.simplify(tolerance, preserve_topology=True)
+        simplified = simplified[~simplified.geometry.is_empty & simplified.geometry.notna()]
+        variants.append((tolerance, writer(simplified, output_dir, variant_name(filename_base, tolerance))))
+    return variants
+
+
+def output_location(backend, output_dir, filename_base, backend_options=None):
+    """Where a backend puts a layer: a file path, or "<schema>.<table>" for postgis."""
+    if backend == "postgis":
+        schema = (backend_options or {}).get("connection", {}).get("schema", "public")
+        return f"{schema}.{filename_base.lower()}"
+    return os.path.join(output_dir, f"{filename_base}{OUTPUT_SUFFIXES[backend]}")
+
+
+def _write_single_file(gdf, output_dir, filename_base, driver, suffix, **options):
+    output_path = os.path.join(output_dir, f"{filename_base}{suffix}")
+    # GDAL picks behaviour from the file name (FlatGeobuf writes a directory without .fgb),
+    # so write under the real name in a private temp dir and rename into place
+    with tempfile.TemporaryDirectory(dir=output_dir) as temp_dir:
+        temp_path = os.path.join(temp_dir, f"{filename_base}{suffix}")
+        gdf.to_file(temp_path, driver=driver, **({"engine": "pyogrio"} if pyogrio else {}), **options)
+        os.replace(temp_path, output_path)
+    return output_path
 
-        # Save shapefile to temp directory
-        with tempfile.TemporaryDirectory() as temp_shp_dir:
-            shp_path = os.path.join(temp_shp_dir, f"{filename_base}.shp")
-            gdf.to_file(shp_path)
 
-            # Create ZIP
-            zip_output_path = os.path.join(output_dir, f"{filename_base}.zip")
-            with zipfile.ZipFile(zip_output_path, "w", zipfile.ZIP_DEFLATED) as zipf:
-                for ext in [".shp", ".shx", ".dbf", ".prj", ".cpg"]:
-                    file_path = os.path.join(temp_shp_dir, f"{filename_base}{ext}")
-                    if os.path.exists(file_path):
-                        zipf.write(file_path, arcname=os.path.basename(file_path))
+def write_geopackage(gdf, output_dir, filename_base):
+    """Writes "<filename_base>.gpkg" with one layer of that name and its R-tree spatial index."""
+    return _write_single_file(gdf, output_dir, filename_base, "GPKG", ".gpkg", layer=filename_base)
 
-            print(f"[✓] Zipped and saved: {zip_output_path}")
+
+def write_flatgeobuf(gdf, output_dir, filename_base):
+    """Writes "<filename_base>.fgb" with its packed Hilbert R-tree index."""
+    return _write_single_file(gdf, output_dir, filename_base, "FlatGeobuf", ".fgb", SPATIAL_INDEX="YES")
+
+
+def _backend_writer(backend, backend_options, compression, compresslevel, spatial_index):
+    if backend == "shapefile":
+        return lambda gdf, output_dir, name: write_shapefile_zip(gdf, output_dir, name, compression, compresslevel,
+                                                                 spatial_index=spatial_index)
+    if backend == "geopackage":
+        return write_geopackage
+    if backend == "flatgeobuf":
+        return write_flatgeobuf
+    if backend == "postgis":
+        return lambda gdf, output_dir, name: copy_geodataframe(gdf, backend_options["connection"], name.lower())
+    raise ValueError(f"Unsupported output backend: {backend}")
+
+
+def write_shapefile_zip(gdf, output_dir, filename_base, compression=zipfile.ZIP_DEFLATED, compresslevel=None,
+                        spatial_index=False):
+    """
+    Writes gdf as a zipped shapefile "<output_dir>/<filename_base>.zip".
+
+    With pyogrio and default compression, GDAL writes the zip directly
+    (.shp.zip target), skipping the temp-dir round trip. Otherwise the
+    shapefile is written to a temp dir and zipped with the requested
+    compression (zipfile.ZIP_STORED for already compact data) and level.
+    Either way the zip is renamed into place once complete, so concurrent
+    runs never see or produce a half-written file.
+
+    spatial_index adds a .qix quadtree index (GDAL's SPATIAL_INDEX=YES),
+    which GeoServer uses for bbox queries instead of scanning the .shp.
+    """
+    zip_output_path = os.path.join(output_dir, f"{filename_base}.zip")
+    write_kwargs = {"engine": "pyogrio"} if pyogrio else {}
+    if spatial_index:
+        write_kwargs["SPATIAL_INDEX"] = "YES"
+
+    if compression == zipfile.ZIP_DEFLATED and compresslevel is None and _can_write_zip_directly() \
+            and not spatial_index:
+        # A private temp dir keeps the fixed .shp.zip name from colliding with other writers
+        with tempfile.TemporaryDirectory(dir=output_dir) as temp_dir:
+            direct_path = os.path.join(temp_dir, f"{filename_base}.shp.zip")
+            gdf.to_file(direct_path, driver="ESRI Shapefile", engine="pyogrio")
+            os.replace(direct_path, zip_output_path)
+        return zip_output_path
+
+    # Save shapefile to temp directory
+    with tempfile.TemporaryDirectory() as temp_shp_dir, atomic_path(zip_output_path) as tmp_zip_path:
+        shp_path = os.path.join(temp_shp_dir, f"{filename_base}.shp")
+        gdf.to_file(shp_path, **write_kwargs)
+
+        # Create ZIP
+        with zipfile.ZipFile(tmp_zip_path, "w", compression, compresslevel=compresslevel) as zipf:
+            for ext in SHAPEFILE_EXTENSIONS:
+                file_path = os.path.join(temp_shp_dir, f"{filename_base}{ext}")
+                if os.path.exists(file_path):
+                    zipf.write(file_path, arcname=os.path.basename(file_path))
+    return zip_output_path
+
+
+def format_and_save_geodataframe(data_stream, output_dir, filename_base, output_format,
+                                 compression=zipfile.ZIP_DEFLATED, compresslevel=None, optimize=None,
+                                 backend="shapefile", backend_options=None, cache_path=None):
+    """
+    Converts a downloaded layer (file path or stream) to a zipped shapefile,
+    or with backend "geopackage" / "flatgeobuf" to a single indexed file, or
+    with "postgis" loads it into a table with COPY
+    (backend_options={"connection": {...}}).
+
+    A SHAPE-ZIP that already holds one complete shapefile with a CRS is
+    repackaged by copying its members raw (compression settings don't apply);
+    only other inputs, or any input when optimize asks for changes, are
+    loaded with geopandas and written out again.
+
+    Args:
+        optimize (dict): Optional {"keep_columns": [...], "spatial_index": bool,
+                         "simplify_tolerances": [...]}; simplified variants
+                         are written next to the main output under variant_name().
+        cache_path (str): Also write the parsed layer here as GeoParquet,
+                          before any column pruning, for a LayerCache. A
+                          SHAPE-ZIP taking the copy path is parsed for this.
+
+    Returns:
+        str | None: Path of the written file ("<schema>.<table>" for postgis),
+                    or None if conversion failed.
+    """
+    optimize = optimize or {}
+    try:
+        if output_format == "SHAPE-ZIP" and backend == "shapefile" and not any(optimize.values()):
+            zip_output_path = copy_shapefile_zip(data_stream, output_dir, filename_base)
+            if zip_output_path:
+                print(f"[✓] Copied shapefile members and saved: {zip_output_path}")
+                if cache_path:
+                    gdf = read_layer_data(data_stream, output_format, filename_base)
+                    if gdf is not None:
+                        write_layer_cache(gdf, cache_path)
+                return zip_output_path
+            print(f"[!] {filename_base} needs conversion (shapefile incomplete or missing CRS)")
+            if hasattr(data_stream, "seek"):
+                data_stream.seek(0)
+
+        gdf = read_layer_data(data_stream, output_format, filename_base)
+        if gdf is None:
+            return None
+        if cache_path:
+            write_layer_cache(gdf, cache_path)
+
+        gdf = optimize_geodataframe(gdf, optimize.get("keep_columns"))
+        writer = _backend_writer(backend, backend_options or {}, compression, compresslevel,
+                                 optimize.get("spatial_index", False))
+        output = writer(gdf, output_dir, filename_base)
+        print(f"[✓] Saved ({backend}): {output}")
+        for tolerance, variant in write_simplified_variants(gdf, output_dir, filename_base,
+                                                            optimize.get("simplify_tolerances", []), writer=writer):
+            print(f"[✓] Simplified variant (tolerance {tolerance:g}) saved: {variant}")
+        return output
 
     except Exception as e:
         print(f"[✗] Error formatting/saving {filename_base}: {e}")
+        return None
 
-def download_and_extract_omi(url, output_zip_full_path="final_output_files_v3/Ontario/omi.zip"):
+def download_and_extract_omi(url, output_zip_full_path="final_output_files_v3/Ontario/omi.zip", ranged=True,
+                             session=None, chunk_size=DEFAULT_CHUNK_SIZE, work_dir=None):
     """
-    Downloads a zip file from a given URL, extracts the contents of a specific
-    nested folder ('OMI' inside 'Geospatial_Data' within 'OMI'), and then
-    creates a new zip file containing only those contents, placed in a
-    specified output directory.
+    Builds a zip holding only the contents of the nested 'Geospatial_Data/OMI/'
+    folder of the remote OMI archive, with paths relative to that folder.
+
+    Members are copied raw (still compressed) into the new zip. With ranged
+    (the default) and a server that supports Range requests, only the central
+    directory and the selected members are downloaded, and an interrupted run
+    resumes from its staged parts. Otherwise the whole archive is downloaded
+    to "<output>.download", resumed from where a previous attempt stopped.
+    The new zip is renamed into place only once complete.
 
     Args:
         url (str): The URL of the zip file to download.
         output_zip_full_path (str): The full path and name for the new zip file
                                     that will contain only the required OMI data.
                                     E.g., "final_output_files_v3/Ontario/omi.zip"
+        ranged (bool): Fetch only the needed byte ranges when the server allows it.
+        session (requests.Session): Session for the downloads; a retrying one by default.
+        chunk_size (int): Download and copy buffer size in bytes.
+        work_dir (str): Directory for staged downloads; defaults to next to the
+                        output. Give concurrent runs that share an output
+                        path their own (e.g. a RunWorkspace subdir).
+
+    Returns:
+        int: Number of files written to the new zip (0 on failure).
     """
     print(f"Attempting to download zip file from: {url}")
-
-    # Define temporary paths for the full downloaded zip and extracted contents
-    temp_download_path = "temp_full_download.zip"
-    temp_extract_dir = "temp_extracted_omi_contents"
     # Target path prefix now points to the innermost 'OMI' folder
     target_zip_path_prefix = "Geospatial_Data/OMI/"
+    session = session or ResilientSession()
+    final_output_dir = os.path.dirname(output_zip_full_path)
+    if final_output_dir:
+        os.makedirs(final_output_dir, exist_ok=True)
+
+    def select(member):
+        # Flattens the structure, placing contents directly at the root of the new zip
+        if member.startswith(target_zip_path_prefix):
+            return os.path.relpath(member, target_zip_path_prefix).replace(os.sep, "/")
+        return None
 
     try:
-        # Step 1: Download the zip file content and save it to a temporary file
-        print(f"Downloading full zip file to {temp_download_path}...")
-        with requests.get(url, stream=True) as r:
-            r.raise_for_status()  # Raise an HTTPError for bad responses (4xx or 5xx)
-            with open(temp_download_path, 'wb') as f:
-                for chunk in r.iter_content(chunk_size=8192):
-                    f.write(chunk)
-        print(f"Full zip file downloaded successfully to: {os.path.abspath(temp_download_path)}")
-
-        # Step 2: Extract the specific nested OMI folder contents to a temporary directory
-        os.makedirs(temp_extract_dir, exist_ok=True)
-        print(f"Created temporary extraction directory: {os.path.abspath(temp_extract_dir)}")
-
-        extracted_count = 0
-        with zipfile.ZipFile(temp_download_path, 'r') as zf:
-            print(f"Extracting contents of '{target_zip_path_prefix}' to temporary directory...")
-            for member in zf.namelist():
-                # Check if the file is inside the target nested OMI folder
-                if member.startswith(target_zip_path_prefix):
-                    # Get the relative path of the file within the target OMI folder
-                    # This flattens the structure, placing contents directly into output_dir
-                    relative_path = os.path.relpath(member, target_zip_path_prefix)
-
-                    # Construct the full path for temporary extraction
-                    dest_path = os.path.join(temp_extract_dir, relative_path)
-
-                    # Ensure parent directories exist for the destination file
-                    os.makedirs(os.path.dirname(dest_path), exist_ok=True)
-
-                    # Extract the file (avoid extracting directories as files)
-                    if not member.endswith('/'):
-                        with zf.open(member) as source, open(dest_path, 'wb') as target:
-                            target.write(source.read())
-                        extracted_count += 1
-
-        if extracted_count == 0:
+        if ranged and probe_ranges(url, session)[0] is not None:
+            print(f"Reading central directory and copying '{target_zip_path_prefix}' members with range requests...")
+            copied = copy_members_ranged(url, output_zip_full_path, select, session=session,
+                                         work_dir=work_dir and os.path.join(work_dir, "omi.parts"), chunk_size=chunk_size)
+        else:
+            temp_download_path = os.path.join(work_dir, "omi.download") if work_dir else f"{output_zip_full_path}.download"
+            print(f"Downloading full zip file to {temp_download_path}...")
+            download_range(url, temp_download_path, session, chunk_size=chunk_size)
+            copied = copy_members(temp_download_path, output_zip_full_path, select, chunk_size=chunk_size)
+            os.remove(temp_download_path)
+
+        if copied == 0:
             print(f"Warning: No files found matching the target path prefix: '{target_zip_path_prefix}' inside the downloaded zip file.")
             print("Please verify the exact path within the zip file if you expected files.")
-            return # Exit if nothing was extracted
-
-        print(f"Successfully extracted {extracted_count} relevant files to '{temp_extract_dir}'.")
-        print(f"Now creating new zip file '{output_zip_full_path}' with only the required data...")
-
-        # Step 3: Create the final output directory structure
-        final_output_dir = os.path.dirname(output_zip_full_path)
-        os.makedirs(final_output_dir, exist_ok=True)
-        print(f"Created final output directory: {os.path.abspath(final_output_dir)}")
-
-
-        # Step 4: Create a new zip file containing only the extracted contents
-        with zipfile.ZipFile(output_zip_full_path, 'w', zipfile.ZIP_DEFLATED) as new_zip:
-            # Walk through the temporary extracted directory and add files to the new zip
-            for root, dirs, files in os.walk(temp_extract_dir):
-                for file in files:
-                    file_path = os.path.join(root, file)
-                    # Calculate the arcname (path within the new zip) to remove the temporary directory prefix
-                    # This ensures the 'OMI/' folder structure is preserved inside the new zip
-                    arcname = os.path.relpath(file_path, temp_extract_dir)
-                    new_zip.write(file_path, arcname)
-        print(f"New zip file '{output_zip_full_path}' created successfully.")
+            if os.path.exists(output_zip_full_path):
+                os.remove(output_zip_full_path)
+            return 0
+        print(f"New zip file '{output_zip_full_path}' created successfully with {copied} files.")
+        return copied
 
     except requests.exceptions.RequestException as e:
         print(f"Error downloading the file: {e}")
@@ -144,13 +403,5 @@ def download_and_extract_omi(url, output_zip_full_path="final_output_files_v3/On
         print("Error: The downloaded file is not a valid zip file or is corrupted.")
     except Exception as e:
         print(f"An unexpected error occurred: {e}")
-    finally:
-        # Step 5: Clean up temporary files and directories
-        print("Cleaning up temporary files and directories...")
-        if os.path.exists(temp_download_path):
-            os.remove(temp_download_path)
-            print(f"Removed temporary file: {temp_download_path}")
-        if os.path.exists(temp_extract_dir):
-            shutil.rmtree(temp_extract_dir)
-            print(f"Removed temporary directory: {temp_extract_dir}")
-        print("Cleanup complete.")
\ No newline at end of file
+    # Partial downloads are kept so the next run resumes them
+    return 0
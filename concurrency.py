@@ -0,0 +1,38 @@
+import threading
+from contextlib import contextmanager
+from urllib.parse import urlparse
+
+
+def host_of(url):
+    return urlparse(url).netloc.lower()
+
+
+class HostLimiter:
+    """
+    Caps the number of concurrent requests sent to any single upstream host,
+    so a parallel run cannot hammer one WFS/WMS provider while others sit idle.
+
+    Args:
+        per_host (int): Default number of concurrent requests allowed per host.
+        overrides (dict): Optional {host: limit} for providers that need a
+                          different cap, e.g. {"geology.data.nt.gov.au": 1}.
+    """
+
+    def __init__(self, per_host=2, overrides=None):
+        self.per_host = per_host
+        self.overrides = overrides or {}
+        self._semaphores = {}
+        self._lock = threading.Lock()
+
+    def _semaphore(self, host):
+        with self._lock:
+            if host not in self._semaphores:
+                limit = self.overrides.get(host, self.per_host)
+                self._semaphores[host] = threading.BoundedSemaphore(limit)
+            return self._semaphores[host]
+
+    @contextmanager
+    def limit(self, url):
+        semaphore = self._semaphore(host_of(url))
+        with semaphore:
+            yield
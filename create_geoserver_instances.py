@@ -1,38 +1,98 @@
 import os
-import yaml
-import requests
+import re
+import threading
 from urllib.parse import urljoin
 from xml.sax.saxutils import escape
 import xml.etree.ElementTree as ET
+from geoserver_client import GeoServerClient
 
 
 # -------- Load Configuration --------
-def load_config(config_path=os.path.join("config", "geoserver_config.yaml")):
+# GEOSERVER_CONFIG / GEOSERVER_PROFILE point a run (e.g. the benchmarks) at another server
+def load_config(config_path=None, profile=None):
+    import yaml
+    config_path = config_path or os.environ.get("GEOSERVER_CONFIG", os.path.join("config", "geoserver_config.yaml"))
+    profile = profile or os.environ.get("GEOSERVER_PROFILE", "prod_geoserver")
     with open(config_path, "r") as f:
         config = yaml.safe_load(f)
-    return config["prod_geoserver"]["url"], config["prod_geoserver"]["username"], config["prod_geoserver"]["password"]
-GEOSERVER_URL, USERNAME, PASSWORD = load_config()
+    return config[profile]["url"], config[profile]["username"], config[profile]["password"]
 
 
-def create_workspace(workspace_name, uri=None):
+# Nothing is read at import time; the config is loaded when the first REST call needs it
+_config_source = {"config_path": None, "profile": None}
+_client = None
+_client_lock = threading.Lock()
+
+
+def configure(config_path=None, profile=None):
+    """Selects the config file and profile for the shared client. Call before the first REST helper."""
+    global _client
+    with _client_lock:
+        if _client is not None:
+            raise RuntimeError("The GeoServer client is already in use; configure() must come first")
+        _config_source.update(config_path=config_path, profile=profile)
+
+
+def get_client():
+    """Shared keep-alive GeoServerClient for every REST helper below, created on first use."""
+    global _client
+    with _client_lock:
+        if _client is None:
+            _client = GeoServerClient(*load_config(**_config_source))
+        return _client
+
+
+def rest_url():
+    """GeoServer REST root of the configured server, e.g. "https://host/geoserver/rest/"."""
+    return get_client().base_url
+
+
+def __getattr__(name):
+    # Old module-level names, resolved lazily for scripts that still import them
+    if name == "client":
+        return get_client()
+    if name == "GEOSERVER_URL":
+        return rest_url()
+    if name in ("USERNAME", "PASSWORD"):
+        return get_client().session.auth[0 if name == "USERNAME" else 1]
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+
+
+def _check_status(url, snapshot, kind, workspace, name):
+    """Existence check answered from a CatalogSnapshot when given, otherwise with a GET."""
+    if snapshot is not None:
+        return (200 if snapshot.exists(kind, workspace, name) else 404), None
+    response = get_client().get(url)
+    return response.status_code, response
+
+
+def create_workspace(workspace_name, uri=None, snapshot=None):
+    """Returns "created", "exists" (e.g. another worker created it first) or None on failure."""
     if not uri:
         uri = f"http://www.{workspace_name}.com"  
 
-    url = f"{GEOSERVER_URL}workspaces"
+    url = f"{rest_url()}workspaces"
     headers = {"Content-Type": "text/xml"}
     data = f"<workspace><name>{workspace_name}</name></workspace>"
 
-    response = requests.post(url, data=data, headers=headers, auth=(USERNAME, PASSWORD))
+    response = get_client().post(url, data=data, headers=headers)
 
     if response.status_code in [201, 200]:
         print(f"✅ Workspace '{workspace_name}' created successfully.")
-    elif response.status_code == 401:
+        if snapshot is not None:
+            snapshot.add_workspace(workspace_name)
+        return "created"
+    if response.status_code == 401:
         print("❌ Unauthorized. Check your credentials.")
-    elif response.status_code == 409:
+        return None
+    # A concurrent worker or run may have won the race; GeoServer answers 409 or a 500 "already exists"
+    if get_client().get(urljoin(rest_url(), f"workspaces/{workspace_name}")).status_code == 200:
         print(f"⚠️ Workspace '{workspace_name}' already exists.")
-    else:
-        print(f"❌ Failed to create workspace '{workspace_name}': {response.text}")
-        return
+        if snapshot is not None:
+            snapshot.add_workspace(workspace_name)
+        return "exists"
+    print(f"❌ Failed to create workspace '{workspace_name}': {response.text}")
+    return None
 
 
 # def create_or_update_shapefile_datastore(workspace, datastore, file_dir, enable_update=False):
@@ -73,75 +133,196 @@ def create_workspace(workspace_name, uri=None):
 #     else:
 #         print(f"[✗] Error checking datastore '{datastore}': {response.status_code} {response.text}")
 
-def create_or_update_shapefile_datastore(workspace, datastore, zip_file_path, enable_update):
-    import time  # Optional: for short delay after deletion
-    
+def create_or_update_shapefile_datastore(workspace, datastore, zip_file_path, enable_update, snapshot=None):
+    """
+    Uploads a zipped shapefile into a datastore. An existing store has its
+    files replaced in place (update=overwrite, configure=none) instead of
+    being deleted and recreated, so the published layer keeps its name and
+    style assignments and stays available to WMS/WFS clients during refresh.
+
+    Returns:
+        str | None: "created" or "updated" on success, None on failure.
+    """
+    return _upload_file_datastore(workspace, datastore, zip_file_path, "shp", "application/zip", "shapefile",
+                                  snapshot)
+
+
+def create_or_update_geopackage_datastore(workspace, datastore, gpkg_path, enable_update, snapshot=None):
+    """
+    GeoPackage counterpart of create_or_update_shapefile_datastore: uploads a
+    .gpkg (file.gpkg) and publishes its layer under the file's base name on
+    creation, or replaces the file in place for an existing store.
+
+    Returns:
+        str | None: "created" or "updated" on success, None on failure.
+    """
+    return _upload_file_datastore(workspace, datastore, gpkg_path, "gpkg", "application/geopackage+sqlite3",
+                                  "GeoPackage", snapshot)
+
+
+def _upload_file_datastore(workspace, datastore, file_path, extension, content_type, label, snapshot):
     datastore = datastore.replace(":", "_").replace(" ", "_").replace(".", "_")
-    headers = {"Content-type": "application/zip"}
-    datastore_url = f"{GEOSERVER_URL}workspaces/{workspace}/datastores/{datastore}"
-    upload_url = f"{datastore_url}/file.shp"
+    headers = {"Content-type": content_type}
+    datastore_url = f"{rest_url()}workspaces/{workspace}/datastores/{datastore}"
+    upload_url = f"{datastore_url}/file.{extension}"
+
+    status, response = _check_status(datastore_url, snapshot, "datastores", workspace, datastore)
+
+    if status == 200:
+        print(f"[↻] Datastore '{datastore}' exists. Overwriting its {label} in place...")
+        params = {"update": "overwrite", "configure": "none"}
+        outcome = "updated"
+    elif status == 404:
+        print(f"[+] Creating datastore '{datastore}' by uploading {label}...")
+        params = {"configure": "first"}
+        outcome = "created"
+    else:
+        print(f"[✗] Error checking datastore '{datastore}': {response.status_code} {response.text}")
+        return None
+
+    with open(file_path, 'rb') as f:
+        put_resp = get_client().put(upload_url, data=f, headers=headers, params=params)
+    if put_resp.status_code in [200, 201, 202]:
+        print(f"[✓] Datastore '{datastore}' {outcome} and {label} uploaded.")
+        if snapshot is not None and outcome == "created":
+            snapshot.add("datastores", workspace, datastore)
+            # configure=first publishes the file under its native name
+            snapshot.add("featuretypes", workspace, os.path.splitext(os.path.basename(file_path))[0])
+        return outcome
+    else:
+        print(f"[✗] Failed to upload {label} to datastore '{datastore}': {put_resp.status_code} {put_resp.text}")
+        return None
 
-    response = requests.get(datastore_url, auth=(USERNAME, PASSWORD))
-    
-    if response.status_code == 200:
-        
-        print(f"[✘] Datastore '{datastore}' exists. Deleting it...")
-        delete_url = f"{datastore_url}?recurse=true"
-        del_resp = requests.delete(delete_url, auth=(USERNAME, PASSWORD))
-        if del_resp.status_code not in [200, 202]:
-            print(f"[✗] Failed to delete datastore: {del_resp.status_code} {del_resp.text}")
-            return
-        print(f"[✓] Datastore '{datastore}' deleted.")
-        time.sleep(2)  # Optional short wait for GeoServer to finalize deletion
 
-    elif response.status_code != 404:
+def _create_datastore(workspace, datastore, store_type, connection_parameters, snapshot=None):
+    """Creates a datastore from connection parameters unless it exists. Returns "created", "exists" or None."""
+    datastore_url = f"{rest_url()}workspaces/{workspace}/datastores/{datastore}"
+    status, response = _check_status(datastore_url, snapshot, "datastores", workspace, datastore)
+    if status == 200:
+        return "exists"
+    if status != 404:
         print(f"[✗] Error checking datastore '{datastore}': {response.status_code} {response.text}")
-        return
+        return None
+
+    entries = "".join(f'<entry key="{escape(str(key))}">{escape(str(value))}</entry>'
+                      for key, value in connection_parameters.items())
+    payload = f"""<dataStore>
+  <name>{datastore}</name>
+  <type>{store_type}</type>
+  <enabled>true</enabled>
+  <connectionParameters>{entries}</connectionParameters>
+</dataStore>"""
+    response = get_client().post(f"{rest_url()}workspaces/{workspace}/datastores", data=payload,
+                           headers={"Content-type": "text/xml"})
+    if response.status_code not in [200, 201]:
+        print(f"[✗] Failed to create {store_type} datastore '{datastore}': {response.status_code} {response.text}")
+        return None
+    print(f"[✓] Created {store_type} datastore '{datastore}'.")
+    if snapshot is not None:
+        snapshot.add("datastores", workspace, datastore)
+    return "created"
 
-    print(f"[+] Creating datastore '{datastore}' by uploading shapefile...")
-    with open(zip_file_path, 'rb') as f:
-        post_resp = requests.put(upload_url, data=f, headers=headers, auth=(USERNAME, PASSWORD))
-    if post_resp.status_code in [200, 201]:
-        print(f"[✓] Datastore '{datastore}' created and shapefile uploaded.")
-    else:
-        print(f"[✗] Failed to create datastore: {post_resp.status_code} {post_resp.text}")
 
+# Connection parameter of the FlatGeobuf datastore extension holding the file location
+FLATGEOBUF_FILE_PARAM = "flatgeobuf-file"
 
-def update_shapefile_layername(workspace_name, datastore_name, search_name, standard_layer_name):
+
+def create_or_update_flatgeobuf_datastore(workspace, datastore, fgb_path, enable_update, snapshot=None):
+    """
+    Uploads a .fgb into the GeoServer data directory (resource API, under
+    data/<workspace>/) and points a FlatGeobuf datastore at it. For an
+    existing store the file is replaced and the store's cached readers are
+    reset. Needs the FlatGeobuf extension on the server; publish the layer
+    with create_layer_from_datastore.
+
+    Returns:
+        str | None: "created" or "updated" on success, None on failure.
+    """
+    datastore = datastore.replace(":", "_").replace(" ", "_").replace(".", "_")
+    resource_path = f"data/{workspace}/{os.path.basename(fgb_path)}"
+    with open(fgb_path, "rb") as f:
+        upload = get_client().put(f"{rest_url()}resource/{resource_path}", data=f,
+                            headers={"Content-type": "application/octet-stream"})
+    if upload.status_code not in [200, 201]:
+        print(f"[✗] Failed to upload FlatGeobuf '{fgb_path}': {upload.status_code} {upload.text}")
+        return None
+
+    created = _create_datastore(workspace, datastore, "FlatGeobuf",
+                                {FLATGEOBUF_FILE_PARAM: f"file:{resource_path}"}, snapshot)
+    if created == "exists":
+        reset_datastore(workspace, datastore)
+        print(f"[✓] FlatGeobuf datastore '{datastore}' updated.")
+        return "updated"
+    return created
+
+
+def reset_datastore(workspace, datastore):
+    """Drops GeoServer's cached readers and feature type attributes for a store whose data changed underneath it."""
+    reset = get_client().put(f"{rest_url()}workspaces/{workspace}/datastores/{datastore}/reset")
+    if reset.status_code not in [200, 201, 204]:
+        print(f"[!] Failed to reset datastore '{datastore}': {reset.status_code} {reset.text}")
+        return False
+    return True
+
+
+def create_or_update_postgis_datastore(workspace, datastore, connection, snapshot=None):
+    """
+    Creates a PostGIS datastore from a connection dict (host, port, database,
+    schema, user, passwd) unless it already exists; tables loaded by
+    postgis_loader are then published with create_layer_from_datastore.
+
+    Returns:
+        str | None: "created" or "exists", None on failure.
+    """
+    parameters = {
+        "dbtype": "postgis",
+        "host": connection.get("host", "localhost"),
+        "port": connection.get("port", 5432),
+        "database": connection["database"],
+        "schema": connection.get("schema", "public"),
+        "user": connection["user"],
+        "passwd": connection.get("passwd", ""),
+        "Expose primary keys": "true",
+        "Loose bbox": "true",
+    }
+    return _create_datastore(workspace, datastore, "PostGIS", parameters, snapshot)
+
+
+def update_shapefile_layername(workspace_name, datastore_name, search_name, standard_layer_name, snapshot=None):
     featuretype_url = urljoin(
-    GEOSERVER_URL,
+    rest_url(),
     f"workspaces/{workspace_name}/datastores/{datastore_name}/featuretypes/{search_name}"
     )
     print(featuretype_url)
     headers = {"Content-Type": "text/xml"}
 
-    check_response = requests.get(
-        featuretype_url,
-        auth=(USERNAME, PASSWORD)
-    )
+    check_status, _ = _check_status(featuretype_url, snapshot, "featuretypes", workspace_name, search_name)
 
-    if check_response.status_code == 200:
+    if check_status == 200:
         update_payload = f"""
         <featureType>
         <name>{standard_layer_name}</name>
         </featureType>
         """
-        update_response = requests.put(
+        update_response = get_client().put(
             featuretype_url,
             data=update_payload,
-            headers=headers,
-            auth=(USERNAME, PASSWORD)
+            headers=headers
         )
 
         if update_response.status_code in [200, 201]:
             print(f"[✓] Layer name updated to '{standard_layer_name}'.")
+            if snapshot is not None:
+                snapshot.discard("featuretypes", workspace_name, search_name)
+                snapshot.add("featuretypes", workspace_name, standard_layer_name)
         else:
             print(f"[✗] Failed to update layer: {update_response.status_code} {update_response.text}")
 
 
-def create_layer_from_datastore(workspace, datastore, search_name, standard_layer_name, enable_update=False):
+def create_layer_from_datastore(workspace, datastore, search_name, standard_layer_name, enable_update=False,
+                                snapshot=None):
     datastore = datastore.replace(":", "_").replace(" ","_").replace(".","_")
-    featuretypes_url = f"{GEOSERVER_URL}workspaces/{workspace}/datastores/{datastore}/featuretypes"
+    featuretypes_url = f"{rest_url()}workspaces/{workspace}/datastores/{datastore}/featuretypes"
     layer_url = f"{featuretypes_url}/{standard_layer_name}"
     headers = {"Content-type": "text/xml"}
     payload = f"""
@@ -152,32 +333,36 @@ def create_layer_from_datastore(workspace, datastore, search_name, standard_laye
     """
 
     # First check if the layer exists
-    check_response = requests.get(layer_url, auth=(USERNAME, PASSWORD))
+    check_status, check_response = _check_status(layer_url, snapshot, "featuretypes", workspace, standard_layer_name)
 
-    if check_response.status_code == 200:
+    if check_status == 200:
         print(f"[!] Layer '{standard_layer_name}' already exists.")
         if enable_update:
-            update_response = requests.put(layer_url, data=payload.strip(), auth=(USERNAME, PASSWORD), headers=headers)
+            update_response = get_client().put(layer_url, data=payload.strip(), headers=headers)
             if update_response.status_code in [200, 201]:
                 print(f"[↻] Layer '{standard_layer_name}' updated successfully.")
             else:
                 print(f"[✗] Failed to update layer '{standard_layer_name}': {update_response.status_code}\n{update_response.text}")
         else:
             print(f"[!] Skipping update for layer '{standard_layer_name}'.")
-    elif check_response.status_code == 404:
+    elif check_status == 404:
         # Layer does not exist, so create it
-        create_response = requests.post(featuretypes_url, data=payload.strip(), auth=(USERNAME, PASSWORD), headers=headers)
+        create_response = get_client().post(featuretypes_url, data=payload.strip(), headers=headers)
         if create_response.status_code in [201, 200]:
             print(f"[✓] Layer '{standard_layer_name}' created successfully.")
+            if snapshot is not None:
+                snapshot.add("featuretypes", workspace, standard_layer_name)
         else:
             print(f"[✗] Failed to create layer '{standard_layer_name}': {create_response.status_code}\n{create_response.text}")
     else:
         print(f"[✗] Failed to check layer existence: {check_response.status_code}\n{check_response.text}")
 
 
-def workspace_exists(workspace):
-    url = urljoin(GEOSERVER_URL, f"workspaces/{workspace}")
-    response = requests.get(url, auth=(USERNAME, PASSWORD))
+def workspace_exists(workspace, snapshot=None):
+    if snapshot is not None:
+        return snapshot.workspace_exists(workspace)
+    url = urljoin(rest_url(), f"workspaces/{workspace}")
+    response = get_client().get(url)
     return response.status_code == 200
 
 def create_or_update_wms_datastore(workspace, datastore, wms_url,
@@ -187,7 +372,8 @@ def create_or_update_wms_datastore(workspace, datastore, wms_url,
                                    read_timeout=60,
                                    username=None,
                                    password=None,
-                                   enable_update=False):
+                                   enable_update=False,
+                                   snapshot=None):
 
     headers = {"Content-Type": "text/xml"}
     
@@ -215,13 +401,13 @@ def create_or_update_wms_datastore(workspace, datastore, wms_url,
 </wmsStore>""".strip()
 
     # Check if the datastore exists
-    check_url = f"{GEOSERVER_URL}workspaces/{workspace}/wmsstores/{datastore}"
-    response = requests.get(check_url, auth=(USERNAME, PASSWORD))
+    check_url = f"{rest_url()}workspaces/{workspace}/wmsstores/{datastore}"
+    status, response = _check_status(check_url, snapshot, "wmsstores", workspace, datastore)
 
-    if response.status_code == 200:
+    if status == 200:
         if enable_update:
             # Update
-            response = requests.put(check_url, data=payload, headers=headers, auth=(USERNAME, PASSWORD))
+            response = get_client().put(check_url, data=payload, headers=headers)
             print(response.status_code, "Update datastore.")
             if response.status_code in [200, 201]:
                 print(f"[✓] Updated WMS datastore '{datastore}'.")
@@ -229,13 +415,15 @@ def create_or_update_wms_datastore(workspace, datastore, wms_url,
                 raise Exception(f"[✗] Failed to update datastore: {response.status_code} -\n{response.text}")
         else:
             print(f"[↷] WMS datastore '{datastore}' already exists. Skipping update.")
-    elif response.status_code == 404:
+    elif status == 404:
         # Create
-        create_url = f"{GEOSERVER_URL}workspaces/{workspace}/wmsstores"
-        response = requests.post(create_url, data=payload, headers=headers, auth=(USERNAME, PASSWORD))
+        create_url = f"{rest_url()}workspaces/{workspace}/wmsstores"
+        response = get_client().post(create_url, data=payload, headers=headers)
         print(response.status_code, "Create datastore.")
         if response.status_code in [200, 201]:
             print(f"[✓] Created WMS datastore '{datastore}'.")
+            if snapshot is not None:
+                snapshot.add("wmsstores", workspace, datastore)
         else:
             raise Exception(f"[✗] Failed to create datastore: {response.status_code} -\n{response.text}")
     else:
@@ -249,47 +437,73 @@ def create_or_update_wms_datastore(workspace, datastore, wms_url,
 #     return response.status_code == 200
 
 
-def layer_exists(workspace, layer_name):
-    url = f"{GEOSERVER_URL}layers/{layer_name}.xml"
-    response = requests.get(url, auth=(USERNAME, PASSWORD))
+def layer_exists(workspace, layer_name, snapshot=None):
+    if snapshot is not None:
+        return (snapshot.exists("featuretypes", workspace, layer_name)
+                or snapshot.exists("wmslayers", workspace, layer_name))
+    url = f"{rest_url()}layers/{layer_name}.xml"
+    response = get_client().get(url)
     return response.status_code == 200
 
-def delete_wms_layer(workspace, datastore, layer_name):
+def output_datastore(backend, backend_options, workspace, native_name):
+    """Datastore a backend publishes a layer through: one per layer, or one PostGIS store per workspace."""
+    if backend == "postgis":
+        return (backend_options or {}).get("datastore", f"{workspace}_postgis")
+    return f"{native_name}_datastore"
+
+
+def layer_datastore(workspace, layer_name):
+    """Name of the datastore behind a published featuretype, read from its layer's resource link, or None."""
+    response = get_client().get(f"{rest_url()}layers/{workspace}:{layer_name}.json")
+    if response.status_code != 200:
+        return None
+    href = response.json().get("layer", {}).get("resource", {}).get("href", "")
+    match = re.search(r"/datastores/([^/]+)/featuretypes/", href)
+    return match.group(1) if match else None
+
+def delete_wms_layer(workspace, datastore, layer_name, snapshot=None):
     # Step 1: Unpublish the layer (from catalog)
-    unpublish_url = f"{GEOSERVER_URL}layers/{layer_name}"
-    response1 = requests.delete(unpublish_url, auth=(USERNAME, PASSWORD))
+    unpublish_url = f"{rest_url()}layers/{layer_name}"
+    response1 = get_client().delete(unpublish_url)
     if response1.status_code not in [200, 202, 204]:
         print(f"[!] Failed to unpublish: {response1.status_code} - {response1.text}")
     
     # Step 2: Delete the resource from the store
-    resource_url = f"{GEOSERVER_URL}workspaces/{workspace}/wmsstores/{datastore}/wmslayers/{layer_name}"
-    response2 = requests.delete(resource_url, auth=(USERNAME, PASSWORD))
+    resource_url = f"{rest_url()}workspaces/{workspace}/wmsstores/{datastore}/wmslayers/{layer_name}"
+    response2 = get_client().delete(resource_url)
     if response2.status_code not in [200, 202, 204]:
         print(f"[!] Failed to delete WMS layer resource: {response2.status_code} - {response2.text}")
     else:
         print(f"[✓] Fully deleted layer '{layer_name}'.")
+        if snapshot is not None:
+            snapshot.discard("wmslayers", workspace, layer_name)
 
 
-def wms_resource_exists(workspace, datastore, layer_name):
-    url = f"{GEOSERVER_URL}workspaces/{workspace}/wmsstores/{datastore}/wmslayers/{layer_name}.xml"
-    response = requests.get(url, auth=(USERNAME, PASSWORD))
+def wms_resource_exists(workspace, datastore, layer_name, snapshot=None):
+    if snapshot is not None:
+        return snapshot.exists("wmslayers", workspace, layer_name)
+    url = f"{rest_url()}workspaces/{workspace}/wmsstores/{datastore}/wmslayers/{layer_name}.xml"
+    response = get_client().get(url)
     return response.status_code == 200
 
-def create_or_update_wms_layer(workspace, datastore, layer_name, standard_layer_name, enable_update=False):
+def create_or_update_wms_layer(workspace, datastore, layer_name, standard_layer_name, enable_update=False,
+                               snapshot=None):
     # layer_name  =  layer_name.replace(" ", "_").replace(".", "_").replace(":", "_")
     # standard_layer_name =layer_name.replace(" ", "_").replace(".", "_").replace(":", "_")
 
-    if wms_resource_exists(workspace, datastore, standard_layer_name):
+    outcome = "created"
+    if wms_resource_exists(workspace, datastore, standard_layer_name, snapshot):
         if enable_update:
             print("Deleting existing WMS layer and resource.")
-            delete_wms_layer( workspace, datastore, standard_layer_name)
+            delete_wms_layer( workspace, datastore, standard_layer_name, snapshot)
+            outcome = "updated"
         else:
             print(f"[↷] WMS layer '{layer_name}' already exists. Skipping update.")
-            return
+            return None
 
     # Step 3: Recreate the WMS layer
     print("Creating new WMS layer.")
-    create_url = f"{GEOSERVER_URL}workspaces/{workspace}/wmsstores/{datastore}/wmslayers"
+    create_url = f"{rest_url()}workspaces/{workspace}/wmsstores/{datastore}/wmslayers"
     headers = {"Content-type": "text/xml"}
     payload = f"""
     <wmsLayer>
@@ -297,9 +511,12 @@ def create_or_update_wms_layer(workspace, datastore, layer_name, standard_layer_
         <nativeName>{layer_name}</nativeName>
     </wmsLayer>
     """
-    response = requests.post(create_url, data=payload.strip(), headers=headers, auth=(USERNAME, PASSWORD))
+    response = get_client().post(create_url, data=payload.strip(), headers=headers)
     if response.status_code in [200, 201]:
         print(f"[✓] Created WMS layer '{layer_name}'.")
+        if snapshot is not None:
+            snapshot.add("wmslayers", workspace, standard_layer_name)
+        return outcome
     else:
         raise Exception(f"[✗] Failed to create layer: {response.status_code} - {response}")
 
@@ -310,18 +527,19 @@ def log(message, level="info"):
 
 def upload_and_assign_style(workspace, layer_name, style_name, sld_path):
     headers = {"Content-type": "application/vnd.ogc.sld+xml"}
-    style_url = f"{GEOSERVER_URL}workspaces/{workspace}/styles"
-    style_file_url = f"{GEOSERVER_URL}workspaces/{workspace}/styles/{style_name}"
-    style_assign_url = f"{GEOSERVER_URL}layers/{workspace}:{layer_name}"
+    style_url = f"{rest_url()}workspaces/{workspace}/styles"
+    style_file_url = f"{rest_url()}workspaces/{workspace}/styles/{style_name}"
+    style_assign_url = f"{rest_url()}layers/{workspace}:{layer_name}"
     
     # Step 1: Check if style exists
-    style_list_url = f"{GEOSERVER_URL}workspaces/{workspace}/styles.json"
-    resp = requests.get(style_list_url, auth=(USERNAME, PASSWORD))
+    style_list_url = f"{rest_url()}workspaces/{workspace}/styles.json"
+    resp = get_client().get(style_list_url)
     if resp.status_code != 200:
         log(f"Failed to fetch style list: {resp.status_code} {resp.text}", "error")
         return
     
-    style_names = [s["name"] for s in resp.json().get("styles", {}).get("style", [])]
+    # GeoServer answers an empty style list with "styles": ""
+    style_names = [s["name"] for s in (resp.json().get("styles") or {}).get("style", [])]
     style_exists = style_name in style_names
     
     # Step 2: Read and validate SLD XML
@@ -349,11 +567,10 @@ def upload_and_assign_style(workspace, layer_name, style_name, sld_path):
         """
         create_headers = {"Content-type": "application/xml"}
         
-        create_style = requests.post(
+        create_style = get_client().post(
             style_url,
             data=create_style_payload,
-            headers=create_headers,
-            auth=(USERNAME, PASSWORD)
+            headers=create_headers
         )
         
         if create_style.status_code not in [200, 201]:
@@ -361,11 +578,10 @@ def upload_and_assign_style(workspace, layer_name, style_name, sld_path):
             return
         
         # Then upload the actual SLD content
-        upload = requests.put(
+        upload = get_client().put(
             f"{style_file_url}",
             data=sld_content,
-            headers=headers,
-            auth=(USERNAME, PASSWORD)
+            headers=headers
         )
         
         if upload.status_code not in [200, 201]:
@@ -377,11 +593,10 @@ def upload_and_assign_style(workspace, layer_name, style_name, sld_path):
         log(f"Style '{style_name}' already exists. Updating...", "info")
         
         # Update the actual SLD content
-        update = requests.put(
+        update = get_client().put(
             f"{style_file_url}",
             data=sld_content,
-            headers=headers,
-            auth=(USERNAME, PASSWORD)
+            headers=headers
         )
         
         if update.status_code not in [200, 201]:
@@ -407,11 +622,10 @@ def upload_and_assign_style(workspace, layer_name, style_name, sld_path):
     """.strip()
     
     assign_headers = {"Content-type": "application/xml"}
-    assign = requests.put(
+    assign = get_client().put(
         style_assign_url,
         data=assign_payload,
-        headers=assign_headers,
-        auth=(USERNAME, PASSWORD)
+        headers=assign_headers
     )
     
     if assign.status_code in [200, 201, 204]:
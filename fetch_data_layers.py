@@ -1,13 +1,143 @@
-from owslib.wfs import WebFeatureService
-import geopandas as gpd
 from io import BytesIO, StringIO
+from collections import OrderedDict, namedtuple
+from urllib.parse import parse_qsl, urlencode
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import nullcontext
+import contextvars
+import xml.etree.ElementTree as ET
+import csv
+import hashlib
+import json
+import os
+import sys
+import tempfile
+import threading
+import time
+from resilience import ResilientSession, CircuitBreakers
 
-def fetch_wfs_layer(wfs_url, typename, output_format, version="1.0.0"):
+# Shared keep-alive session for upstream WFS endpoints; retries transient
+# failures and stops calling a host after repeated failures
+upstream_session = ResilientSession(breakers=CircuitBreakers())
+
+# File suffix used for streamed downloads of each supported output format
+FORMAT_SUFFIXES = {"csv": ".csv", "GeoJSON": ".geojson", "json": ".geojson", "SHAPE-ZIP": ".zip"}
+
+# path is None when the server answered 304 Not Modified to a conditional request
+WfsDownload = namedtuple("WfsDownload", ["path", "url", "size", "etag", "last_modified", "feature_count"],
+                         defaults=(None,))
+
+
+class CapabilitiesCache:
+    """
+    In-memory LRU cache of parsed WFS capabilities keyed by (url, version),
+    optionally backed by raw capabilities XML files on disk, so each endpoint's
+    GetCapabilities document is downloaded and parsed once per run (or once
+    per ttl across runs when cache_dir is set).
+
+    Args:
+        ttl (float): Seconds a cached document stays valid.
+        max_entries (int): Parsed services kept in memory before LRU eviction.
+        cache_dir (str): Optional directory for the on-disk XML cache.
+        timeout (float): Timeout in seconds for capabilities requests.
+    """
+
+    def __init__(self, ttl=3600, max_entries=32, cache_dir=None, timeout=60):
+        self.ttl = ttl
+        self.max_entries = max_entries
+        self.cache_dir = cache_dir
+        self.timeout = timeout
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+        # A fixed pool of striped locks, so per-endpoint locking doesn't grow with every endpoint ever seen
+        self._key_locks = [threading.Lock() for _ in range(16)]
+
+    def get(self, wfs_url, version):
+        """Returns (WebFeatureService, typename index) for the endpoint."""
+        key = (wfs_url, version)
+        key_lock = self._key_locks[hash(key) % len(self._key_locks)]
+
+        # Concurrent callers for the same endpoint wait for a single fetch
+        with key_lock:
+            with self._lock:
+                entry = self._entries.get(key)
+                if entry and time.time() - entry[0] < self.ttl:
+                    self._entries.move_to_end(key)
+                    return entry[1], entry[2]
+
+            # owslib is imported on first use so runs that never touch a WFS don't pay for it
+            from owslib.wfs import WebFeatureService
+            wfs = WebFeatureService(wfs_url, version=version, xml=self._capabilities_xml(wfs_url, version))
+            index = build_typename_index(wfs.contents.keys())
+
+            with self._lock:
+                self._entries[key] = (time.time(), wfs, index)
+                self._entries.move_to_end(key)
+                while len(self._entries) > self.max_entries:
+                    self._entries.popitem(last=False)
+            return wfs, index
+
+    def invalidate(self, wfs_url, version):
+        with self._lock:
+            self._entries.pop((wfs_url, version), None)
+        disk_path = self._disk_path(wfs_url, version)
+        if disk_path and os.path.exists(disk_path):
+            os.remove(disk_path)
+
+    def _disk_path(self, wfs_url, version):
+        if not self.cache_dir:
+            return None
+        digest = hashlib.sha1(f"{wfs_url}|{version}".encode("utf-8")).hexdigest()
+        return os.path.join(self.cache_dir, f"{digest}.xml")
+
+    def _capabilities_xml(self, wfs_url, version):
+        disk_path = self._disk_path(wfs_url, version)
+        if disk_path and os.path.exists(disk_path) and time.time() - os.path.getmtime(disk_path) < self.ttl:
+            with open(disk_path, "rb") as f:
+                return f.read()
+
+        from owslib.feature.common import WFSCapabilitiesReader
+        capabilities_url = WFSCapabilitiesReader(version).capabilities_url(wfs_url)
+        response = upstream_session.get(capabilities_url, timeout=self.timeout)
+        response.raise_for_status()
+        xml = response.content
+
+        if disk_path:
+            os.makedirs(self.cache_dir, exist_ok=True)
+            tmp_path = f"{disk_path}.{os.getpid()}.{threading.get_ident()}.tmp"
+            with open(tmp_path, "wb") as f:
+                f.write(xml)
+            os.replace(tmp_path, disk_path)
+        return xml
+
+
+def build_typename_index(typenames):
+    """Maps each full typename and its unprefixed local name to the full typenames."""
+    index = {}
+    for name in typenames:
+        index.setdefault(name, []).append(name)
+        local_name = name.split(":", 1)[-1]
+        if local_name != name:
+            index.setdefault(local_name, []).append(name)
+    return index
+
+
+def find_typenames(index, typename, typenames):
+    matches = index.get(typename)
+    if matches:
+        return matches
+    # Fall back to a substring scan for partial search names
+    return [name for name in typenames if typename in name]
+
+
+capabilities_cache = CapabilitiesCache()
+
+
+def fetch_wfs_layer(wfs_url, typename, output_format, version="1.0.0", cache=None):
     try:
-        eaWFS = WebFeatureService(wfs_url, version=version)
-        
-        typename_exists = [i for i in eaWFS.contents.keys() if typename in i]
-        
+        eaWFS, typename_index = (cache or capabilities_cache).get(wfs_url, version)
+
+        typename_exists = find_typenames(typename_index, typename, eaWFS.contents.keys())
+
         if not typename_exists:
             print(f"[!] Layer '{typename}' not found in WFS.")
             return None
@@ -26,3 +156,258 @@ def fetch_wfs_layer(wfs_url, typename, output_format, version="1.0.0"):
     except Exception as e:
         print(f"[✗] Error fetching WFS layer '{typename}': {e}")
         return None
+
+
+def build_getfeature_url(wfs, typenames, output_format, **params):
+    """Builds a KVP GetFeature URL against the service's advertised GET endpoint."""
+    try:
+        base_url = next(m["url"] for m in wfs.getOperationByName("GetFeature").methods
+                        if m["type"].lower() == "get")
+    except (KeyError, StopIteration):
+        base_url = wfs.url
+
+    typename_key = "typenames" if wfs.version.startswith("2") else "typename"
+    query = {
+        "service": "WFS",
+        "version": wfs.version,
+        "request": "GetFeature",
+        typename_key: ",".join(typenames),
+    }
+    if output_format:
+        query["outputFormat"] = output_format
+    query.update({key: value for key, value in params.items() if value is not None})
+
+    base, _, existing = base_url.partition("?")
+    overridden = {key.lower() for key in query}
+    kept = [(key, value) for key, value in parse_qsl(existing) if key.lower() not in overridden]
+    return f"{base}?{urlencode(kept + list(query.items()))}"
+
+
+def download_to_file(url, suffix="", download_dir=None, chunk_size=1024 * 1024, timeout=(10, 300),
+                     headers=None):
+    """
+    Streams a GET response to a temporary file in chunk_size pieces, so peak
+    memory stays bounded however large the payload is. The caller owns the
+    returned file and must remove it.
+    """
+    fd, path = tempfile.mkstemp(suffix=suffix, dir=download_dir)
+    size = 0
+    try:
+        with os.fdopen(fd, "wb") as f, upstream_session.get(url, stream=True, timeout=timeout, headers=headers) as response:
+            response.raise_for_status()
+            for chunk in response.iter_content(chunk_size=chunk_size):
+                f.write(chunk)
+                size += len(chunk)
+        if response.status_code == 304:
+            os.remove(path)
+            return WfsDownload(None, url, 0, response.headers.get("ETag"), response.headers.get("Last-Modified"))
+        return WfsDownload(path, url, size, response.headers.get("ETag"), response.headers.get("Last-Modified"))
+    except BaseException:
+        if os.path.exists(path):
+            os.remove(path)
+        raise
+
+
+def count_features(wfs, typenames, timeout=(10, 120)):
+    """Asks the server for the layer's feature count (resultType=hits), or None if unsupported."""
+    if wfs.version.startswith("1.0"):
+        return None
+    try:
+        response = upstream_session.get(build_getfeature_url(wfs, typenames, None, resultType="hits"), timeout=timeout)
+        response.raise_for_status()
+        root = ET.fromstring(response.content)
+        count = root.attrib.get("numberMatched", root.attrib.get("numberOfFeatures"))
+        return int(count) if count and count.isdigit() else None
+    except Exception as e:
+        print(f"[!] Could not get feature count for {typenames}: {e}")
+        return None
+
+
+def _tile_bboxes(bbox, tile_grid):
+    minx, miny, maxx, maxy = bbox[:4]
+    width, height = (maxx - minx) / tile_grid, (maxy - miny) / tile_grid
+    for i in range(tile_grid):
+        for j in range(tile_grid):
+            yield (minx + i * width, miny + j * height, minx + (i + 1) * width, miny + (j + 1) * height)
+
+
+def _merge_geojson_parts(part_paths, output_path, dedupe=False):
+    """Merges GeoJSON pages into one collection. Returns the number of features written."""
+    seen_ids = set()
+    written = 0
+    with open(output_path, "w", encoding="utf-8") as out:
+        out.write('{"type": "FeatureCollection", ')
+        first_feature = True
+        for index, part_path in enumerate(part_paths):
+            with open(part_path, "rb") as f:
+                collection = json.load(f)
+            if index == 0 and collection.get("crs"):
+                out.write(f'"crs": {json.dumps(collection["crs"])}, ')
+            if index == 0:
+                out.write('"features": [')
+            for feature in collection.get("features", []):
+                feature_id = feature.get("id")
+                if dedupe and feature_id is not None:
+                    if feature_id in seen_ids:
+                        continue
+                    seen_ids.add(feature_id)
+                if not first_feature:
+                    out.write(",\n")
+                out.write(json.dumps(feature))
+                first_feature = False
+                written += 1
+        if not part_paths:
+            out.write('"features": [')
+        out.write("]}")
+    return written
+
+
+def _merge_csv_parts(part_paths, output_path, dedupe=False):
+    """Merges CSV pages under the first page's header. Returns the number of rows written."""
+    # WKT geometries easily exceed the csv module's default field limit
+    csv.field_size_limit(min(sys.maxsize, 2**31 - 1))
+    seen_ids = set()
+    written = 0
+    with open(output_path, "w", encoding="utf-8", newline="") as out:
+        writer = csv.writer(out)
+        for index, part_path in enumerate(part_paths):
+            with open(part_path, encoding="utf-8", newline="") as f:
+                reader = csv.reader(f)
+                header = next(reader, None)
+                if header is None:
+                    continue
+                if index == 0:
+                    writer.writerow(header)
+                for row in reader:
+                    # GeoServer puts the feature id (FID) in the first column
+                    if dedupe and row:
+                        if row[0] in seen_ids:
+                            continue
+                        seen_ids.add(row[0])
+                    writer.writerow(row)
+                    written += 1
+    return written
+
+
+def _download_pages(page_urls, output_format, download_dir, max_workers, host_limiter, dedupe):
+    suffix = FORMAT_SUFFIXES[output_format]
+
+    def download_page(url):
+        with host_limiter.limit(url) if host_limiter else nullcontext():
+            return download_to_file(url, suffix, download_dir)
+
+    with ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="wfs-page") as executor:
+        # Each page runs in a copy of the caller's context, so per-layer metrics see it as the layer's request
+        futures = [executor.submit(contextvars.copy_context().run, download_page, url) for url in page_urls]
+    # Leaving the pool waits for every page, so no part file is still being written
+    parts = [future.result() for future in futures if not future.exception()]
+
+    try:
+        errors = [future.exception() for future in futures if future.exception()]
+        if errors:
+            raise errors[0]
+
+        fd, merged_path = tempfile.mkstemp(suffix=suffix, dir=download_dir)
+        os.close(fd)
+        part_paths = [part.path for part in parts]
+        try:
+            if output_format == "csv":
+                written = _merge_csv_parts(part_paths, merged_path, dedupe)
+            else:
+                written = _merge_geojson_parts(part_paths, merged_path, dedupe)
+        except BaseException:
+            os.remove(merged_path)
+            raise
+        return WfsDownload(merged_path, page_urls[0], os.path.getsize(merged_path), None, None, written)
+    finally:
+        for part in parts:
+            os.remove(part.path)
+
+
+def stream_wfs_layer(wfs_url, typename, output_format, version="1.0.0", download_dir=None, cache=None,
+                     page_size=None, tile_grid=None, max_workers=4, host_limiter=None, validators=None):
+    """
+    Streaming counterpart of fetch_wfs_layer: downloads the GetFeature response
+    straight to a temporary file instead of holding it in memory.
+
+    Large layers can be split into several requests that run concurrently and
+    are merged into one file afterwards (GeoJSON and CSV only):
+
+    - WFS 2.0: with page_size set, the layer is paged with count/startIndex
+      once resultType=hits reports more than page_size features.
+    - WFS 1.x: with tile_grid set, the layer's WGS84 bounding box is split into
+      tile_grid x tile_grid bbox queries.
+
+    Merged pages are de-duplicated by feature id and must add up to the
+    resultType=hits total. Servers don't promise a stable order across pages,
+    and a stale advertised extent can leave features outside every tile, so
+    a short merge (or a layer whose total can't be counted, as on WFS 1.0.0)
+    is fetched again as a single request.
+
+    validators ({"etag": ..., "last_modified": ...}) from a previous run turn
+    a single-request download into a conditional GET; a 304 answer comes
+    back as a WfsDownload whose path is None.
+
+    Returns:
+        WfsDownload | None: The downloaded file path and response metadata,
+                            or None when the layer could not be fetched.
+    """
+    try:
+        if output_format not in FORMAT_SUFFIXES:
+            print(f"[!] Unsupported output format: {output_format}")
+            return None
+
+        eaWFS, typename_index = (cache or capabilities_cache).get(wfs_url, version)
+        typename_exists = find_typenames(typename_index, typename, eaWFS.contents.keys())
+        if not typename_exists:
+            print(f"[!] Layer '{typename}' not found in WFS.")
+            return None
+
+        page_urls = []
+        total = None
+        if output_format != "SHAPE-ZIP":
+            if page_size and eaWFS.version.startswith("2"):
+                total = count_features(eaWFS, typename_exists)
+                if total and total > page_size:
+                    page_urls = [build_getfeature_url(eaWFS, typename_exists, output_format,
+                                                      count=page_size, startIndex=start)
+                                 for start in range(0, total, page_size)]
+                    print(f"[→] Fetching {total} features of '{typename}' in {len(page_urls)} pages.")
+            elif tile_grid and tile_grid > 1 and not eaWFS.version.startswith("2"):
+                bbox = getattr(eaWFS.contents[typename_exists[0]], "boundingBoxWGS84", None)
+                total = count_features(eaWFS, typename_exists) if bbox else None
+                if total is not None:
+                    page_urls = [build_getfeature_url(eaWFS, typename_exists, output_format,
+                                                      bbox=",".join(str(v) for v in tile) + ",EPSG:4326")
+                                 for tile in _tile_bboxes(bbox, tile_grid)]
+                    print(f"[→] Fetching '{typename}' as {len(page_urls)} bbox tiles.")
+                elif bbox:
+                    print(f"[!] Can't count '{typename}' to check bbox tiles; fetching it in one request.")
+
+        download = None
+        if page_urls:
+            download = _download_pages(page_urls, output_format, download_dir, max_workers, host_limiter,
+                                       dedupe=True)
+            if download.feature_count != total:
+                print(f"[!] Pages of '{typename}' held {download.feature_count} of {total} features; "
+                      f"fetching it in one request.")
+                os.remove(download.path)
+                download = None
+        if download is None:
+            request_url = build_getfeature_url(eaWFS, typename_exists, output_format)
+            conditional_headers = {}
+            if validators and validators.get("etag"):
+                conditional_headers["If-None-Match"] = validators["etag"]
+            if validators and validators.get("last_modified"):
+                conditional_headers["If-Modified-Since"] = validators["last_modified"]
+            with host_limiter.limit(request_url) if host_limiter else nullcontext():
+                download = download_to_file(request_url, FORMAT_SUFFIXES[output_format], download_dir,
+                                            headers=conditional_headers or None)
+            if download.path is None:
+                print(f"[↷] '{typename}' not modified upstream.")
+                return download
+        print(f"[✓] Downloaded {download.size} bytes for '{typename}'.")
+        return download
+    except Exception as e:
+        print(f"[✗] Error fetching WFS layer '{typename}': {e}")
+        return None
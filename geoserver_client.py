@@ -0,0 +1,81 @@
+import time
+from requests.adapters import HTTPAdapter
+from resilience import ResilientSession, CircuitBreakers
+
+
+class GeoServerClient:
+    """
+    Thin wrapper around a pooled, keep-alive ``requests.Session`` used for all
+    GeoServer REST calls, so a region run reuses a handful of TCP/TLS
+    connections instead of opening a new one per request.
+
+    Args:
+        base_url (str): GeoServer REST root, e.g. "https://host/geoserver/rest/".
+        username (str): GeoServer user sent as basic auth on every request.
+        password (str): GeoServer password.
+        pool_size (int): Maximum number of keep-alive connections kept open.
+        pool_block (bool): Block when all pooled connections are busy instead
+                           of opening extra throwaway connections.
+        timeout (float | tuple): Default (connect, read) timeout in seconds.
+        headers (dict): Extra default headers sent with every request.
+        retry (RetryPolicy): Retry/backoff settings for transient failures
+                             (e.g. a 503 during a catalog reload).
+        breakers (CircuitBreakers): Per-host circuit breakers; defaults to a
+                                    fresh CircuitBreakers().
+    """
+
+    def __init__(self, base_url, username, password, pool_size=10, pool_block=True,
+                 timeout=(10, 120), headers=None, retry=None, breakers=None):
+        self.base_url = base_url
+        self.timeout = timeout
+        self._observers = []
+
+        self.session = ResilientSession(retry=retry, breakers=breakers or CircuitBreakers())
+        self.session.auth = (username, password)
+        self.session.headers.update({"Connection": "keep-alive"})
+        if headers:
+            self.session.headers.update(headers)
+
+        adapter = HTTPAdapter(pool_connections=pool_size, pool_maxsize=pool_size, pool_block=pool_block)
+        self.session.mount("http://", adapter)
+        self.session.mount("https://", adapter)
+
+    def add_observer(self, observer):
+        """Registers observer(method, url, status_code, seconds, error), called after every request."""
+        self._observers.append(observer)
+
+    def request(self, method, url, **kwargs):
+        kwargs.setdefault("timeout", self.timeout)
+        started = time.perf_counter()
+        try:
+            response = self.session.request(method, url, **kwargs)
+        except Exception as e:
+            self._notify(method, url, None, time.perf_counter() - started, e)
+            raise
+        self._notify(method, url, response.status_code, time.perf_counter() - started, None)
+        return response
+
+    def _notify(self, method, url, status_code, seconds, error):
+        for observer in self._observers:
+            observer(method, url, status_code, seconds, error)
+
+    def get(self, url, **kwargs):
+        return self.request("GET", url, **kwargs)
+
+    def post(self, url, data=None, **kwargs):
+        return self.request("POST", url, data=data, **kwargs)
+
+    def put(self, url, data=None, **kwargs):
+        return self.request("PUT", url, data=data, **kwargs)
+
+    def delete(self, url, **kwargs):
+        return self.request("DELETE", url, **kwargs)
+
+    def close(self):
+        self.session.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
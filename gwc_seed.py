@@ -0,0 +1,138 @@
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from create_geoserver_instances import get_client
+
+# GWC task states in the seed status arrays
+TASK_ABORTED, TASK_PENDING, TASK_RUNNING, TASK_DONE = -1, 0, 1, 2
+
+DEFAULT_SEED_OPTIONS = {
+    "zoom_start": 0,
+    "zoom_stop": 10,
+    "gridsets": ["EPSG:900913"],
+    "format": "image/png",
+    "threads": 2,
+    # None: "seed" for new layers, "reseed" for updated ones; or force "seed", "reseed" or "truncate"
+    "type": None,
+    "poll_interval": 10,
+    "timeout": 3600,
+}
+
+
+def gwc_rest_url(geoserver_rest_url):
+    """GeoWebCache REST root next to the GeoServer one: ".../geoserver/rest/" -> ".../geoserver/gwc/rest/"."""
+    base = geoserver_rest_url.rstrip("/")
+    if base.endswith("/rest"):
+        base = base[:-len("/rest")]
+    return f"{base}/gwc/rest/"
+
+
+def seed_request(layer, gridset, options, task_type):
+    return {"seedRequest": {
+        "name": layer,
+        "gridSetId": gridset,
+        "zoomStart": options["zoom_start"],
+        "zoomStop": options["zoom_stop"],
+        "format": options["format"],
+        "type": task_type,
+        "threadCount": options["threads"],
+    }}
+
+
+def parse_tasks(payload):
+    """
+    Seed status arrays as dicts. GWC reports each task of a layer as
+    [tiles done, tiles total, seconds remaining, task id, state].
+    """
+    return [{"done": task[0], "total": task[1], "remaining": task[2], "id": task[3], "state": task[4]}
+            for task in payload.get("long-array-array", [])]
+
+
+class GwcSeeder:
+    """
+    Post-publish tile warming through the GeoWebCache REST API. Layers are
+    submitted as they are published; each one gets its seed (or truncate)
+    tasks issued and is then polled on a worker thread until its tasks
+    finish, so many layers are tracked at once while GeoServer renders.
+
+    Only layers that were actually created or updated should be submitted;
+    an unchanged layer keeps its cached tiles.
+
+    Args:
+        options (dict): Overrides for DEFAULT_SEED_OPTIONS.
+        max_workers (int): Layers issued and polled concurrently.
+        gwc_url (str): GWC REST root; defaults to the one next to the client's REST root.
+        client (GeoServerClient): Defaults to the shared get_client().
+    """
+
+    def __init__(self, options=None, max_workers=4, gwc_url=None, client=None):
+        self.options = {**DEFAULT_SEED_OPTIONS, **(options or {})}
+        self.client = client or get_client()
+        self.gwc_url = gwc_url or gwc_rest_url(self.client.base_url)
+        self._executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="gwc-seed")
+        self._futures = {}
+        self._lock = threading.Lock()
+
+    def _seed_url(self, layer):
+        return f"{self.gwc_url}seed/{layer}.json"
+
+    def submit(self, workspace, layer_name, outcome="created"):
+        """Queues seeding for workspace:layer_name; outcome is the publish result ("created" or "updated")."""
+        layer = f"{workspace}:{layer_name}"
+        task_type = self.options["type"] or ("reseed" if outcome == "updated" else "seed")
+        with self._lock:
+            if layer not in self._futures:
+                self._futures[layer] = self._executor.submit(self._run, layer, task_type)
+            return self._futures[layer]
+
+    def _run(self, layer, task_type):
+        try:
+            for gridset in self.options["gridsets"]:
+                response = self.client.post(self._seed_url(layer), json=seed_request(layer, gridset, self.options,
+                                                                                      task_type))
+                if response.status_code not in [200, 201]:
+                    print(f"[✗] GWC {task_type} for '{layer}' ({gridset}) rejected: "
+                          f"{response.status_code} {response.text[:200]}")
+                    return "failed"
+            print(f"[→] GWC {task_type} issued for '{layer}' on {', '.join(self.options['gridsets'])}")
+            return self._wait(layer, task_type)
+        except Exception as e:
+            print(f"[✗] GWC {task_type} for '{layer}' failed: {e}")
+            return "failed"
+
+    def _wait(self, layer, task_type):
+        deadline = time.monotonic() + self.options["timeout"]
+        while True:
+            response = self.client.get(self._seed_url(layer))
+            if response.status_code != 200:
+                print(f"[✗] Could not read GWC status for '{layer}': {response.status_code}")
+                return "failed"
+            tasks = parse_tasks(response.json())
+            if any(task["state"] == TASK_ABORTED for task in tasks):
+                print(f"[✗] GWC {task_type} for '{layer}' aborted")
+                return "aborted"
+            active = [task for task in tasks if task["state"] in (TASK_PENDING, TASK_RUNNING)]
+            # Finished tasks drop out of the list
+            if not active:
+                print(f"[✓] GWC {task_type} finished for '{layer}'")
+                return "done"
+            if time.monotonic() >= deadline:
+                self.kill(layer)
+                print(f"[✗] GWC {task_type} for '{layer}' timed out after {self.options['timeout']}s; tasks killed")
+                return "timeout"
+            done = sum(task["done"] for task in active)
+            total = sum(task["total"] for task in active)
+            print(f"[→] GWC {task_type} '{layer}': {done}/{total} tiles, {len(active)} task(s) active")
+            time.sleep(self.options["poll_interval"])
+
+    def kill(self, layer):
+        """Stops the layer's running and pending tasks."""
+        self.client.post(f"{self.gwc_url}seed/{layer}", data={"kill_all": "all"})
+
+    def wait(self):
+        """Blocks until every submitted layer is finished. Returns {"workspace:layer": result}."""
+        with self._lock:
+            futures = dict(self._futures)
+        results = {layer: future.result() for layer, future in futures.items()}
+        self._executor.shutdown()
+        return results
@@ -0,0 +1,194 @@
+import contextvars
+import json
+import threading
+import time
+from contextlib import contextmanager
+from urllib.parse import urlparse
+from run_workspace import AppendLog, atomic_path
+
+# Path segments that are followed by an object name in GeoServer REST URLs
+_NAMED_COLLECTIONS = {
+    "workspaces", "datastores", "wmsstores", "featuretypes", "wmslayers", "styles", "layers",
+    "coveragestores", "coverages", "imports", "tasks", "seed",
+}
+
+LAYER_COUNTERS = ["bytes_downloaded", "zip_size", "rest_calls", "rest_seconds", "http_calls", "retries",
+                  "cache_hits"]
+
+
+def endpoint_template(url):
+    """Collapses object names so calls group per endpoint, e.g. "workspaces/*/datastores/*/file.shp"."""
+    segments = [segment for segment in urlparse(url).path.split("/") if segment]
+    if "rest" in segments:
+        segments = segments[segments.index("rest") + 1:]
+    template = []
+    for index, segment in enumerate(segments):
+        if index > 0 and segments[index - 1] in _NAMED_COLLECTIONS and template[-1] != "*":
+            template.append("*")
+        else:
+            template.append(segment)
+    return "/".join(template)
+
+
+class IngestMetrics:
+    """
+    Collects per-layer stage timings and counters plus per-endpoint and
+    per-host HTTP statistics for one ingest run.
+
+    Stages are timed with `with metrics.stage(layer_key, "fetch"):`. HTTP calls
+    are attributed to whichever layer the calling thread is working on (see
+    layer()), whether they go through an observed GeoServerClient or an
+    observed upstream requests.Session. The layer is held in a context
+    variable, so helper threads run in a copy of the caller's context (e.g.
+    WFS page downloads) count towards the same layer.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._layer_key = contextvars.ContextVar("ingest_layer_key", default=None)
+        self.layers = {}
+        self.endpoints = {}
+        self.hosts = {}
+        self.started = time.time()
+
+    def _layer(self, layer_key):
+        if layer_key not in self.layers:
+            self.layers[layer_key] = {"stages": {}, **{counter: 0 for counter in LAYER_COUNTERS}}
+        return self.layers[layer_key]
+
+    @contextmanager
+    def layer(self, layer_key):
+        token = self._layer_key.set(layer_key)
+        try:
+            yield
+        finally:
+            self._layer_key.reset(token)
+
+    @contextmanager
+    def stage(self, layer_key, stage):
+        started = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.add_stage(layer_key, stage, time.perf_counter() - started)
+
+    def add_stage(self, layer_key, stage, seconds):
+        """Adds time spent outside the layer's own thread, e.g. its share of a region-wide import."""
+        with self._lock:
+            stages = self._layer(layer_key)["stages"]
+            stages[stage] = stages.get(stage, 0.0) + seconds
+
+    def add(self, layer_key, counter, value=1):
+        with self._lock:
+            layer = self._layer(layer_key)
+            layer[counter] = layer.get(counter, 0) + value
+
+    def record_http(self, method, url, status, seconds, error=None, rest=True):
+        layer_key = self._layer_key.get()
+        host = urlparse(url).netloc
+        with self._lock:
+            if rest:
+                endpoint = self.endpoints.setdefault(
+                    (method, endpoint_template(url)), {"count": 0, "seconds": 0.0, "max_seconds": 0.0, "errors": 0}
+                )
+                endpoint["count"] += 1
+                endpoint["seconds"] += seconds
+                endpoint["max_seconds"] = max(endpoint["max_seconds"], seconds)
+                if error is not None or (status is not None and status >= 500):
+                    endpoint["errors"] += 1
+            host_stats = self.hosts.setdefault(host, {"count": 0, "seconds": 0.0, "errors": 0})
+            host_stats["count"] += 1
+            host_stats["seconds"] += seconds
+            if error is not None or (status is not None and status >= 500):
+                host_stats["errors"] += 1
+            if layer_key:
+                layer = self._layer(layer_key)
+                if rest:
+                    layer["rest_calls"] += 1
+                    layer["rest_seconds"] += seconds
+                else:
+                    layer["http_calls"] += 1
+
+    def record_retry(self, method, url, attempt, reason):
+        layer_key = self._layer_key.get()
+        with self._lock:
+            host_stats = self.hosts.setdefault(urlparse(url).netloc, {"count": 0, "seconds": 0.0, "errors": 0})
+            host_stats["retries"] = host_stats.get("retries", 0) + 1
+            if layer_key:
+                self._layer(layer_key)["retries"] += 1
+
+    def observe_client(self, client):
+        """Records every GeoServer REST call made through a GeoServerClient."""
+        client.add_observer(lambda method, url, status, seconds, error:
+                            self.record_http(method, url, status, seconds, error, rest=True))
+        client.session.retry_observers.append(self.record_retry)
+
+    def observe_session(self, session):
+        """Records upstream calls made through a requests.Session (time to response headers)."""
+        def hook(response, *args, **kwargs):
+            self.record_http(response.request.method, response.url, response.status_code,
+                             response.elapsed.total_seconds(), rest=False)
+        session.hooks["response"].append(hook)
+        if hasattr(session, "retry_observers"):
+            session.retry_observers.append(self.record_retry)
+
+    def layer_summary(self, layer_key):
+        with self._lock:
+            layer = self.layers.get(layer_key)
+            return json.loads(json.dumps(layer)) if layer else None
+
+    def write_jsonl(self, path):
+        with self._lock, AppendLog(path) as f:
+            run = {"run_started": self.started, "run_seconds": time.time() - self.started}
+            for layer_key, layer in self.layers.items():
+                f.write({"type": "layer", "layer": layer_key, **run, **layer})
+            for (method, endpoint), stats in self.endpoints.items():
+                f.write({"type": "endpoint", "method": method, "endpoint": endpoint, **run, **stats})
+            for host, stats in self.hosts.items():
+                f.write({"type": "host", "host": host, **run, **stats})
+
+    def write_prometheus(self, path):
+        """Writes a Prometheus text-format file (e.g. for node_exporter's textfile collector)."""
+        lines = [
+            "# TYPE geoserver_ingest_stage_seconds gauge",
+        ]
+        with self._lock:
+            for layer_key, layer in self.layers.items():
+                for stage, seconds in layer["stages"].items():
+                    lines.append(f'geoserver_ingest_stage_seconds{{layer="{layer_key}",stage="{stage}"}} {seconds:.6f}')
+            for counter in ["bytes_downloaded", "zip_size", "rest_calls", "retries"]:
+                lines.append(f"# TYPE geoserver_ingest_{counter} gauge")
+                for layer_key, layer in self.layers.items():
+                    lines.append(f'geoserver_ingest_{counter}{{layer="{layer_key}"}} {layer[counter]}')
+            for metric, field in [("http_requests_total", "count"), ("http_seconds_total", "seconds")]:
+                lines.append(f"# TYPE geoserver_ingest_{metric} counter")
+                for (method, endpoint), stats in self.endpoints.items():
+                    labels = f'method="{method}",endpoint="{endpoint}"'
+                    lines.append(f"geoserver_ingest_{metric}{{{labels}}} {stats[field]}")
+            lines.append("# TYPE geoserver_ingest_host_seconds_total counter")
+            for host, stats in self.hosts.items():
+                lines.append(f'geoserver_ingest_host_seconds_total{{host="{host}"}} {stats["seconds"]:.6f}')
+        # Rename so a scraper never reads a half-written file
+        with atomic_path(path) as tmp_path, open(tmp_path, "w", encoding="utf-8") as f:
+            f.write("\n".join(lines) + "\n")
+
+    def print_summary(self, top=5):
+        with self._lock:
+            layers = sorted(self.layers.items(), key=lambda item: sum(item[1]["stages"].values()), reverse=True)
+            hosts = sorted(self.hosts.items(), key=lambda item: item[1]["seconds"], reverse=True)
+            endpoints = sorted(self.endpoints.items(), key=lambda item: item[1]["seconds"], reverse=True)
+
+        print(f"\n[i] Run finished in {time.time() - self.started:.1f}s")
+        print("[i] Slowest layers:")
+        for layer_key, layer in layers[:top]:
+            stages = ", ".join(f"{stage} {seconds:.1f}s" for stage, seconds in layer["stages"].items())
+            print(f"    {layer_key}: {sum(layer['stages'].values()):.1f}s ({stages}); "
+                  f"{layer['bytes_downloaded']} bytes, {layer['rest_calls']} REST calls")
+        print("[i] Slowest hosts:")
+        for host, stats in hosts[:top]:
+            print(f"    {host}: {stats['seconds']:.1f}s over {stats['count']} requests, {stats['errors']} errors, "
+                  f"{stats.get('retries', 0)} retries")
+        print("[i] Slowest GeoServer endpoints:")
+        for (method, endpoint), stats in endpoints[:top]:
+            print(f"    {method} {endpoint}: {stats['count']} calls, {stats['seconds']:.1f}s total, "
+                  f"{stats['max_seconds']:.1f}s max")
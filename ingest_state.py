@@ -0,0 +1,113 @@
+import hashlib
+import json
+import sqlite3
+import threading
+import zipfile
+from datetime import datetime
+
+STATE_FIELDS = ["etag", "last_modified", "feature_count", "source_hash", "zip_hash", "output_fingerprint",
+                "updated_at"]
+
+
+def layer_key(region, layer):
+    return f"{region}/{layer['standard_layer_name']}"
+
+
+def output_fingerprint(backend, backend_options=None, optimize=None):
+    """
+    Hash of the settings that decide what a layer is published as. Stored
+    with the layer's state: the validators and hashes only allow skipping a
+    layer that was published with the same settings.
+    """
+    settings = {"backend": backend, "backend_options": backend_options or {}, "optimize": optimize or {}}
+    return hashlib.sha256(json.dumps(settings, sort_keys=True, default=str).encode("utf-8")).hexdigest()
+
+
+def file_sha256(path, chunk_size=1024 * 1024):
+    digest = hashlib.sha256()
+    with open(path, "rb") as f:
+        for chunk in iter(lambda: f.read(chunk_size), b""):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+def zip_content_hash(zip_path, chunk_size=1024 * 1024):
+    """
+    Hashes the member names and contents of a zip, ignoring zip timestamps and
+    the "last updated" date in .dbf headers, so re-converting unchanged data
+    produces the same hash.
+    """
+    digest = hashlib.sha256()
+    with zipfile.ZipFile(zip_path) as zf:
+        for name in sorted(zf.namelist()):
+            digest.update(name.encode("utf-8"))
+            with zf.open(name) as member:
+                first = True
+                for chunk in iter(lambda: member.read(chunk_size), b""):
+                    if first and name.lower().endswith(".dbf"):
+                        chunk = chunk[:1] + b"\0\0\0" + chunk[4:]
+                    first = False
+                    digest.update(chunk)
+    return digest.hexdigest()
+
+
+class LayerStateStore:
+    """
+    Persistent per-layer ingest state in a local SQLite file: HTTP validators
+    (ETag / Last-Modified), feature count, a hash of the downloaded payload and
+    a hash of the produced shapefile zip, plus the output_fingerprint of the
+    settings it was published with. Used to skip download, conversion and
+    upload for layers whose upstream data and output settings have not
+    changed.
+    """
+
+    def __init__(self, db_path="ingest_state.sqlite"):
+        self.db_path = db_path
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(db_path, check_same_thread=False)
+        with self._conn:
+            self._conn.execute(
+                """CREATE TABLE IF NOT EXISTS layer_state (
+                    layer_key TEXT PRIMARY KEY,
+                    etag TEXT,
+                    last_modified TEXT,
+                    feature_count INTEGER,
+                    source_hash TEXT,
+                    zip_hash TEXT,
+                    output_fingerprint TEXT,
+                    updated_at TEXT
+                )"""
+            )
+            columns = {row[1] for row in self._conn.execute("PRAGMA table_info(layer_state)")}
+            # State files from before output fingerprints; their layers are published once more
+            if "output_fingerprint" not in columns:
+                self._conn.execute("ALTER TABLE layer_state ADD COLUMN output_fingerprint TEXT")
+
+    def get(self, key):
+        with self._lock:
+            row = self._conn.execute(
+                f"SELECT {', '.join(STATE_FIELDS)} FROM layer_state WHERE layer_key = ?", (key,)
+            ).fetchone()
+        return dict(zip(STATE_FIELDS, row)) if row else None
+
+    def update(self, key, **fields):
+        unknown = set(fields) - set(STATE_FIELDS)
+        if unknown:
+            raise ValueError(f"Unknown state fields: {sorted(unknown)}")
+        fields["updated_at"] = datetime.utcnow().isoformat()
+        columns = ", ".join(fields)
+        placeholders = ", ".join("?" for _ in fields)
+        updates = ", ".join(f"{column} = excluded.{column}" for column in fields)
+        with self._lock, self._conn:
+            self._conn.execute(
+                f"INSERT INTO layer_state (layer_key, {columns}) VALUES (?, {placeholders}) "
+                f"ON CONFLICT(layer_key) DO UPDATE SET {updates}",
+                (key, *fields.values()),
+            )
+
+    def forget(self, key):
+        with self._lock, self._conn:
+            self._conn.execute("DELETE FROM layer_state WHERE layer_key = ?", (key,))
+
+    def close(self):
+        self._conn.close()
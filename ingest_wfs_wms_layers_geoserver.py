@@ -1,22 +1,105 @@
-from fetch_data_layers import fetch_wfs_layer
+from fetch_data_layers import stream_wfs_layer, upstream_session, WfsDownload
 from create_geoserver_instances import (
     create_workspace,
     create_or_update_shapefile_datastore,
+    create_or_update_geopackage_datastore,
+    create_or_update_flatgeobuf_datastore,
+    create_or_update_postgis_datastore,
+    layer_exists,
+    layer_datastore,
+    output_datastore,
+    reset_datastore,
     create_layer_from_datastore,
     workspace_exists,
     create_or_update_wms_datastore,
     create_or_update_wms_layer,
     upload_and_assign_style,
-    update_shapefile_layername
+    update_shapefile_layername,
+    configure,
+    get_client,
 )
+import argparse
 import os, json
-import pandas as pd
-import geopandas as gpd
-from cleanup import format_and_save_geodataframe
-from cleanup_layers_and_extract_shp_details import download_and_extract_omi
+import threading
+import multiprocessing
+from concurrent.futures import ThreadPoolExecutor, ProcessPoolExecutor
+from contextlib import nullcontext
+from concurrency import HostLimiter
+from catalog_snapshot import CatalogSnapshot
+from style_sync import sync_styles
+from ingest_metrics import IngestMetrics
+from gwc_seed import GwcSeeder
+from bulk_import import BulkImporter
+from layer_cache import LayerCache
+from run_workspace import AppendLog, RunWorkspace
+from ingest_state import LayerStateStore, layer_key, file_sha256, zip_content_hash, output_fingerprint
 from datetime import datetime
 
-def process_region_layers(region, layers, output_dir="final_output_files_v2"):
+def process_region_layers(region, layers, output_dir="final_output_files_v2", max_workers=1, host_limiter=None,
+                          fetch_options=None, state_store=None, convert_pool=None, snapshot=None, metrics=None,
+                          optimize=None, output_backend="shapefile", backend_options=None, seeder=None,
+                          publish_mode="per-layer", import_styles=None, layer_cache=None, from_cache=False):
+    """
+    Publishes every layer of a region into its "<region>_v2" workspace.
+
+    With max_workers > 1 independent layers are processed concurrently on a
+    thread pool. The workspace is still created before any layer, and each
+    shared WMS store is created once (under a per-link lock) before the layers
+    that reuse it. host_limiter bounds concurrent downloads per upstream host;
+    concurrency against GeoServer itself is bounded by the REST client pool.
+
+    fetch_options are passed to stream_wfs_layer (e.g. {"page_size": 5000,
+    "max_workers": 4}); a layer entry's own "page_size" / "tile_grid" keys
+    override them for that layer.
+
+    With a LayerStateStore, WFS layers are ingested incrementally: a 304 to a
+    conditional GET skips the layer entirely, an unchanged download skips
+    conversion and upload, and an unchanged shapefile zip skips the upload.
+    None of these skips apply once the layer's backend, backend_options or
+    optimize options differ from those it was last published with.
+
+    With a convert_pool (ProcessPoolExecutor), the CPU-bound parse, reproject
+    and shapefile write runs in worker processes. Layer threads block on the
+    result, so with max_workers above the pool size other layers keep
+    fetching and uploading while conversions run.
+
+    With a CatalogSnapshot, existence checks against GeoServer are answered
+    from one bulk listing per workspace instead of a GET per object.
+
+    With an IngestMetrics, each layer's stage timings, byte counts and REST
+    calls are recorded and added to its geoserver_logs.jsonl entry.
+
+    optimize is passed to format_and_save_geodataframe (column pruning, .qix
+    spatial index, simplified variants); a layer entry's own "optimize" dict
+    overrides it. Simplified variants are published as extra layers named
+    variant_name(standard_layer_name, tolerance).
+
+    output_backend selects how WFS layers are stored and published:
+    "shapefile" (zip upload), "geopackage" (file.gpkg upload), "flatgeobuf"
+    (needs the FlatGeobuf extension on GeoServer) or "postgis" (COPY into
+    backend_options["connection"], one PostGIS store per workspace). A layer
+    entry's own "output_backend" overrides it; Ontario OMI extracts are always
+    shapefiles.
+
+    With a GwcSeeder, every layer this run created or updated (including
+    simplified variants and cascaded WMS layers) is submitted for tile
+    seeding; unchanged and skipped layers are not. The caller waits on the
+    seeder.
+
+    publish_mode="importer" publishes the region's new shapefile layers in
+    one GeoServer Importer run (needs the Importer extension) instead of a
+    datastore upload and rename per layer; import_styles maps a standard or
+    search layer name to the style the import should give it. Existing
+    layers are still overwritten in place one by one.
+
+    With a LayerCache every fetched WFS layer is also kept as GeoParquet.
+    from_cache=True then converts cached layers from that file without any
+    upstream request, and without the unchanged-download skip, so a region
+    can be re-published or re-targeted offline; uncached layers are fetched.
+
+    Returns:
+        list[dict]: The log entry written for each layer, in input order.
+    """
     log_entry_template =  {
         "timestamp": None,
         "region": region,
@@ -42,129 +125,514 @@ def process_region_layers(region, layers, output_dir="final_output_files_v2"):
 
     enable_update = False
     workspace_name = f"{region}_v2"
-    check_workspace = workspace_exists(workspace_name)
-    workspace_created = not check_workspace
+    check_workspace = workspace_exists(workspace_name, snapshot)
+    workspace_created = False
     if not check_workspace:
-        create_workspace(workspace_name)
-        enable_update = False
+        workspace_created = create_workspace(workspace_name, snapshot=snapshot) == "created"
+        # Created by a concurrent worker in the meantime: treat it like an existing workspace
+        enable_update = not workspace_created
     else:
         enable_update = True
     # Track created WMS datastores for unique links
     wms_links_map = {}
+    wms_link_locks = {layer["link"]: threading.Lock() for layer in layers}
+    options = {"host_limiter": host_limiter, "fetch_options": fetch_options or {}, "state_store": state_store,
+               "convert_pool": convert_pool, "snapshot": snapshot, "metrics": metrics, "optimize": optimize or {},
+               "output_backend": output_backend, "backend_options": backend_options or {},
+               "seeder": seeder, "import_styles": import_styles or {}, "layer_cache": layer_cache,
+               "from_cache": from_cache,
+               "importer": BulkImporter(workspace_name, snapshot) if publish_mode == "importer" else None}
 
-    with open("geoserver_logs.jsonl", "a", encoding="utf-8") as jsonl_file:
-        for layer in layers:
+    # Appends are single O_APPEND writes, so parallel layers and runs can share the log
+    with AppendLog("geoserver_logs.jsonl") as jsonl_file:
+        def write_log(log_entry):
+            jsonl_file.write(log_entry)
+
+        def run_layer(layer):
             log_entry = log_entry_template.copy()
             log_entry["timestamp"] = datetime.utcnow().isoformat()
             log_entry["workspace_created"] = workspace_created
+            key = layer_key(region, layer)
+            with metrics.layer(key) if metrics else nullcontext():
+                _process_layer(region, layer, log_entry, workspace_name, region_dir, enable_update,
+                               wms_links_map, wms_link_locks, options)
+            # Layers queued for the bulk import are logged once the import has run
+            if not log_entry.get("import_pending"):
+                finish_log(log_entry, key)
+            return log_entry
 
-            layer_name = layer["wfs_layer_name"]
-            search_name = layer["wfs_layer_search_name"]
-            link = layer["link"]
-            output_format = layer.get("output_format", "")
-            version = layer["version"]
-            link_type = layer.get("link_type", "WFS").upper()
-            standard_layer_name = layer["standard_layer_name"]
-
-            print(f"\n[→] Processing layer: {search_name} ({link_type}) for region: {region}")
-
-            try:
-                if link_type == "WFS":
-                    if region =="Ontario":
-                        layer_dir = os.path.join(os.path.abspath(os.getcwd()), region_dir, search_name, )
-                        # final_path = os.path.join(layer_dir, search_name)
-                        # download_and_extract_omi(link, final_path +".zip")
-                    else:
-                        stream = fetch_wfs_layer(link, search_name, output_format, version=version)
-                        if not stream:
-                            log_entry["status"] = "error"
-                            log_entry["message"] = f"No data stream returned for {search_name}"
-                            jsonl_file.write(json.dumps(log_entry) + "\n")
-                            continue
-
-                        log_entry["layer_stream_fetched"] = True
-                        search_name = search_name.replace(":", "_").replace(" ","_").replace(".","_")
-                        layer_dir = os.path.join(os.path.abspath(os.getcwd()), region_dir, search_name)
-                        os.makedirs(layer_dir, exist_ok=True)
-                        format_and_save_geodataframe(stream, layer_dir, search_name, output_format)
-                    shape_file_path = os.path.join(layer_dir,search_name+".zip")
-                    print(shape_file_path)
-                    log_entry["layer_processed"] = True
-
-                    datastore_name = f"{search_name}_datastore"
-                    create_or_update_shapefile_datastore(workspace_name, datastore_name, shape_file_path, enable_update)
-                    if enable_update:
-                        log_entry["wfs_datastore_updated"] = True
-                        log_entry["wfs_layer_updated"] = True                 
-                        log_entry["message"] = f"Updated WFS layer '{standard_layer_name}' processed successfully."
-                    else:
-                        log_entry["wfs_datastore_created"] = True
-                        log_entry["wfs_layer_created"] = True
-                        log_entry["message"] = f"Updated WFS layer '{standard_layer_name}' processed successfully."
-                    update_shapefile_layername(workspace_name, datastore_name, search_name, standard_layer_name )
-
-                    # create_layer_from_datastore(workspace_name, datastore_name,search_name, standard_layer_name, enable_update)
-                    # log_entry["layer_name"] =standard_layer_name
-                    # if enable_update:
-                    #     log_entry["wfs_layer_updated"] = True                 
-                    #     log_entry["message"] = f"Updated WFS layer '{standard_layer_name}' processed successfully."
-                    # else:
-                    #     log_entry["wfs_layer_created"] = True
-                    #     log_entry["message"] = f"Updated WFS layer '{standard_layer_name}' processed successfully."    
-
-                elif link_type == "WMS":
-                    if link not in wms_links_map:
-                        # Create a unique and consistent name for the datastore
-                        hashed_suffix = abs(hash(link)) % 10**8  # Optional: shorten hash for readability
-                        processed_search_name = search_name.replace(":", "_").replace(" ","_").replace(".","_")
-                        datastore_name = f"{region.lower()}_wms_{processed_search_name}"
-                        create_or_update_wms_datastore(workspace_name, datastore_name, link, enable_update=enable_update)
-                        print("Done creating or updating wms datastore.")
-                        wms_links_map[link] = datastore_name
-                        if enable_update:
-                            log_entry["wms_datastore_updated"] = True
+        def finish_log(log_entry, key):
+            log_entry.pop("import_pending", None)
+            if metrics:
+                log_entry["metrics"] = metrics.layer_summary(key)
+            write_log(log_entry)
+
+        if max_workers <= 1:
+            entries = [run_layer(layer) for layer in layers]
+        else:
+            with ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix=f"{region}-layer") as executor:
+                entries = list(executor.map(run_layer, layers))
+        if options["importer"]:
+            options["importer"].run()
+            for layer, log_entry in zip(layers, entries):
+                if log_entry.get("import_pending"):
+                    finish_log(log_entry, layer_key(region, layer))
+        return entries
+
+
+def _process_layer(region, layer, log_entry, workspace_name, region_dir, enable_update,
+                   wms_links_map, wms_link_locks, options):
+    layer_name = layer["wfs_layer_name"]
+    search_name = layer["wfs_layer_search_name"]
+    link = layer["link"]
+    output_format = layer.get("output_format", "")
+    version = layer["version"]
+    link_type = layer.get("link_type", "WFS").upper()
+    standard_layer_name = layer["standard_layer_name"]
+
+    state_store = options["state_store"]
+    snapshot = options["snapshot"]
+    state_key = None
+    metrics = options["metrics"]
+    metrics_key = layer_key(region, layer)
+    optimize = {**options["optimize"], **layer.get("optimize", {})}
+    backend = layer.get("output_backend", options["output_backend"])
+    backend_options = options["backend_options"]
+    seeder = options["seeder"]
+
+    def timed(stage):
+        return metrics.stage(metrics_key, stage) if metrics else nullcontext()
+
+    print(f"\n[→] Processing layer: {search_name} ({link_type}) for region: {region}")
+
+    try:
+        if link_type == "WFS":
+            # Imported here so styles runs and WMS-only regions don't load pandas/geopandas
+            from cleanup_layers_and_extract_shp_details import (
+                format_and_save_geodataframe, variant_name, output_location,
+            )
+            if region =="Ontario":
+                layer_dir = os.path.join(os.path.abspath(os.getcwd()), region_dir, search_name, )
+                # The OMI extract is always a shapefile zip
+                backend = "shapefile"
+                # final_path = os.path.join(layer_dir, search_name)
+                # download_and_extract_omi(link, final_path +".zip")
+            else:
+                if state_store:
+                    state_key = layer_key(region, layer)
+                    state = state_store.get(state_key) or {}
+                    fingerprint = output_fingerprint(backend, backend_options, optimize)
+                    if state and state.get("output_fingerprint") != fingerprint:
+                        # The validators and hashes describe output published with other settings
+                        print(f"[→] '{standard_layer_name}' output settings changed; publishing it again.")
+                        state = {}
+                layer_cache = options["layer_cache"]
+                cache_id = (link, search_name, version)
+                cached = layer_cache.get(*cache_id) if layer_cache and options["from_cache"] else None
+                if cached:
+                    print(f"[↷] Converting '{search_name}' from the layer cache; no upstream request.")
+                    download = WfsDownload(cached.path, link, 0, cached.etag, cached.last_modified,
+                                           cached.feature_count)
+                    log_entry["layer_from_cache"] = True
+                    if metrics:
+                        metrics.add(metrics_key, "cache_hits")
+                else:
+                    layer_fetch_options = dict(options["fetch_options"])
+                    layer_fetch_options.update({key: layer[key] for key in ("page_size", "tile_grid") if key in layer})
+                    with timed("fetch"):
+                        download = stream_wfs_layer(link, search_name, output_format, version=version,
+                                                    host_limiter=options["host_limiter"],
+                                                    validators=state if state_key else None, **layer_fetch_options)
+                    if not download:
+                        log_entry["status"] = "error"
+                        log_entry["message"] = f"No data stream returned for {search_name}"
+                        return
+                    if metrics:
+                        metrics.add(metrics_key, "bytes_downloaded", download.size)
+                    if download.path is None:
+                        log_entry["message"] = f"WFS layer '{standard_layer_name}' not modified upstream. Skipped."
+                        return
+                    log_entry["layer_stream_fetched"] = True
+
+                search_name = search_name.replace(":", "_").replace(" ","_").replace(".","_")
+                layer_dir = os.path.join(os.path.abspath(os.getcwd()), region_dir, search_name)
+                os.makedirs(layer_dir, exist_ok=True)
+                cache_staging = None
+                try:
+                    source_hash = cached.source_hash if cached else None
+                    if not cached and (state_key or layer_cache):
+                        source_hash = file_sha256(download.path)
+                    # A cached layer is converted even if unchanged: re-publishing it is the point
+                    if state_key and not cached and source_hash == state.get("source_hash"):
+                        print(f"[↷] '{standard_layer_name}' data unchanged. Skipping conversion and upload.")
+                        state_store.update(state_key, etag=download.etag, last_modified=download.last_modified)
+                        log_entry["message"] = f"WFS layer '{standard_layer_name}' unchanged. Skipped."
+                        return
+                    # The formatter reads the streamed download (or the cached GeoParquet) from disk by path
+                    convert_args = (download.path, layer_dir, search_name, "GeoParquet" if cached else output_format)
+                    if layer_cache and not cached:
+                        cache_staging = layer_cache.staging_path(*cache_id)
+                    convert_kwargs = {"optimize": optimize, "backend": backend, "backend_options": backend_options,
+                                      "cache_path": cache_staging}
+                    with timed("convert"):
+                        if options["convert_pool"]:
+                            zip_path = options["convert_pool"].submit(format_and_save_geodataframe, *convert_args,
+                                                                      **convert_kwargs).result()
                         else:
-                            log_entry["wms_datastore_created"] = True
-                    else:
-                        datastore_name = wms_links_map[link]
+                            zip_path = format_and_save_geodataframe(*convert_args, **convert_kwargs)
+                    if cache_staging:
+                        layer_cache.commit(*cache_id, cache_staging, etag=download.etag,
+                                           last_modified=download.last_modified,
+                                           feature_count=download.feature_count, source_hash=source_hash)
+                finally:
+                    if not cached:
+                        os.remove(download.path)
+                    # A conversion that failed part way leaves its staged GeoParquet uncommitted
+                    if cache_staging and os.path.exists(cache_staging):
+                        os.remove(cache_staging)
+                if not zip_path:
+                    log_entry["status"] = "error"
+                    log_entry["message"] = f"Failed to convert {search_name} ({backend})"
+                    return
+            shape_file_path = output_location(backend, layer_dir, search_name, backend_options)
+            print(shape_file_path)
+            log_entry["layer_processed"] = True
+            if metrics and os.path.exists(shape_file_path):
+                metrics.add(metrics_key, "zip_size", os.path.getsize(shape_file_path))
+
+            zip_hash = None
+            if state_key and os.path.exists(shape_file_path):
+                zip_hash = zip_content_hash(shape_file_path) if backend == "shapefile" else file_sha256(shape_file_path)
+                if zip_hash == state.get("zip_hash"):
+                    print(f"[↷] '{standard_layer_name}' output unchanged. Skipping upload.")
+                    state_store.update(state_key, etag=download.etag, last_modified=download.last_modified,
+                                       source_hash=source_hash)
+                    log_entry["message"] = f"WFS layer '{standard_layer_name}' unchanged. Skipped upload."
+                    return
 
-                    create_or_update_wms_layer(workspace_name, datastore_name, search_name, standard_layer_name, enable_update)
-                    log_entry["layer_name"] =search_name
+            def finish_upload(uploaded):
+                if uploaded == "updated":
+                    log_entry["wfs_datastore_updated"] = True
+                    log_entry["wfs_layer_updated"] = True
+                    log_entry["message"] = f"Updated WFS layer '{standard_layer_name}' processed successfully."
+                elif uploaded == "created":
+                    log_entry["wfs_datastore_created"] = True
+                    log_entry["wfs_layer_created"] = True
+                    log_entry["message"] = f"Created WFS layer '{standard_layer_name}' processed successfully."
+                else:
+                    log_entry["status"] = "error"
+                    log_entry["message"] = f"Failed to upload {backend} output for WFS layer '{standard_layer_name}'."
+                if uploaded:
+                    with timed("upload"):
+                        for tolerance in optimize.get("simplify_tolerances", []):
+                            variant = variant_name(search_name, tolerance)
+                            if _publish_output(backend, backend_options, workspace_name, variant,
+                                               output_location(backend, layer_dir, variant, backend_options),
+                                               variant_name(standard_layer_name, tolerance), enable_update, snapshot):
+                                variants = log_entry.setdefault("variants", [])
+                                variants.append(variant_name(standard_layer_name, tolerance))
+                    if seeder:
+                        for published in [standard_layer_name] + log_entry.get("variants", []):
+                            seeder.submit(workspace_name, published, uploaded)
+                        log_entry["gwc_seed_submitted"] = True
+                if state_key and uploaded:
+                    state_store.update(state_key, etag=download.etag, last_modified=download.last_modified,
+                                       feature_count=download.feature_count, source_hash=source_hash, zip_hash=zip_hash,
+                                       output_fingerprint=fingerprint)
+
+            importer = options["importer"]
+            if importer is not None and backend == "shapefile":
+                if not layer_exists(workspace_name, standard_layer_name, snapshot):
+                    # New layers are published together by the region's import run, which finishes them
+                    import_styles = options["import_styles"]
+                    style = import_styles.get(standard_layer_name) or import_styles.get(layer["wfs_layer_search_name"])
+
+                    def finish_imported(uploaded):
+                        # The import's REST calls are shared by the region; the layer only records the wait
+                        if metrics:
+                            metrics.add_stage(metrics_key, "import", importer.seconds)
+                        try:
+                            finish_upload(uploaded)
+                        except Exception as e:
+                            log_entry["status"] = "error"
+                            log_entry["message"] = str(e)
+                            print(f"[✗] Failed to finish publishing '{standard_layer_name}': {e}")
+
+                    importer.add(shape_file_path, standard_layer_name, style=style, on_done=finish_imported)
+                    log_entry["import_pending"] = True
+                    return
+                # Existing layers overwrite their store in place, whichever way the store was created
+                with timed("upload"):
+                    datastore_name = layer_datastore(workspace_name, standard_layer_name) or f"{search_name}_datastore"
+                    uploaded = create_or_update_shapefile_datastore(workspace_name, datastore_name, shape_file_path,
+                                                                    enable_update, snapshot=snapshot)
+            else:
+                with timed("upload"):
+                    uploaded = _publish_output(backend, backend_options, workspace_name, search_name,
+                                               shape_file_path, standard_layer_name, enable_update, snapshot)
+            finish_upload(uploaded)
+
+            # create_layer_from_datastore(workspace_name, datastore_name,search_name, standard_layer_name, enable_update)
+            # log_entry["layer_name"] =standard_layer_name
+            # if enable_update:
+            #     log_entry["wfs_layer_updated"] = True
+            #     log_entry["message"] = f"Updated WFS layer '{standard_layer_name}' processed successfully."
+            # else:
+            #     log_entry["wfs_layer_created"] = True
+            #     log_entry["message"] = f"Updated WFS layer '{standard_layer_name}' processed successfully."
+
+        elif link_type == "WMS":
+            # Layers sharing a link wait here until the first one has created the store
+            with wms_link_locks[link], timed("publish"):
+                if link not in wms_links_map:
+                    # Create a unique and consistent name for the datastore
+                    hashed_suffix = abs(hash(link)) % 10**8  # Optional: shorten hash for readability
+                    processed_search_name = search_name.replace(":", "_").replace(" ","_").replace(".","_")
+                    datastore_name = f"{region.lower()}_wms_{processed_search_name}"
+                    create_or_update_wms_datastore(workspace_name, datastore_name, link, enable_update=enable_update,
+                                                   snapshot=snapshot)
+                    print("Done creating or updating wms datastore.")
+                    wms_links_map[link] = datastore_name
                     if enable_update:
-                        log_entry["wms_layer_updated"] = True
-                        log_entry["message"] = f"Updated WMS layer '{search_name}' linked via datastore '{datastore_name}'."
+                        log_entry["wms_datastore_updated"] = True
                     else:
-                        log_entry["wms_layer_created"] = True
-                        log_entry["message"] = f"Created WMS layer '{search_name}' linked via datastore '{datastore_name}'."
-
+                        log_entry["wms_datastore_created"] = True
                 else:
-                    raise ValueError(f"Unsupported link_type: {link_type}")
+                    datastore_name = wms_links_map[link]
 
-            except Exception as e:
-                log_entry["status"] = "error"
-                log_entry["message"] = str(e)
-                print(f"[✗] Failed to process layer '{search_name}': {e}")
+            with timed("publish"):
+                published = create_or_update_wms_layer(workspace_name, datastore_name, search_name,
+                                                       standard_layer_name, enable_update, snapshot=snapshot)
+            if seeder and published:
+                seeder.submit(workspace_name, standard_layer_name, published)
+                log_entry["gwc_seed_submitted"] = True
+            log_entry["layer_name"] =search_name
+            if enable_update:
+                log_entry["wms_layer_updated"] = True
+                log_entry["message"] = f"Updated WMS layer '{search_name}' linked via datastore '{datastore_name}'."
+            else:
+                log_entry["wms_layer_created"] = True
+                log_entry["message"] = f"Created WMS layer '{search_name}' linked via datastore '{datastore_name}'."
 
-            # jsonl_file.write(json.dumps(log_entry) + "\n")
+        else:
+            raise ValueError(f"Unsupported link_type: {link_type}")
 
-if __name__ =="__main__":
-    jsonl_path = "final_output.jsonl"
-    style_jsonl_path = "styles_path_details.jsonl"
-    cmd = "layers"
-    if cmd == "layers":
-        with open(jsonl_path, encoding="utf-8") as f:
-            for line in f:
-                if not line.strip():
-                    continue
-                region_entry = json.loads(line)
-                region = region_entry["region"]
-                if region == "Ontario":
-                    layers = region_entry.get("layers", [])
-                    process_region_layers(region, layers)
-    elif cmd == "styles":
-        with open(style_jsonl_path, encoding="utf-8") as f:
+    except Exception as e:
+        log_entry["status"] = "error"
+        log_entry["message"] = str(e)
+        print(f"[✗] Failed to process layer '{search_name}': {e}")
+
+
+def _publish_output(backend, backend_options, workspace_name, native_name, output, standard_layer_name,
+                    enable_update, snapshot):
+    """
+    Publishes one converted layer through the datastore creator matching its
+    output backend and gives it its standard name.
+
+    Returns:
+        str | None: "created" or "updated" on success, None on failure.
+    """
+    if backend != "postgis" and not os.path.exists(output):
+        print(f"[✗] Missing {backend} output: {output}")
+        return None
+    datastore_name = output_datastore(backend, backend_options, workspace_name, native_name)
+
+    if backend in ("shapefile", "geopackage"):
+        create = (create_or_update_shapefile_datastore if backend == "shapefile"
+                  else create_or_update_geopackage_datastore)
+        uploaded = create(workspace_name, datastore_name, output, enable_update, snapshot=snapshot)
+        # An in-place update keeps the already renamed layer, so only a new store needs the rename
+        if uploaded == "created":
+            update_shapefile_layername(workspace_name, datastore_name, native_name, standard_layer_name,
+                                       snapshot=snapshot)
+        return uploaded
+
+    if backend == "flatgeobuf":
+        uploaded = create_or_update_flatgeobuf_datastore(workspace_name, datastore_name, output, enable_update,
+                                                         snapshot=snapshot)
+    elif backend == "postgis":
+        # One store per workspace; the loader already swapped the table's contents
+        if not create_or_update_postgis_datastore(workspace_name, datastore_name, backend_options["connection"],
+                                                  snapshot=snapshot):
+            return None
+        native_name = output.split(".", 1)[1]
+        uploaded = "updated" if layer_exists(workspace_name, standard_layer_name, snapshot) else "created"
+        if uploaded == "updated":
+            # The table was replaced underneath the store; drop GeoServer's cached attributes for it
+            reset_datastore(workspace_name, datastore_name)
+    else:
+        raise ValueError(f"Unsupported output backend: {backend}")
+    if uploaded == "created":
+        create_layer_from_datastore(workspace_name, datastore_name, native_name, standard_layer_name,
+                                    snapshot=snapshot)
+    return uploaded
+
+
+def process_regions(region_entries, output_dir="final_output_files_v2", region_workers=1, layer_workers=1,
+                    per_host_limit=2, fetch_options=None, state_store=None, convert_workers=0,
+                    snapshot=None, metrics=None, optimize=None, output_backend="shapefile", backend_options=None,
+                    seed=None, seed_workers=4, publish_mode="per-layer", import_styles=None, layer_cache=None,
+                    from_cache=False):
+    """
+    Runs process_region_layers for several regions, optionally in parallel.
+    A single HostLimiter is shared by all regions so the per-host cap holds
+    across the whole run, not just within one region. convert_workers > 0
+    starts one shared process pool for geometry conversion.
+
+    Downloads are staged in a RunWorkspace under output_dir that is private
+    to this run and removed when it ends, so several runs or worker processes
+    can share one output tree.
+
+    seed (dict of GwcSeeder options, {} for the defaults) turns on tile
+    seeding for changed layers; seed_workers layers are seeded and polled at
+    once, and the run returns when all seeding has finished. publish_mode,
+    import_styles, layer_cache and from_cache are passed to each region (see
+    process_region_layers); the cache outlives the run workspace.
+    """
+    host_limiter = HostLimiter(per_host=per_host_limit)
+    seeder = GwcSeeder(seed, max_workers=seed_workers) if seed is not None else None
+    RunWorkspace.remove_stale(output_dir)
+    workspace = RunWorkspace(output_dir)
+    fetch_options = {"download_dir": workspace.subdir("downloads"), **(fetch_options or {})}
+    # "spawn" avoids forking a process that already has fetch/upload threads running
+    convert_pool = ProcessPoolExecutor(max_workers=convert_workers, mp_context=multiprocessing.get_context("spawn")) \
+        if convert_workers > 0 else None
+
+    def run_region(region_entry):
+        region = region_entry["region"]
+        layers = region_entry.get("layers", [])
+        try:
+            process_region_layers(region, layers, output_dir, max_workers=layer_workers, host_limiter=host_limiter,
+                                  fetch_options=fetch_options, state_store=state_store, convert_pool=convert_pool,
+                                  snapshot=snapshot, metrics=metrics, optimize=optimize,
+                                  output_backend=output_backend, backend_options=backend_options, seeder=seeder,
+                                  publish_mode=publish_mode, import_styles=import_styles,
+                                  layer_cache=layer_cache, from_cache=from_cache)
+        except Exception as e:
+            print(f"[✗] Failed to process region '{region}': {e}")
+
+    try:
+        if region_workers <= 1:
+            for region_entry in region_entries:
+                run_region(region_entry)
+        else:
+            with ThreadPoolExecutor(max_workers=region_workers, thread_name_prefix="region") as executor:
+                list(executor.map(run_region, region_entries))
+        if seeder:
+            results = seeder.wait()
+            failed = [layer for layer, result in results.items() if result != "done"]
+            print(f"[{'✗' if failed else '✓'}] GWC seeding: {len(results) - len(failed)}/{len(results)} layers done"
+                  + (f"; not done: {', '.join(failed)}" if failed else ""))
+    finally:
+        if convert_pool:
+            convert_pool.shutdown()
+        workspace.cleanup()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Publish WFS/WMS layers and styles to GeoServer.")
+    parser.add_argument("--config", help="GeoServer config YAML (default config/geoserver_config.yaml).")
+    parser.add_argument("--profile", help="Profile in the config file (default prod_geoserver).")
+    commands = parser.add_subparsers(dest="command", required=True)
+
+    layers_parser = commands.add_parser("layers", help="Fetch, convert and publish the layers in a job file.")
+    layers_parser.add_argument("--jobs", default="final_output.jsonl")
+    layers_parser.add_argument("--region", action="append", help="Limit to these regions (repeatable).")
+    layers_parser.add_argument("--output-dir", default="final_output_files_v2")
+    # 1 and 1 give the original one-region, one-layer-at-a-time behaviour
+    layers_parser.add_argument("--region-workers", type=int, default=1)
+    layers_parser.add_argument("--layer-workers", type=int, default=1)
+    layers_parser.add_argument("--convert-workers", type=int, default=0,
+                               help="Worker processes for geometry conversion; 0 converts on the calling thread.")
+    layers_parser.add_argument("--full", action="store_true",
+                               help="Re-ingest every WFS layer instead of skipping unchanged upstream data.")
+    layers_parser.add_argument("--no-catalog-snapshot", dest="catalog_snapshot", action="store_false",
+                               help="Check each catalog object with its own GET instead of one listing per workspace.")
+    layers_parser.add_argument("--metrics-jsonl", default="ingest_metrics.jsonl")
+    layers_parser.add_argument("--metrics-prom", help="Also write a Prometheus textfile here.")
+    # Off by default: a .qix needs the full conversion, so it disables the SHAPE-ZIP copy and direct zip writes
+    layers_parser.add_argument("--spatial-index", action="store_true",
+                               help="Add a .qix spatial index to shapefile outputs.")
+    layers_parser.add_argument("--simplify", type=float, action="append", default=[],
+                               help="Also publish a simplified variant at this tolerance (repeatable).")
+    layers_parser.add_argument("--backend", default="shapefile",
+                               choices=["shapefile", "geopackage", "flatgeobuf", "postgis"])
+    layers_parser.add_argument("--backend-options", type=json.loads, default={},
+                               help='JSON, e.g. \'{"connection": {"host": ..., "database": ...}}\' for postgis.')
+    layers_parser.add_argument("--seed", action="store_true",
+                               help="Seed GeoWebCache tiles for layers this run created or updated.")
+    layers_parser.add_argument("--seed-zoom", type=int, nargs=2, metavar=("START", "STOP"))
+    layers_parser.add_argument("--seed-gridset", action="append", help="Gridset to seed (repeatable).")
+    layers_parser.add_argument("--seed-threads", type=int)
+    layers_parser.add_argument("--publish", default="per-layer", choices=["per-layer", "importer"],
+                               help="importer publishes each region's new layers in one GeoServer Importer run.")
+    layers_parser.add_argument("--import-styles",
+                               help="Styles JSONL whose style_name is given to each layer as it is imported.")
+    layers_parser.add_argument("--layer-cache", nargs="?", const="layer_cache", metavar="DIR",
+                               help="Keep fetched WFS layers as GeoParquet in DIR (default layer_cache).")
+    layers_parser.add_argument("--layer-cache-size", type=float, default=2048, metavar="MB",
+                               help="Least recently used layers are evicted beyond this size.")
+    layers_parser.add_argument("--from-cache", action="store_true",
+                               help="Convert and publish cached layers without fetching them again.")
+
+    styles_parser = commands.add_parser("styles", help="Upload styles and assign them to their layers.")
+    styles_parser.add_argument("--styles", default="styles_path_details.jsonl")
+    styles_parser.add_argument("--style-workers", type=int, default=8)
+    styles_parser.add_argument("--no-sync", dest="sync", action="store_false",
+                               help="Upload and reassign every style instead of only those that differ.")
+    args = parser.parse_args()
+
+    if args.config or args.profile:
+        configure(args.config, args.profile)
+
+    if args.command == "layers":
+        with open(args.jobs, encoding="utf-8") as f:
+            region_entries = [json.loads(line) for line in f if line.strip()]
+        region_entries = [entry for entry in region_entries if not args.region or entry["region"] in args.region]
+        seed_options = None
+        if args.seed:
+            seed_options = {}
+            if args.seed_zoom:
+                seed_options["zoom_start"], seed_options["zoom_stop"] = args.seed_zoom
+            if args.seed_gridset:
+                seed_options["gridsets"] = args.seed_gridset
+            if args.seed_threads:
+                seed_options["threads"] = args.seed_threads
+        optimize_options = {"spatial_index": args.spatial_index}
+        if args.simplify:
+            optimize_options["simplify_tolerances"] = args.simplify
+        import_styles = {}
+        if args.import_styles:
+            with open(args.import_styles, encoding="utf-8") as f:
+                records = [json.loads(line) for line in f if line.strip()]
+            import_styles = {record["layer"]: record["style_name"] for record in records}
+
+        layer_cache = None
+        if args.layer_cache or args.from_cache:
+            layer_cache = LayerCache(args.layer_cache or "layer_cache", int(args.layer_cache_size * 1024 ** 2))
+        state_store = None if args.full else LayerStateStore()
+        metrics = IngestMetrics()
+        metrics.observe_client(get_client())
+        metrics.observe_session(upstream_session)
+        process_regions(region_entries, args.output_dir, region_workers=args.region_workers,
+                        layer_workers=args.layer_workers, state_store=state_store,
+                        convert_workers=args.convert_workers,
+                        snapshot=CatalogSnapshot(get_client()) if args.catalog_snapshot else None, metrics=metrics,
+                        optimize=optimize_options, output_backend=args.backend,
+                        backend_options=args.backend_options, seed=seed_options, publish_mode=args.publish,
+                        import_styles=import_styles, layer_cache=layer_cache, from_cache=args.from_cache)
+        metrics.write_jsonl(args.metrics_jsonl)
+        if args.metrics_prom:
+            metrics.write_prometheus(args.metrics_prom)
+        metrics.print_summary()
+    elif args.sync:
+        with open(args.styles, encoding="utf-8") as f:
+            records = [json.loads(line) for line in f if line.strip()]
+        sync_styles(records, max_workers=args.style_workers)
+    else:
+        with open(args.styles, encoding="utf-8") as f:
             for line in f:
                 record = json.loads(line)
                 workspace, layer_name, style_name, sld_path = record["workspace"], record["layer"], record["style_name"], record["style_path"]
                 print(workspace, layer_name, style_name, sld_path)
-                upload_and_assign_style(workspace, layer_name, style_name, sld_path)
\ No newline at end of file
+                upload_and_assign_style(workspace, layer_name, style_name, sld_path)
@@ -0,0 +1,124 @@
+import hashlib
+import json
+import os
+import threading
+import time
+from collections import OrderedDict, namedtuple
+
+# A cached layer: its GeoParquet file plus the upstream validators and hash of the download it was parsed from
+CachedLayer = namedtuple("CachedLayer", ["path", "etag", "last_modified", "feature_count", "source_hash"])
+
+
+def cache_key(link, typename, version):
+    return hashlib.sha1(f"{link}|{typename}|{version}".encode("utf-8")).hexdigest()
+
+
+class LayerCache:
+    """
+    Size-bounded on-disk cache of fetched WFS layers as GeoParquet, keyed by
+    (link, typename, version), so converting a layer again (other output
+    options or backend, a retried upload, another workspace) reads a local
+    columnar file instead of re-downloading and re-parsing CSV/GeoJSON.
+
+    The conversion writes the parsed layer to staging_path(); commit() moves
+    it into the cache with its metadata sidecar and evicts least recently
+    used layers until the cache fits max_bytes (also checked on open). The
+    most recently used layer is never evicted, even if it alone is larger.
+    Recency is the file mtime, so the LRU order carries over between runs.
+    Staged files left by a crashed run are removed on open once they are
+    older than stale_seconds, so writers in a live run keep theirs.
+
+    Args:
+        cache_dir (str): Directory holding "<key>.parquet" and "<key>.json".
+        max_bytes (int): Total size of the Parquet files to keep.
+        stale_seconds (float): Age after which a leftover "*.tmp" is removed.
+    """
+
+    def __init__(self, cache_dir="layer_cache", max_bytes=2 * 1024 ** 3, stale_seconds=3600):
+        self.cache_dir = cache_dir
+        self.max_bytes = max_bytes
+        self._lock = threading.Lock()
+        os.makedirs(cache_dir, exist_ok=True)
+        self._remove_stale_staging(stale_seconds)
+        # key -> size in bytes, least recently used first
+        self._entries = OrderedDict()
+        paths = [os.path.join(cache_dir, name) for name in os.listdir(cache_dir) if name.endswith(".parquet")]
+        for path in sorted(paths, key=os.path.getmtime):
+            self._entries[os.path.basename(path)[:-len(".parquet")]] = os.path.getsize(path)
+        # A smaller max_bytes than the last run used applies straight away
+        self._evict()
+
+    def _remove_stale_staging(self, stale_seconds):
+        cutoff = time.time() - stale_seconds
+        for name in os.listdir(self.cache_dir):
+            if not name.endswith(".tmp"):
+                continue
+            path = os.path.join(self.cache_dir, name)
+            try:
+                if os.path.getmtime(path) < cutoff:
+                    os.remove(path)
+                    print(f"[↷] Removed stale cache staging file {name}")
+            except FileNotFoundError:
+                pass
+
+    def _path(self, key, suffix):
+        return os.path.join(self.cache_dir, f"{key}{suffix}")
+
+    def get(self, link, typename, version):
+        """The CachedLayer for the layer, marked as recently used, or None."""
+        key = cache_key(link, typename, version)
+        with self._lock:
+            if key not in self._entries:
+                return None
+            try:
+                with open(self._path(key, ".json"), encoding="utf-8") as f:
+                    meta = json.load(f)
+                os.utime(self._path(key, ".parquet"))
+            except (OSError, ValueError):
+                # Evicted by another process, or a sidecar that never finished
+                self._entries.pop(key, None)
+                return None
+            self._entries.move_to_end(key)
+        return CachedLayer(self._path(key, ".parquet"), *(meta.get(field) for field in CachedLayer._fields[1:]))
+
+    def staging_path(self, link, typename, version):
+        """A unique path (next to the cache, for a same-filesystem rename) the conversion writes the layer to."""
+        key = cache_key(link, typename, version)
+        return self._path(key, f".parquet.{os.getpid()}.{threading.get_ident()}.{time.monotonic_ns()}.tmp")
+
+    def commit(self, link, typename, version, staged_path, etag=None, last_modified=None, feature_count=None,
+               source_hash=None):
+        """Moves a staged GeoParquet file into the cache. A missing staged file (the write failed) is ignored."""
+        if not os.path.exists(staged_path):
+            return False
+        key = cache_key(link, typename, version)
+        meta = {"link": link, "typename": typename, "version": version, "etag": etag,
+                "last_modified": last_modified, "feature_count": feature_count, "source_hash": source_hash,
+                "cached_at": time.time()}
+        with self._lock:
+            meta_tmp = self._path(key, f".json.{os.getpid()}.{threading.get_ident()}.tmp")
+            with open(meta_tmp, "w", encoding="utf-8") as f:
+                json.dump(meta, f)
+            os.replace(staged_path, self._path(key, ".parquet"))
+            os.replace(meta_tmp, self._path(key, ".json"))
+            self._entries[key] = os.path.getsize(self._path(key, ".parquet"))
+            self._entries.move_to_end(key)
+            self._evict()
+        return True
+
+    def _evict(self):
+        total = sum(self._entries.values())
+        while total > self.max_bytes and len(self._entries) > 1:
+            key, size = self._entries.popitem(last=False)
+            for suffix in (".parquet", ".json"):
+                try:
+                    os.remove(self._path(key, suffix))
+                except FileNotFoundError:
+                    pass
+            total -= size
+            print(f"[↷] Evicted cached layer {key} ({size} bytes)")
+
+    @property
+    def size(self):
+        with self._lock:
+            return sum(self._entries.values())
@@ -0,0 +1,86 @@
+import csv
+from io import StringIO
+import shapely
+
+try:
+    import psycopg2
+    from psycopg2 import sql
+except ImportError:
+    psycopg2 = None
+
+# pandas dtype kind -> PostgreSQL column type
+PG_TYPES = {"i": "bigint", "u": "bigint", "f": "double precision", "b": "boolean", "M": "timestamp"}
+
+
+def postgis_dsn(connection):
+    """libpq DSN for a connection dict using GeoServer's PostGIS parameter names (host, port, database, user, passwd)."""
+    if connection.get("dsn"):
+        return connection["dsn"]
+    parts = {"host": connection.get("host", "localhost"), "port": connection.get("port", 5432),
+             "dbname": connection["database"], "user": connection["user"], "password": connection.get("passwd", "")}
+    quoted = {key: str(value).replace("\\", "\\\\").replace("'", "\\'") for key, value in parts.items()}
+    return " ".join(f"{key}='{value}'" for key, value in quoted.items())
+
+
+def _column_type(series):
+    return PG_TYPES.get(series.dtype.kind, "text")
+
+
+def copy_geodataframe(gdf, connection, table, chunk_size=50_000):
+    """
+    Bulk-loads gdf into <schema>.<table> with COPY. Rows are streamed in
+    chunk_size CSV batches (geometry as hex EWKB) into a staging table, which
+    gets a GiST index and then replaces the live table in one transaction,
+    so GeoServer never reads a half-loaded table.
+
+    Args:
+        connection (dict): host, port, database, schema, user, passwd (or dsn).
+        table (str): Target table name.
+
+    Returns:
+        str: "<schema>.<table>"
+    """
+    if psycopg2 is None:
+        raise ImportError("The PostGIS backend needs psycopg2 (pip install psycopg2-binary)")
+    schema = connection.get("schema", "public")
+    staging = f"{table}__load"
+    geometry_name = gdf.geometry.name
+    srid = gdf.crs.to_epsg() if gdf.crs else 0
+    attributes = [column for column in gdf.columns if column != geometry_name]
+
+    column_defs = [sql.SQL("{} {}").format(sql.Identifier(column), sql.SQL(_column_type(gdf[column])))
+                   for column in attributes]
+    column_defs.append(sql.SQL("geom geometry(Geometry, {})").format(sql.Literal(srid or 0)))
+    target_columns = sql.SQL(", ").join([sql.Identifier(column) for column in attributes] + [sql.Identifier("geom")])
+
+    conn = psycopg2.connect(postgis_dsn(connection))
+    try:
+        with conn, conn.cursor() as cur:
+            cur.execute(sql.SQL("DROP TABLE IF EXISTS {}.{}").format(sql.Identifier(schema), sql.Identifier(staging)))
+            cur.execute(sql.SQL("CREATE TABLE {}.{} (fid bigserial PRIMARY KEY, {})").format(
+                sql.Identifier(schema), sql.Identifier(staging), sql.SQL(", ").join(column_defs)))
+            copy_statement = sql.SQL("COPY {}.{} ({}) FROM STDIN WITH (FORMAT csv)").format(
+                sql.Identifier(schema), sql.Identifier(staging), target_columns).as_string(cur)
+
+            for start in range(0, len(gdf), chunk_size):
+                chunk = gdf.iloc[start:start + chunk_size]
+                frame = chunk[attributes].copy()
+                geometries = chunk.geometry.values.to_numpy()
+                if srid:
+                    geometries = shapely.set_srid(geometries, srid)
+                frame["geom"] = shapely.to_wkb(geometries, hex=True, include_srid=bool(srid))
+                buffer = StringIO()
+                # Unquoted empty fields load as NULL
+                frame.to_csv(buffer, index=False, header=False, quoting=csv.QUOTE_MINIMAL)
+                buffer.seek(0)
+                cur.copy_expert(copy_statement, buffer)
+
+            cur.execute(sql.SQL("CREATE INDEX ON {}.{} USING GIST (geom)").format(
+                sql.Identifier(schema), sql.Identifier(staging)))
+            cur.execute(sql.SQL("DROP TABLE IF EXISTS {}.{}").format(sql.Identifier(schema), sql.Identifier(table)))
+            cur.execute(sql.SQL("ALTER TABLE {}.{} RENAME TO {}").format(
+                sql.Identifier(schema), sql.Identifier(staging), sql.Identifier(table)))
+            cur.execute(sql.SQL("ANALYZE {}.{}").format(sql.Identifier(schema), sql.Identifier(table)))
+    finally:
+        conn.close()
+    return f"{schema}.{table}"
@@ -0,0 +1,208 @@
+import random
+import threading
+import time
+from email.utils import parsedate_to_datetime
+from datetime import datetime, timezone
+import requests
+from urllib3.exceptions import NewConnectionError
+from concurrency import host_of
+
+# Methods that can be repeated without changing the outcome (RFC 9110 9.2.2)
+IDEMPOTENT_METHODS = {"GET", "HEAD", "OPTIONS", "PUT", "DELETE"}
+
+
+class CircuitOpenError(requests.exceptions.ConnectionError):
+    """Raised without contacting the host while its circuit breaker is open."""
+
+
+class RetryPolicy:
+    """
+    Exponential backoff with full jitter for transient HTTP failures.
+
+    Idempotent methods are retried on connection errors, timeouts and the
+    retry_statuses. Other methods (POST) are only retried when the connection
+    could not be opened, i.e. the request never reached the server. A request
+    whose body is a file is rewound before each retry; one whose body cannot
+    be rewound (e.g. a generator) is not retried. A retried DELETE that
+    answers 404 after an earlier attempt was lost in flight is reported as
+    204, since that earlier attempt is what removed the object.
+
+    Args:
+        max_attempts (int): Total attempts including the first; 1 disables retries.
+        backoff (float): Base delay in seconds; attempt n waits up to backoff * 2**(n-1).
+        max_backoff (float): Upper bound for any single wait, including Retry-After.
+        retry_statuses (set): Response codes treated as transient.
+    """
+
+    def __init__(self, max_attempts=4, backoff=1.0, max_backoff=60, retry_statuses=(429, 502, 503, 504)):
+        self.max_attempts = max_attempts
+        self.backoff = backoff
+        self.max_backoff = max_backoff
+        self.retry_statuses = set(retry_statuses)
+
+    def can_retry(self, method, error=None, response=None):
+        if method.upper() in IDEMPOTENT_METHODS:
+            return error is not None or response.status_code in self.retry_statuses
+        return error is not None and _not_sent(error)
+
+    def delay(self, attempt, response=None):
+        retry_after = _retry_after_seconds(response) if response is not None else None
+        if retry_after is not None:
+            return min(retry_after, self.max_backoff)
+        return random.uniform(0, min(self.max_backoff, self.backoff * 2 ** (attempt - 1)))
+
+
+class CircuitBreaker:
+    """
+    Per-host breaker: after failure_threshold consecutive failures the host is
+    skipped for reset_timeout seconds, then a single trial request decides
+    whether it closes again or stays open for another period.
+    """
+
+    def __init__(self, failure_threshold=5, reset_timeout=60):
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+        self.failures = 0
+        self.opened_at = None
+        self._trial_running = False
+        self._lock = threading.Lock()
+
+    def allow(self):
+        with self._lock:
+            if self.opened_at is None:
+                return True
+            if time.monotonic() - self.opened_at < self.reset_timeout or self._trial_running:
+                return False
+            self._trial_running = True
+            return True
+
+    def record(self, success):
+        with self._lock:
+            self._trial_running = False
+            if success:
+                self.failures = 0
+                self.opened_at = None
+            else:
+                self.failures += 1
+                if self.opened_at is not None or self.failures >= self.failure_threshold:
+                    self.opened_at = time.monotonic()
+
+
+class CircuitBreakers:
+    """
+    Lazily creates one CircuitBreaker per host with shared settings.
+
+    Only transport errors and failure_statuses count against a host. Other
+    5xx answers still mean the host is up: GeoServer returns 500 for logical
+    errors such as "already exists", and a few of those must not cut off the
+    whole REST host.
+    """
+
+    def __init__(self, failure_threshold=5, reset_timeout=60, failure_statuses=(502, 503, 504)):
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+        self.failure_statuses = failure_statuses
+        self._breakers = {}
+        self._lock = threading.Lock()
+
+    def get(self, url):
+        host = host_of(url)
+        with self._lock:
+            if host not in self._breakers:
+                self._breakers[host] = CircuitBreaker(self.failure_threshold, self.reset_timeout)
+            return self._breakers[host]
+
+
+class ResilientSession(requests.Session):
+    """
+    requests.Session whose request() retries transient failures according to
+    a RetryPolicy and fails fast for hosts whose circuit breaker is open.
+
+    Only connecting and reading the response headers is retried; with
+    stream=True a body that breaks off mid-download still raises to the
+    caller. Retry observers are called as observer(method, url, attempt,
+    reason) before each retry.
+
+    Args:
+        retry (RetryPolicy): Retry settings; defaults to RetryPolicy().
+        breakers (CircuitBreakers): Breaker registry; None disables breaking.
+    """
+
+    def __init__(self, retry=None, breakers=None):
+        super().__init__()
+        self.retry = retry or RetryPolicy()
+        self.breakers = breakers
+        self.retry_observers = []
+
+    def request(self, method, url, *args, **kwargs):
+        breaker = self.breakers.get(url) if self.breakers else None
+        body = kwargs.get("data")
+        body_start = _tell(body)
+        attempt = 1
+        lost_in_flight = False
+        while True:
+            if breaker and not breaker.allow():
+                raise CircuitOpenError(f"Circuit open for {host_of(url)}; skipping {method} {url}")
+            error = response = None
+            try:
+                response = super().request(method, url, *args, **kwargs)
+            except (requests.exceptions.ConnectionError, requests.exceptions.Timeout) as e:
+                error = e
+            except Exception:
+                # E.g. a body cut off mid-transfer (ChunkedEncodingError); not retried, but it must still end a
+                # half-open trial, or the breaker never lets another request through
+                if breaker:
+                    breaker.record(False)
+                raise
+            if lost_in_flight and method.upper() == "DELETE" and response is not None and response.status_code == 404:
+                response.status_code = 204
+            if breaker:
+                breaker.record(error is None and response.status_code not in self.breakers.failure_statuses)
+
+            retryable = self.retry.can_retry(method, error, response)
+            rewindable = body is None or isinstance(body, (bytes, str, dict)) or body_start is not None
+            if not retryable or not rewindable or attempt >= self.retry.max_attempts:
+                if error is not None:
+                    raise error
+                return response
+
+            reason = type(error).__name__ if error is not None else f"HTTP {response.status_code}"
+            wait = self.retry.delay(attempt, response)
+            for observer in self.retry_observers:
+                observer(method, url, attempt, reason)
+            print(f"[↻] {method} {url} failed ({reason}); retry {attempt}/{self.retry.max_attempts - 1} "
+                  f"in {wait:.1f}s")
+            if response is not None:
+                response.close()
+            lost_in_flight = lost_in_flight or (error is not None and not _not_sent(error))
+            time.sleep(wait)
+            if body_start is not None:
+                body.seek(body_start)
+            attempt += 1
+
+
+def _not_sent(error):
+    # A refused/unresolvable connection or a connect timeout means the server never saw the request
+    if isinstance(error, requests.exceptions.ConnectTimeout):
+        return True
+    reason = getattr(error.args[0], "reason", None) if error.args else None
+    return isinstance(reason, NewConnectionError)
+
+
+def _tell(body):
+    try:
+        return body.tell() if body is not None and hasattr(body, "seek") else None
+    except OSError:
+        return None
+
+
+def _retry_after_seconds(response):
+    value = response.headers.get("Retry-After")
+    if not value:
+        return None
+    if value.strip().isdigit():
+        return float(value)
+    try:
+        return max(0.0, (parsedate_to_datetime(value) - datetime.now(timezone.utc)).total_seconds())
+    except (TypeError, ValueError):
+        return None
@@ -0,0 +1,152 @@
+import json
+import os
+import shutil
+import socket
+import tempfile
+import threading
+import time
+import uuid
+from contextlib import contextmanager
+from datetime import datetime
+
+# Read once at import: os.umask can only be queried by setting it, which races with threads creating files
+_UMASK = os.umask(0)
+os.umask(_UMASK)
+
+
+def new_run_id():
+    """Unique across hosts and processes, and sortable by start time."""
+    return f"{datetime.utcnow():%Y%m%dT%H%M%S}-{socket.gethostname()}-{os.getpid()}-{uuid.uuid4().hex[:8]}"
+
+
+@contextmanager
+def atomic_path(path):
+    """
+    Yields a unique temporary path next to path. If the block succeeds the
+    file is renamed onto path in one step, so readers and concurrent writers
+    only ever see a complete file (the last writer wins); otherwise it is
+    removed. The file gets the usual umask-based mode, not mkstemp's 0600.
+    """
+    directory = os.path.dirname(path) or "."
+    os.makedirs(directory, exist_ok=True)
+    fd, tmp_path = tempfile.mkstemp(dir=directory, prefix=f".{os.path.basename(path)}.", suffix=".tmp")
+    os.close(fd)
+    try:
+        yield tmp_path
+        os.chmod(tmp_path, 0o666 & ~_UMASK)
+        os.replace(tmp_path, path)
+    finally:
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+
+
+class AppendLog:
+    """
+    JSON-lines log that threads and processes can append to without locks.
+    Each record is encoded to one line and written with a single write() on
+    an O_APPEND descriptor, so every line lands whole at the end of the file
+    (on local filesystems; O_APPEND is not atomic over NFS).
+
+    Args:
+        path (str): Log file, created if missing.
+    """
+
+    def __init__(self, path):
+        self.path = path
+        self._fd = os.open(path, os.O_WRONLY | os.O_APPEND | os.O_CREAT, 0o644)
+
+    def write(self, record):
+        data = (json.dumps(record) + "\n").encode("utf-8")
+        written = os.write(self._fd, data)
+        if written != len(data):
+            raise OSError(f"Short write to {self.path}: {written} of {len(data)} bytes")
+
+    def close(self):
+        if self._fd is not None:
+            os.close(self._fd)
+            self._fd = None
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+
+class RunWorkspace:
+    """
+    Scratch space private to one run: "<root>/.runs/<run_id>/". Temp dirs
+    handed out here never collide with another worker or run on the same
+    host, and live on the same filesystem as the outputs under root so
+    finished files can be renamed into place atomically.
+
+    While the run is alive a daemon thread touches "<run dir>/.heartbeat"
+    every heartbeat_interval seconds; remove_stale() goes by that file, so
+    a long run is never mistaken for a crashed one.
+
+    Args:
+        root (str): Output root the run writes into, e.g. "final_output_files_v2".
+        run_id (str): Defaults to new_run_id().
+        heartbeat_interval (float): Seconds between heartbeat touches.
+    """
+
+    def __init__(self, root, run_id=None, heartbeat_interval=60):
+        self.root = root
+        self.run_id = run_id or new_run_id()
+        self.path = os.path.join(root, ".runs", self.run_id)
+        os.makedirs(self.path)
+        self._heartbeat_path = os.path.join(self.path, ".heartbeat")
+        self._stopped = threading.Event()
+        self._beat()
+        threading.Thread(target=self._heartbeat, args=(heartbeat_interval,), daemon=True,
+                         name=f"heartbeat-{self.run_id}").start()
+
+    def _beat(self):
+        with open(self._heartbeat_path, "a"):
+            pass
+        os.utime(self._heartbeat_path)
+
+    def _heartbeat(self, interval):
+        while not self._stopped.wait(interval):
+            try:
+                self._beat()
+            except OSError:
+                # The run dir is being removed
+                return
+
+    def subdir(self, name):
+        path = os.path.join(self.path, name)
+        os.makedirs(path, exist_ok=True)
+        return path
+
+    def temp_dir(self, prefix=""):
+        return tempfile.mkdtemp(prefix=prefix, dir=self.path)
+
+    def cleanup(self):
+        self._stopped.set()
+        shutil.rmtree(self.path, ignore_errors=True)
+
+    @staticmethod
+    def remove_stale(root, max_age=24 * 3600):
+        """
+        Removes run dirs whose heartbeat is older than max_age seconds, left
+        behind by crashed runs. Dirs without a heartbeat go by their own mtime.
+        """
+        runs_dir = os.path.join(root, ".runs")
+        if not os.path.isdir(runs_dir):
+            return
+        for name in os.listdir(runs_dir):
+            path = os.path.join(runs_dir, name)
+            heartbeat = os.path.join(path, ".heartbeat")
+            try:
+                last_seen = os.path.getmtime(heartbeat if os.path.exists(heartbeat) else path)
+            except OSError:
+                continue
+            if time.time() - last_seen > max_age:
+                shutil.rmtree(path, ignore_errors=True)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.cleanup()
@@ -0,0 +1,161 @@
+import hashlib
+import xml.etree.ElementTree as ET
+from concurrent.futures import ThreadPoolExecutor
+from create_geoserver_instances import rest_url, get_client, log
+from catalog_snapshot import CatalogSnapshot
+
+SLD_HEADERS = {"Content-type": "application/vnd.ogc.sld+xml"}
+
+
+def sld_digest(sld_content):
+    """Hash of the canonical XML form, so formatting-only differences don't count as changes."""
+    # Parsed from bytes so the XML declaration's encoding is honoured (SLDs are not always UTF-8)
+    canonical = ET.canonicalize(xml_data=sld_content, strip_text=True)
+    return hashlib.sha256(canonical.encode("utf-8")).hexdigest()
+
+
+def read_sld(sld_path):
+    # Read once; the same bytes are validated, hashed and uploaded
+    with open(sld_path, "rb") as sld_file:
+        sld_content = sld_file.read()
+    ET.fromstring(sld_content)
+    return sld_content
+
+
+def remote_sld_digest(workspace, style_name):
+    response = get_client().get(f"{rest_url()}workspaces/{workspace}/styles/{style_name}.sld")
+    if response.status_code != 200:
+        return None
+    try:
+        return sld_digest(response.content)
+    except ET.ParseError:
+        return None
+
+
+def sync_style(workspace, style_name, sld_content, snapshot, check_remote=True):
+    """
+    Creates or updates one style. Returns "created", "updated", "unchanged" or
+    None on failure. check_remote=False skips the hash comparison for callers
+    that already know the style differs.
+    """
+    style_file_url = f"{rest_url()}workspaces/{workspace}/styles/{style_name}"
+
+    if snapshot.exists("styles", workspace, style_name):
+        if check_remote and remote_sld_digest(workspace, style_name) == sld_digest(sld_content):
+            return "unchanged"
+        outcome = "updated"
+    else:
+        create_style_payload = f"""
+        <style>
+            <name>{style_name}</name>
+            <filename>{style_name}.sld</filename>
+        </style>
+        """
+        create_style = get_client().post(
+            f"{rest_url()}workspaces/{workspace}/styles",
+            data=create_style_payload,
+            headers={"Content-type": "application/xml"}
+        )
+        if create_style.status_code not in [200, 201]:
+            log(f"Failed to create style entry '{style_name}': {create_style.status_code} {create_style.text}", "error")
+            return None
+        snapshot.add("styles", workspace, style_name)
+        outcome = "created"
+
+    # raw=true stores the SLD byte for byte, so the next run's hash comparison is stable
+    upload = get_client().put(style_file_url, data=sld_content, headers=SLD_HEADERS, params={"raw": "true"})
+    if upload.status_code not in [200, 201]:
+        log(f"Failed to upload style '{style_name}': {upload.status_code} {upload.text}", "error")
+        return None
+    return outcome
+
+
+def current_default_style(workspace, layer_name):
+    response = get_client().get(f"{rest_url()}layers/{workspace}:{layer_name}.json")
+    if response.status_code != 200:
+        return None
+    return response.json().get("layer", {}).get("defaultStyle", {}).get("name")
+
+
+def assign_style(workspace, layer_name, style_name, check_current=True):
+    """Makes style_name the layer's default style unless it already is. Returns True if a change was made."""
+    style_assign_url = f"{rest_url()}layers/{workspace}:{layer_name}"
+    if check_current and current_default_style(workspace, layer_name) in (style_name, f"{workspace}:{style_name}"):
+        return False
+
+    assign_payload = f"""
+    <layer>
+        <defaultStyle>
+            <name>{style_name}</name>
+            <workspace>{workspace}</workspace>
+        </defaultStyle>
+        <styles>
+            <style>
+                <name>{style_name}</name>
+                <workspace>{workspace}</workspace>
+            </style>
+        </styles>
+    </layer>
+    """.strip()
+    assign = get_client().put(style_assign_url, data=assign_payload, headers={"Content-type": "application/xml"})
+    if assign.status_code not in [200, 201, 204]:
+        raise Exception(f"Failed to assign style (URL: {style_assign_url}): {assign.status_code} {assign.text}")
+    return True
+
+
+def sync_styles(records, max_workers=8, snapshot=None):
+    """
+    Hash-based counterpart of calling upload_and_assign_style per record.
+
+    Styles are listed once per workspace (through a CatalogSnapshot) and each
+    SLD file is read once. A style is uploaded only when its canonical hash
+    differs from the SLD the server holds, and a layer is reassigned only when
+    its default style differs. Styles are synced concurrently; records that
+    share a style upload it once before its layers are assigned.
+
+    Args:
+        records (list[dict]): Entries from styles_path_details.jsonl.
+        max_workers (int): Number of styles synced concurrently.
+        snapshot (CatalogSnapshot): Optional shared catalog snapshot.
+
+    Returns:
+        dict: Counts of created/updated/unchanged styles, assigned layers and failures.
+    """
+    snapshot = snapshot or CatalogSnapshot(get_client())
+    groups = {}
+    for record in records:
+        key = (record["workspace"], record["style_name"], record["style_path"])
+        groups.setdefault(key, []).append(record["layer"])
+
+    def sync_group(item):
+        (workspace, style_name, sld_path), layer_names = item
+        result = {"created": 0, "updated": 0, "unchanged": 0, "assigned": 0, "failed": 0}
+        try:
+            sld_content = read_sld(sld_path)
+            outcome = sync_style(workspace, style_name, sld_content, snapshot)
+            if outcome is None:
+                result["failed"] += 1
+                return result
+            result[outcome] += 1
+            log(f"Style '{style_name}' {outcome}.", "success" if outcome != "unchanged" else "info")
+
+            for layer_name in layer_names:
+                if assign_style(workspace, layer_name, style_name):
+                    result["assigned"] += 1
+                    log(f"Style '{style_name}' assigned to layer '{layer_name}'", "success")
+        except (OSError, ET.ParseError) as e:
+            log(f"Invalid SLD '{sld_path}': {e}", "error")
+            result["failed"] += 1
+        except Exception as e:
+            log(f"Failed to sync style '{style_name}': {e}", "error")
+            result["failed"] += 1
+        return result
+
+    totals = {"created": 0, "updated": 0, "unchanged": 0, "assigned": 0, "failed": 0}
+    with ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="style") as executor:
+        for result in executor.map(sync_group, groups.items()):
+            for key, value in result.items():
+                totals[key] += value
+
+    log(f"Style sync finished: {totals}", "info")
+    return totals
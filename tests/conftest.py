@@ -0,0 +1,21 @@
+import os
+import sys
+
+import pytest
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+# The modules are flat scripts at the repository root; the stub servers live with the benchmarks
+sys.path[:0] = [ROOT, os.path.join(ROOT, "benchmarks")]
+
+
+@pytest.fixture
+def geoserver(monkeypatch):
+    """A running GeoServer stub that the shared REST client (get_client()) points at."""
+    import create_geoserver_instances
+    from geoserver_client import GeoServerClient
+    from geoserver_stub import geoserver_stub_server
+
+    with geoserver_stub_server() as stub:
+        monkeypatch.setattr(create_geoserver_instances, "_client",
+                            GeoServerClient(f"{stub.url}geoserver/rest/", "admin", "geoserver"))
+        yield stub
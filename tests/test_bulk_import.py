@@ -0,0 +1,71 @@
+import zipfile
+
+import pytest
+
+from bulk_import import BulkImporter
+from catalog_snapshot import CatalogSnapshot
+from create_geoserver_instances import get_client
+from style_sync import current_default_style
+
+
+@pytest.fixture
+def workspace(geoserver):
+    catalog = geoserver.httpd.catalog
+    catalog.objects["workspaces/WA_v2"] = {}
+    catalog.objects["workspaces/WA_v2/styles/roads_style"] = {}
+    return "WA_v2"
+
+
+def _shapefile_zip(tmp_path, native_name, members=(".shp", ".shx", ".dbf")):
+    path = tmp_path / f"{native_name}.zip"
+    with zipfile.ZipFile(path, "w") as zf:
+        for suffix in members:
+            zf.writestr(f"{native_name}{suffix}", b"\0")
+    return str(path)
+
+
+def test_imports_renames_and_styles_every_layer_in_one_context(geoserver, workspace, tmp_path):
+    snapshot = CatalogSnapshot(get_client())
+    importer = BulkImporter(workspace, snapshot, poll_interval=0)
+    outcomes = {}
+    importer.add(_shapefile_zip(tmp_path, "roads"), "wa_roads", style="roads_style",
+                 on_done=lambda outcome: outcomes.setdefault("wa_roads", outcome))
+    importer.add(_shapefile_zip(tmp_path, "rivers"), "wa_rivers",
+                 on_done=lambda outcome: outcomes.setdefault("wa_rivers", outcome))
+
+    assert importer.run() == {"wa_roads": "created", "wa_rivers": "created"}
+
+    assert outcomes == {"wa_roads": "created", "wa_rivers": "created"}
+    catalog = geoserver.httpd.catalog
+    assert list(catalog.imports) == ["0"]
+    assert catalog.imports["0"]["workspace"] == workspace
+    # Stores keep the shapefile's name; the layers get their standard names
+    assert "workspaces/WA_v2/datastores/roads/featuretypes/wa_roads" in catalog.objects
+    assert "workspaces/WA_v2/datastores/rivers/featuretypes/wa_rivers" in catalog.objects
+    assert current_default_style(workspace, "wa_roads") == "roads_style"
+    assert current_default_style(workspace, "wa_rivers") is None
+    assert snapshot.exists("featuretypes", workspace, "wa_roads")
+    assert importer.seconds > 0
+    # Nothing left queued for the next run
+    assert importer.run() == {}
+
+
+def test_unknown_style_falls_back_to_the_default_style(geoserver, workspace, tmp_path):
+    importer = BulkImporter(workspace, poll_interval=0)
+    importer.add(_shapefile_zip(tmp_path, "roads"), "wa_roads", style="missing_style")
+
+    assert importer.run() == {"wa_roads": "created"}
+    assert current_default_style(workspace, "wa_roads") is None
+
+
+def test_tasks_that_are_not_ready_are_dropped(geoserver, workspace, tmp_path):
+    importer = BulkImporter(workspace, poll_interval=0)
+    outcomes = []
+    importer.add(_shapefile_zip(tmp_path, "roads"), "wa_roads", on_done=outcomes.append)
+    importer.add(_shapefile_zip(tmp_path, "notes", members=(".txt",)), "wa_notes", on_done=outcomes.append)
+
+    assert importer.run() == {"wa_roads": "created", "wa_notes": None}
+    assert outcomes == ["created", None]
+    tasks = geoserver.httpd.catalog.imports["0"]["tasks"]
+    assert [task["layer"] for task in tasks.values()] == ["wa_roads"]
+    assert not any("wa_notes" in path for path in geoserver.httpd.catalog.objects)
@@ -0,0 +1,43 @@
+from gwc_seed import GwcSeeder, gwc_rest_url, parse_tasks
+
+
+def test_gwc_rest_url_sits_next_to_the_rest_root():
+    assert gwc_rest_url("https://host/geoserver/rest/") == "https://host/geoserver/gwc/rest/"
+    assert gwc_rest_url("https://host/geoserver/rest") == "https://host/geoserver/gwc/rest/"
+
+
+def test_parse_tasks():
+    assert parse_tasks({"long-array-array": [[10, 100, 5, 7, 1]]}) == [
+        {"done": 10, "total": 100, "remaining": 5, "id": 7, "state": 1}]
+    assert parse_tasks({}) == []
+
+
+def test_seeds_each_gridset_and_polls_until_done(geoserver):
+    catalog = geoserver.httpd.catalog
+    catalog.seed_polls = 2
+    seeder = GwcSeeder({"gridsets": ["EPSG:4326", "EPSG:900913"], "zoom_stop": 5, "poll_interval": 0})
+
+    seeder.submit("WA_v2", "roads", "created")
+    seeder.submit("WA_v2", "rivers", "updated")
+    # A layer submitted twice (e.g. a variant and its base) is seeded once
+    seeder.submit("WA_v2", "roads", "created")
+
+    assert seeder.wait() == {"WA_v2:roads": "done", "WA_v2:rivers": "done"}
+    roads = catalog.seeds["WA_v2:roads"]
+    assert [(r["gridSetId"], r["type"], r["zoomStop"]) for r in roads["requests"]] == [
+        ("EPSG:4326", "seed", 5), ("EPSG:900913", "seed", 5)]
+    assert {r["type"] for r in catalog.seeds["WA_v2:rivers"]["requests"]} == {"reseed"}
+    # Both tasks reported running twice, then the next status read found them finished
+    assert geoserver.stats["by_path"]["GET /geoserver/gwc/rest/seed/WA_v2:roads.json"] == 3
+    assert not roads["killed"]
+
+
+def test_kills_tasks_that_outlive_the_timeout(geoserver):
+    catalog = geoserver.httpd.catalog
+    catalog.seed_polls = 100
+    seeder = GwcSeeder({"poll_interval": 0, "timeout": 0})
+
+    seeder.submit("WA_v2", "roads")
+
+    assert seeder.wait() == {"WA_v2:roads": "timeout"}
+    assert catalog.seeds["WA_v2:roads"]["killed"]
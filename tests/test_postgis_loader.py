@@ -0,0 +1,115 @@
+import geopandas as gpd
+import pytest
+from shapely.geometry import Point
+
+import postgis_loader
+
+sql = pytest.importorskip("psycopg2.sql")
+
+
+class StubCursor:
+    """Stand-in for a psycopg2 cursor that records statements and COPY payloads instead of running them."""
+
+    def __init__(self, log, fail_on_copy=False):
+        self.log = log
+        self.copied = []
+        self.fail_on_copy = fail_on_copy
+
+    def execute(self, statement):
+        self.log.append(statement.as_string(self))
+
+    def copy_expert(self, statement, file):
+        if self.fail_on_copy:
+            raise RuntimeError("COPY failed")
+        self.log.append(statement)
+        self.copied.append(file.read())
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        return False
+
+
+class StubConnection:
+    """Stand-in for a psycopg2 connection; like the real one, the context manager commits or rolls back."""
+
+    def __init__(self, fail_on_copy=False):
+        self.log = []
+        self.cursor_ = StubCursor(self.log, fail_on_copy)
+        self.closed = False
+
+    def cursor(self):
+        return self.cursor_
+
+    def close(self):
+        self.closed = True
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, *exc):
+        self.log.append("ROLLBACK" if exc_type else "COMMIT")
+        return False
+
+
+@pytest.fixture
+def stub_connect(monkeypatch):
+    connections = []
+
+    def connect(dsn, fail_on_copy=False):
+        connections.append(StubConnection(fail_on_copy))
+        return connections[-1]
+
+    # Identifier quoting normally asks the server connection; the stub quotes like PostgreSQL does
+    monkeypatch.setattr(sql.Identifier, "as_string",
+                        lambda self, context: ".".join('"' + s.replace('"', '""') + '"' for s in self.strings))
+    monkeypatch.setattr(sql.Literal, "as_string", lambda self, context: repr(self.wrapped))
+    monkeypatch.setattr(postgis_loader.psycopg2, "connect", connect)
+    return connections
+
+
+def _layer(count):
+    names = [f"feature {i}" if i % 2 else None for i in range(count)]
+    return gpd.GeoDataFrame({"id": list(range(count)), "name": names}, geometry=[Point(i, i) for i in range(count)],
+                            crs="EPSG:4326")
+
+
+def test_copy_loads_staging_table_then_swaps_it_in(stub_connect):
+    connection = {"host": "db", "database": "gis", "schema": "layers", "user": "geo", "passwd": "secret"}
+
+    assert postgis_loader.copy_geodataframe(_layer(5), connection, "roads", chunk_size=2) == "layers.roads"
+
+    conn = stub_connect[0]
+    copy = 'COPY "layers"."roads__load" ("id", "name", "geom") FROM STDIN WITH (FORMAT csv)'
+    assert conn.log == [
+        'DROP TABLE IF EXISTS "layers"."roads__load"',
+        'CREATE TABLE "layers"."roads__load" (fid bigserial PRIMARY KEY, "id" bigint, "name" text, '
+        'geom geometry(Geometry, 4326))',
+        copy, copy, copy,
+        'CREATE INDEX ON "layers"."roads__load" USING GIST (geom)',
+        'DROP TABLE IF EXISTS "layers"."roads"',
+        'ALTER TABLE "layers"."roads__load" RENAME TO "roads"',
+        'ANALYZE "layers"."roads"',
+        "COMMIT",
+    ]
+    assert conn.closed
+
+    rows = "".join(conn.cursor_.copied).splitlines()
+    assert len(rows) == 5
+    # None loads as an unquoted empty field (NULL); geometry is hex EWKB carrying the SRID
+    assert rows[0].startswith("0,,0101000020E6100000")
+    assert rows[1].startswith("1,feature 1,0101000020E6100000")
+
+
+def test_failed_copy_leaves_live_table_alone(stub_connect, monkeypatch):
+    connect = postgis_loader.psycopg2.connect
+    monkeypatch.setattr(postgis_loader.psycopg2, "connect", lambda dsn: connect(dsn, fail_on_copy=True))
+
+    with pytest.raises(RuntimeError):
+        postgis_loader.copy_geodataframe(_layer(3), {"database": "gis", "user": "geo"}, "roads")
+
+    conn = stub_connect[0]
+    assert conn.log[-1] == "ROLLBACK"
+    assert 'DROP TABLE IF EXISTS "public"."roads"' not in conn.log
+    assert conn.closed
@@ -0,0 +1,275 @@
+import argparse
+import json
+import multiprocessing
+import os
+import socket
+import sqlite3
+import threading
+import time
+import uuid
+from collections import OrderedDict
+from ingest_state import layer_key
+
+TASK_FIELDS = ["task_id", "task_key", "region", "payload", "status", "attempts", "lease_owner", "lease_expires"]
+
+
+def task_groups(region, layers):
+    """
+    {task_key: [layers]} for a region, in job order. A WFS layer is a task of
+    its own; the WMS layers that share a link are one task, so they share one
+    store named after the link's first layer, as in a full run.
+    """
+    groups = OrderedDict()
+    for layer in layers:
+        if layer.get("link_type", "WFS").upper() == "WMS":
+            groups.setdefault(f"{region}/wms:{layer['link']}", []).append(layer)
+        else:
+            groups[layer_key(region, layer)] = [layer]
+    return groups
+
+
+class WorkQueue:
+    """
+    Ingest tasks (see task_groups) in a SQLite file, shared by any number of worker
+    processes. A worker leases a task for lease_seconds and keeps the lease
+    alive with heartbeats; a task whose lease expires (its worker crashed or
+    hung) goes back to the pool. Finished tasks stay "done", so restarting a
+    worker or re-enqueueing the job file never redoes them.
+
+    SQLite locking is reliable on a local disk. Workers on other hosts need
+    the database on a filesystem with working POSIX locks (not most NFS).
+
+    Args:
+        db_path (str): Queue database, created if missing.
+        max_attempts (int): Leases per task before it is left "failed".
+    """
+
+    def __init__(self, db_path="ingest_queue.sqlite", max_attempts=3):
+        self.db_path = db_path
+        self.max_attempts = max_attempts
+        self._lock = threading.Lock()
+        # isolation_level=None: transactions are opened explicitly with BEGIN IMMEDIATE
+        self._conn = sqlite3.connect(db_path, timeout=30, isolation_level=None, check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute(
+            """CREATE TABLE IF NOT EXISTS tasks (
+                task_id INTEGER PRIMARY KEY AUTOINCREMENT,
+                task_key TEXT UNIQUE NOT NULL,
+                region TEXT NOT NULL,
+                payload TEXT NOT NULL,
+                status TEXT NOT NULL DEFAULT 'pending',
+                attempts INTEGER NOT NULL DEFAULT 0,
+                lease_owner TEXT,
+                lease_expires REAL,
+                result TEXT,
+                updated_at REAL
+            )"""
+        )
+
+    def _transaction(self, statement, params=()):
+        with self._lock:
+            self._conn.execute("BEGIN IMMEDIATE")
+            try:
+                cursor = self._conn.execute(statement, params)
+                self._conn.execute("COMMIT")
+                return cursor
+            except BaseException:
+                self._conn.execute("ROLLBACK")
+                raise
+
+    def enqueue(self, region, task_key, layers):
+        """Adds one task for layers; a task_key already in the queue (in any state) is left alone."""
+        cursor = self._transaction(
+            "INSERT OR IGNORE INTO tasks (task_key, region, payload, updated_at) VALUES (?, ?, ?, ?)",
+            (task_key, region, json.dumps(layers), time.time()),
+        )
+        return cursor.rowcount == 1
+
+    def enqueue_jobs(self, region_entries):
+        added = 0
+        for region_entry in region_entries:
+            region = region_entry["region"]
+            for task_key, layers in task_groups(region, region_entry.get("layers", [])).items():
+                added += self.enqueue(region, task_key, layers)
+        return added
+
+    def lease(self, owner, lease_seconds=600):
+        """Claims the oldest runnable task for owner. Returns a task dict or None when nothing is left."""
+        now = time.time()
+        with self._lock:
+            self._conn.execute("BEGIN IMMEDIATE")
+            try:
+                row = self._conn.execute(
+                    f"SELECT {', '.join(TASK_FIELDS)} FROM tasks "
+                    "WHERE (status = 'pending' OR (status = 'leased' AND lease_expires < ?)) AND attempts < ? "
+                    "ORDER BY task_id LIMIT 1",
+                    (now, self.max_attempts),
+                ).fetchone()
+                if row:
+                    self._conn.execute(
+                        "UPDATE tasks SET status = 'leased', lease_owner = ?, lease_expires = ?, "
+                        "attempts = attempts + 1, updated_at = ? WHERE task_id = ?",
+                        (owner, now + lease_seconds, now, row[0]),
+                    )
+                # Expired leases that used up their attempts won't be picked again
+                self._conn.execute(
+                    "UPDATE tasks SET status = 'failed', updated_at = ? "
+                    "WHERE status = 'leased' AND lease_expires < ? AND attempts >= ?",
+                    (now, now, self.max_attempts),
+                )
+                self._conn.execute("COMMIT")
+            except BaseException:
+                self._conn.execute("ROLLBACK")
+                raise
+        if not row:
+            return None
+        task = dict(zip(TASK_FIELDS, row))
+        task["payload"] = json.loads(task["payload"])
+        task["attempts"] += 1
+        return task
+
+    def heartbeat(self, task_id, owner, lease_seconds=600):
+        """Extends the lease. Returns False if owner no longer holds it."""
+        cursor = self._transaction(
+            "UPDATE tasks SET lease_expires = ?, updated_at = ? "
+            "WHERE task_id = ? AND lease_owner = ? AND status = 'leased'",
+            (time.time() + lease_seconds, time.time(), task_id, owner),
+        )
+        return cursor.rowcount == 1
+
+    def complete(self, task, owner, succeeded, result=None):
+        """
+        Records a task's outcome if owner still holds its lease. A failed task
+        goes back to "pending" until it has used max_attempts leases.
+        """
+        if succeeded:
+            status = "done"
+        else:
+            status = "failed" if task["attempts"] >= self.max_attempts else "pending"
+        cursor = self._transaction(
+            "UPDATE tasks SET status = ?, result = ?, lease_owner = NULL, lease_expires = NULL, updated_at = ? "
+            "WHERE task_id = ? AND lease_owner = ? AND status = 'leased'",
+            (status, json.dumps(result), time.time(), task["task_id"], owner),
+        )
+        return cursor.rowcount == 1
+
+    def requeue_failed(self):
+        cursor = self._transaction(
+            "UPDATE tasks SET status = 'pending', attempts = 0, updated_at = ? WHERE status = 'failed'",
+            (time.time(),),
+        )
+        return cursor.rowcount
+
+    def counts(self):
+        with self._lock:
+            rows = self._conn.execute("SELECT status, COUNT(*) FROM tasks GROUP BY status").fetchall()
+        return dict(rows)
+
+    def close(self):
+        self._conn.close()
+
+
+class _Heartbeat(threading.Thread):
+    def __init__(self, queue, task, owner, lease_seconds):
+        super().__init__(daemon=True)
+        self.queue, self.task, self.owner, self.lease_seconds = queue, task, owner, lease_seconds
+        self.stopped = threading.Event()
+
+    def run(self):
+        while not self.stopped.wait(self.lease_seconds / 3):
+            if not self.queue.heartbeat(self.task["task_id"], self.owner, self.lease_seconds):
+                print(f"[!] Lost the lease on '{self.task['task_key']}'; another worker may pick it up")
+                return
+
+
+def run_worker(db_path="ingest_queue.sqlite", output_dir="final_output_files_v2", lease_seconds=600,
+               idle_exit=True, poll_interval=10, incremental=True):
+    """
+    Leases and processes tasks until the queue is empty (or forever with
+    idle_exit=False, polling every poll_interval seconds). Each task runs
+    fetch, convert and publish for its layers (see task_groups) through
+    process_region_layers.
+    """
+    # Imported here so enqueue/status runs don't load the geo stack
+    from ingest_wfs_wms_layers_geoserver import process_region_layers
+    from create_geoserver_instances import get_client
+    from catalog_snapshot import CatalogSnapshot
+    from ingest_state import LayerStateStore
+
+    owner = f"{socket.gethostname()}-{os.getpid()}-{uuid.uuid4().hex[:6]}"
+    queue = WorkQueue(db_path)
+    snapshot = CatalogSnapshot(get_client())
+    state_store = LayerStateStore() if incremental else None
+    print(f"[→] Worker {owner} started")
+    try:
+        while True:
+            task = queue.lease(owner, lease_seconds)
+            if task is None:
+                if idle_exit:
+                    break
+                time.sleep(poll_interval)
+                continue
+
+            heartbeat = _Heartbeat(queue, task, owner, lease_seconds)
+            heartbeat.start()
+            try:
+                # Queues written before tasks held a list carry a single layer
+                layers = task["payload"] if isinstance(task["payload"], list) else [task["payload"]]
+                results = process_region_layers(task["region"], layers, output_dir,
+                                                state_store=state_store, snapshot=snapshot)
+                results = results or [{"status": "error", "message": "No result"}]
+            except Exception as e:
+                results = [{"status": "error", "message": str(e)}]
+            finally:
+                heartbeat.stopped.set()
+                heartbeat.join()
+
+            succeeded = all(result.get("status") == "success" for result in results)
+            result = results[0] if len(results) == 1 else results
+            if not queue.complete(task, owner, succeeded, result):
+                print(f"[!] Result for '{task['task_key']}' dropped: lease was taken over")
+            else:
+                print(f"[{'✓' if succeeded else '✗'}] {task['task_key']} (attempt {task['attempts']})")
+    finally:
+        if state_store:
+            state_store.close()
+        queue.close()
+    print(f"[✓] Worker {owner} finished")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Queue-backed ingest: enqueue layer tasks and run workers.")
+    parser.add_argument("command", choices=["enqueue", "worker", "status", "requeue-failed"])
+    parser.add_argument("--db", default="ingest_queue.sqlite")
+    parser.add_argument("--jobs", default="final_output.jsonl")
+    parser.add_argument("--region", action="append", help="Limit enqueueing to these regions (repeatable).")
+    parser.add_argument("--workers", type=int, default=1, help="Worker processes to start on this host.")
+    parser.add_argument("--lease-seconds", type=int, default=600)
+    parser.add_argument("--output-dir", default="final_output_files_v2")
+    parser.add_argument("--wait", action="store_true", help="Keep polling for new tasks instead of exiting when idle.")
+    args = parser.parse_args()
+
+    work_queue = WorkQueue(args.db)
+    if args.command == "enqueue":
+        with open(args.jobs, encoding="utf-8") as f:
+            entries = [json.loads(line) for line in f if line.strip()]
+        entries = [entry for entry in entries if not args.region or entry["region"] in args.region]
+        print(f"[✓] Enqueued {work_queue.enqueue_jobs(entries)} new task(s). Queue: {work_queue.counts()}")
+    elif args.command == "requeue-failed":
+        print(f"[✓] Requeued {work_queue.requeue_failed()} failed task(s). Queue: {work_queue.counts()}")
+    elif args.command == "status":
+        print(f"Queue: {work_queue.counts()}")
+    else:
+        worker_kwargs = {"db_path": args.db, "output_dir": args.output_dir, "lease_seconds": args.lease_seconds,
+                         "idle_exit": not args.wait}
+        if args.workers <= 1:
+            run_worker(**worker_kwargs)
+        else:
+            context = multiprocessing.get_context("spawn")
+            processes = [context.Process(target=run_worker, kwargs=worker_kwargs) for _ in range(args.workers)]
+            for process in processes:
+                process.start()
+            for process in processes:
+                process.join()
+        print(f"Queue: {work_queue.counts()}")
+    work_queue.close()
@@ -0,0 +1,328 @@
+import os
+import re
+import struct
+import tempfile
+import zipfile
+from resilience import ResilientSession
+
+# Zip record layouts (APPNOTE.TXT 4.3)
+LOCAL_HEADER = struct.Struct("<4sHHHHHLLLHH")
+CENTRAL_HEADER = struct.Struct("<4sHHHHHHLLLHHHHHLL")
+END_RECORD = struct.Struct("<4sHHHHLLH")
+END_RECORD_64 = struct.Struct("<4sQHHLLQQQQ")
+END_LOCATOR_64 = struct.Struct("<4sLQL")
+ZIP64_LIMIT = 0xFFFFFFFF
+
+DEFAULT_CHUNK_SIZE = 4 * 1024 * 1024
+
+
+class RemoteChangedError(Exception):
+    """The remote file changed (new ETag) while it was being read in ranges."""
+
+
+class HttpRangeFile:
+    """
+    Read-only, seekable file object over a remote file, served with HTTP Range
+    requests. Reads are aligned to block_size so zipfile's small reads of the
+    end record and central directory cost a handful of requests. If-Range
+    pins every read to the ETag seen when the file was opened.
+
+    Args:
+        url (str): Remote file URL; the server must answer ranges with 206.
+        session (requests.Session): Session used for the requests.
+        block_size (int): Read-ahead size of each range request.
+    """
+
+    def __init__(self, url, session, block_size=256 * 1024):
+        self.url = url
+        self.session = session
+        self.block_size = block_size
+        self.position = 0
+        self._block_start = 0
+        self._block = b""
+        self.size, self.etag = probe_ranges(url, session)
+        if self.size is None:
+            raise OSError(f"Server does not support range requests for {url}")
+        # zipfile starts by searching the last 64 KiB for the end records; fetch them in one go
+        self._block_start = max(0, self.size - 66 * 1024)
+        self._block = self.read_range(self._block_start, self.size)
+
+    def read_range(self, start, end):
+        """Returns bytes [start, end) of the remote file."""
+        headers = {"Range": f"bytes={start}-{end - 1}"}
+        if self.etag:
+            headers["If-Range"] = self.etag
+        # Streamed, so a failed If-Range (200 with the whole archive) is closed without reading the body
+        with self.session.get(self.url, headers=headers, stream=True, timeout=(10, 120)) as response:
+            response.raise_for_status()
+            content_range = response.headers.get("Content-Range", "")
+            if response.status_code != 206 or not content_range.startswith(f"bytes {start}-{end - 1}/"):
+                raise RemoteChangedError(f"{self.url} changed while reading it")
+            return response.content
+
+    def seekable(self):
+        return True
+
+    def readable(self):
+        return True
+
+    def tell(self):
+        return self.position
+
+    def seek(self, offset, whence=os.SEEK_SET):
+        if whence == os.SEEK_CUR:
+            offset += self.position
+        elif whence == os.SEEK_END:
+            offset += self.size
+        self.position = max(0, min(offset, self.size))
+        return self.position
+
+    def read(self, n=-1):
+        end = self.size if n is None or n < 0 else min(self.size, self.position + n)
+        if end <= self.position:
+            return b""
+        block_end = self._block_start + len(self._block)
+        if not (self._block_start <= self.position and end <= block_end):
+            fetch_end = min(self.size, max(end, self.position + self.block_size))
+            self._block_start, self._block = self.position, self.read_range(self.position, fetch_end)
+        offset = self.position - self._block_start
+        data = self._block[offset:offset + end - self.position]
+        self.position += len(data)
+        return data
+
+    def close(self):
+        self._block = b""
+
+
+class RawZipWriter:
+    """
+    Writes a zip from members copied byte for byte out of other zips, so
+    compressed data is never inflated and deflated again. CRC and sizes come
+    from the source's central directory; ZIP64 records are written when an
+    offset or size needs them. The zip is built under a unique temp name next
+    to path and renamed into place on close().
+    """
+
+    def __init__(self, path):
+        self.path = path
+        fd, self._tmp_path = tempfile.mkstemp(dir=os.path.dirname(path) or ".",
+                                              prefix=f".{os.path.basename(path)}.", suffix=".tmp")
+        self._fp = os.fdopen(fd, "wb")
+        self._entries = []
+
+    def add_raw(self, info, arcname, source, header_offset=None, chunk_size=DEFAULT_CHUNK_SIZE):
+        """
+        Copies one member's compressed bytes from source (a seekable file
+        holding the member's local header at header_offset, info.header_offset
+        by default) under the name arcname.
+        """
+        if info.flag_bits & 0x1:
+            raise ValueError(f"Encrypted zip member not supported: {info.filename}")
+        header_offset = info.header_offset if header_offset is None else header_offset
+        source.seek(header_offset)
+        local = LOCAL_HEADER.unpack(source.read(LOCAL_HEADER.size))
+        if local[0] != b"PK\x03\x04":
+            raise zipfile.BadZipFile(f"Bad local header for {info.filename}")
+        source.seek(header_offset + LOCAL_HEADER.size + local[9] + local[10])
+
+        name = arcname.encode("utf-8")
+        # Sizes are known up front, so no trailing data descriptor is needed
+        flags = (info.flag_bits & ~0x08) | (0x800 if not arcname.isascii() else 0)
+        offset = self._fp.tell()
+        zip64 = info.file_size >= ZIP64_LIMIT or info.compress_size >= ZIP64_LIMIT
+        extra = struct.pack("<HHQQ", 1, 16, info.file_size, info.compress_size) if zip64 else b""
+        version = max(info.extract_version, 45 if zip64 else 20)
+        dos_time, dos_date = _dos_datetime(info.date_time)
+        self._fp.write(LOCAL_HEADER.pack(
+            b"PK\x03\x04", version, flags, info.compress_type, dos_time, dos_date, info.CRC,
+            ZIP64_LIMIT if zip64 else info.compress_size, ZIP64_LIMIT if zip64 else info.file_size,
+            len(name), len(extra)) + name + extra)
+
+        remaining = info.compress_size
+        while remaining:
+            chunk = source.read(min(chunk_size, remaining))
+            if not chunk:
+                raise zipfile.BadZipFile(f"Truncated data for {info.filename}")
+            self._fp.write(chunk)
+            remaining -= len(chunk)
+        self._entries.append((info, name, flags, version, dos_time, dos_date, offset))
+
+    def close(self):
+        if self._fp.closed:
+            return
+        cd_offset = self._fp.tell()
+        for info, name, flags, version, dos_time, dos_date, offset in self._entries:
+            zip64_fields = [value for value in (info.file_size, info.compress_size, offset) if value >= ZIP64_LIMIT]
+            extra = struct.pack(f"<HH{len(zip64_fields)}Q", 1, 8 * len(zip64_fields), *zip64_fields) \
+                if zip64_fields else b""
+            version = max(version, 45) if zip64_fields else version
+            self._fp.write(CENTRAL_HEADER.pack(
+                b"PK\x01\x02", (info.create_system << 8) | max(info.create_version, version), version, flags,
+                info.compress_type, dos_time, dos_date, info.CRC,
+                min(info.compress_size, ZIP64_LIMIT), min(info.file_size, ZIP64_LIMIT),
+                len(name), len(extra), 0, 0, info.internal_attr, info.external_attr, min(offset, ZIP64_LIMIT))
+                + name + extra)
+        cd_size = self._fp.tell() - cd_offset
+        count = len(self._entries)
+
+        if count >= 0xFFFF or cd_offset >= ZIP64_LIMIT or cd_size >= ZIP64_LIMIT:
+            end64_offset = self._fp.tell()
+            self._fp.write(END_RECORD_64.pack(b"PK\x06\x06", 44, 45, 45, 0, 0, count, count, cd_size, cd_offset))
+            self._fp.write(END_LOCATOR_64.pack(b"PK\x06\x07", 0, end64_offset, 1))
+        self._fp.write(END_RECORD.pack(b"PK\x05\x06", 0, 0, min(count, 0xFFFF), min(count, 0xFFFF),
+                                       min(cd_size, ZIP64_LIMIT), min(cd_offset, ZIP64_LIMIT), 0))
+        self._fp.close()
+        os.replace(self._tmp_path, self.path)
+
+    def abort(self):
+        self._fp.close()
+        if os.path.exists(self._tmp_path):
+            os.remove(self._tmp_path)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        if exc_type is None:
+            self.close()
+        else:
+            self.abort()
+
+
+def _dos_datetime(date_time):
+    year, month, day, hour, minute, second = date_time
+    return (hour << 11) | (minute << 5) | (second // 2), (max(year, 1980) - 1980) << 9 | (month << 5) | day
+
+
+def probe_ranges(url, session):
+    """
+    Asks for the first byte of url. Returns (size, etag) when the server
+    answers with a 206 and a Content-Range total, else (None, None).
+    """
+    with session.get(url, headers={"Range": "bytes=0-0"}, stream=True, timeout=(10, 60)) as response:
+        response.raise_for_status()
+        match = re.match(r"bytes \d+-\d+/(\d+)", response.headers.get("Content-Range", ""))
+        if response.status_code != 206 or not match:
+            return None, None
+        etag = response.headers.get("ETag")
+        # A weak ETag cannot be used with If-Range
+        return int(match.group(1)), etag if etag and not etag.startswith("W/") else None
+
+
+def download_range(url, path, session, start=0, end=None, etag=None, chunk_size=DEFAULT_CHUNK_SIZE):
+    """
+    Downloads bytes [start, end) of url (to the end of the file when end is
+    None) into path, resuming after whatever path already holds from an
+    interrupted earlier attempt. Without a range-capable server, or when the
+    file changed since the partial download, the download restarts from
+    scratch. Returns the number of bytes in path.
+    """
+    have = os.path.getsize(path) if os.path.exists(path) else 0
+    wanted = None if end is None else end - start
+    if wanted is not None and have >= wanted:
+        return have
+
+    headers = {}
+    if have or start or end is not None:
+        headers["Range"] = f"bytes={start + have}-{'' if end is None else end - 1}"
+        if etag:
+            headers["If-Range"] = etag
+    with session.get(url, headers=headers, stream=True, timeout=(10, 300)) as response:
+        if response.status_code == 416 and end is None:
+            # The partial file already holds everything
+            return have
+        response.raise_for_status()
+        resumed = response.status_code == 206
+        if headers.get("Range") and not resumed:
+            if start or end is not None:
+                raise RemoteChangedError(f"{url} changed or ignored the range request")
+            have = 0
+        with open(path, "ab" if resumed else "wb") as f:
+            for chunk in response.iter_content(chunk_size=chunk_size):
+                f.write(chunk)
+                have += len(chunk)
+    return have
+
+
+def copy_members_ranged(url, output_zip_path, select, session=None, work_dir=None, chunk_size=DEFAULT_CHUNK_SIZE):
+    """
+    Builds output_zip_path from selected members of a remote zip without
+    downloading the rest of it. The central directory is read with range
+    requests, then each selected member (local header and compressed data)
+    is fetched into a staging file and copied raw into the output zip.
+
+    Staging files live in "<output_zip_path>.parts" (or work_dir) and are only
+    removed after the output zip is complete, so an interrupted run resumes
+    where it stopped, mid-member included. If the remote zip changes in the
+    meantime the stale parts are discarded (RemoteChangedError if it changes
+    mid-run).
+
+    Args:
+        select (callable): select(name) returns the member's arcname in the
+                           output zip, or None to leave it out.
+
+    Returns:
+        int: Number of members copied.
+    """
+    session = session or ResilientSession()
+    remote = HttpRangeFile(url, session)
+    with zipfile.ZipFile(remote) as source:
+        infos = source.infolist()
+        # The central directory marks where the last member's data ends
+        cd_offset = source.start_dir
+    ends = dict(zip(sorted(info.header_offset for info in infos),
+                    sorted(info.header_offset for info in infos)[1:] + [cd_offset]))
+    selected = [(info, select(info.filename)) for info in infos if not info.is_dir()]
+    selected = [(info, arcname) for info, arcname in selected if arcname]
+    if not selected:
+        return 0
+
+    parts_dir = work_dir or f"{output_zip_path}.parts"
+    os.makedirs(parts_dir, exist_ok=True)
+    etag_path = os.path.join(parts_dir, "etag")
+    staged_etag = open(etag_path, encoding="utf-8").read() if os.path.exists(etag_path) else None
+    # Parts staged for another version of the file (or one without an ETag) can't be trusted
+    if not remote.etag or staged_etag != remote.etag:
+        _clear_parts(parts_dir)
+        with open(etag_path, "w", encoding="utf-8") as f:
+            f.write(remote.etag or "")
+
+    with RawZipWriter(output_zip_path) as writer:
+        for info, arcname in selected:
+            part_path = os.path.join(parts_dir, f"{info.header_offset}.part")
+            start, end = info.header_offset, ends[info.header_offset]
+            try:
+                download_range(url, part_path, session, start, end, etag=remote.etag, chunk_size=chunk_size)
+            except RemoteChangedError:
+                _clear_parts(parts_dir)
+                raise
+            with open(part_path, "rb") as part:
+                writer.add_raw(info, arcname, part, header_offset=0, chunk_size=chunk_size)
+    _clear_parts(parts_dir)
+    os.rmdir(parts_dir)
+    return len(selected)
+
+
+def copy_members(source, output_zip_path, select, chunk_size=DEFAULT_CHUNK_SIZE):
+    """
+    Local counterpart of copy_members_ranged: raw-copies the selected members
+    of a zip given as a path or a seekable binary stream.
+    """
+    count = 0
+    fp = source if hasattr(source, "read") else open(source, "rb")
+    try:
+        with zipfile.ZipFile(fp) as source_zip, RawZipWriter(output_zip_path) as writer:
+            for info in source_zip.infolist():
+                arcname = None if info.is_dir() else select(info.filename)
+                if arcname:
+                    writer.add_raw(info, arcname, fp, chunk_size=chunk_size)
+                    count += 1
+    finally:
+        if fp is not source:
+            fp.close()
+    return count
+
+
+def _clear_parts(parts_dir):
+    for name in os.listdir(parts_dir):
+        os.remove(os.path.join(parts_dir, name))